@@ -0,0 +1,50 @@
+"""Benchmark agent construction overhead per chat request.
+
+Compares compiling the ReAct agent on every request (the old behaviour of
+``chat_create_message``) with fetching the compiled agent from the
+process-level registry. No model calls are made.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/agent_construction.py [iterations]
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+# The engine is created at import time but never connects here
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from api.ai.agents import agent_config, get_agent, send_email_agent  # noqa: E402
+
+
+def timed(label: str, func, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    per_call = (time.perf_counter() - start) / iterations
+    print(f"{label:<28} {per_call * 1000:10.3f} ms/request")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    # First build includes model client construction; keep it out of the loop
+    start = time.perf_counter()
+    get_agent("send_email")
+    print(f"{'first compile (cold)':<28} {(time.perf_counter() - start) * 1000:10.3f} ms")
+
+    before = timed("compile per request", lambda i: send_email_agent(), iterations)
+    after = timed(
+        "registry + per-request config",
+        lambda i: (get_agent("send_email"), agent_config(thread_id=i, chat_message_id=i)),
+        iterations,
+    )
+    print(f"speedup: {before / after:,.0f}x over {iterations} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Offline benchmark of framework overhead in the AI code paths.
+
+Runs each path against the fake chat model (``LLM_PROVIDER=fake``, see
+``api.ai.fake``), with the email side effects (SMTP send, IMAP read)
+replaced by no-ops, and splits wall time into time spent "in the model"
+(the fake's simulated latency) and everything else: prompt building,
+LangChain/LangGraph runnables, tool dispatch, parsing, callbacks.
+
+Paths:
+
+- ``generate_email_message``: one structured-output call (cache bypassed)
+- ``email_assistant``: tool call turn, concurrent tools, final answer
+- ``send_email_agent``: LangGraph ReAct loop with ``send_me_email``
+- ``get_research_agent``: ReAct loop whose tool runs a nested generation
+
+Each path runs with instant responses (pure overhead) and with
+``--latency`` seconds per model call, to show the overhead is additive.
+Needs no API key, network or database server.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/agent_overhead.py [--iterations 50] [--latency 0.05]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["LLM_MODEL"] = "fake-benchmark"
+os.environ.pop("LLM_PROVIDERS", None)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import api.ai.tools as tools  # noqa: E402
+from api.ai.agents import agent_config, get_agent  # noqa: E402
+from api.ai.assistants import email_assistant  # noqa: E402
+from api.ai.llms import get_chat_model, warm_llms  # noqa: E402
+from api.ai.services import generate_email_message  # noqa: E402
+
+INBOX = [
+    {"uid": str(i), "from": f"sender{i}@example.com", "subject": f"Update {i}",
+     "timestamp": "Mon, 6 Oct 2025 09:00:00 +0000", "body": "Please confirm the plan by Friday. " * 5}
+    for i in range(10)
+]
+# No real mail is sent or read
+tools.send_mail = lambda **kwargs: None
+tools.read_inbox = lambda **kwargs: INBOX
+
+
+def agent_run(name: str, prompt: str):
+    def run(run_id: str):
+        return get_agent(name).invoke(
+            {"messages": [{"role": "user", "content": f"{prompt} #{run_id}"}]},
+            config=agent_config(thread_id=run_id),
+        )
+    return run
+
+
+PATHS = {
+    "generate_email_message": lambda run_id: generate_email_message(f"Thank you note #{run_id}", use_cache=False),
+    "email_assistant": lambda run_id: email_assistant(f"Check my unread emails and send me a summary #{run_id}"),
+    "send_email_agent": agent_run("send_email", "Send me a thank you email"),
+    "get_research_agent": agent_run("research", "Research a product launch announcement"),
+}
+
+
+def measure(model, run, iterations: int):
+    # Prompts are unique per pass so no path is served by the draft cache
+    tag = f"{model.latency:g}-"
+    run(tag + "warmup")  # first-call imports and schema conversion
+    model.reset_stats()
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        run(f"{tag}{i}")
+        timings.append(time.perf_counter() - start)
+    stats = model.stats()
+    wall = sum(timings) / iterations
+    model_time = stats["model_seconds"] / iterations
+    return {
+        "calls": stats["calls"] / iterations,
+        "wall": wall,
+        "p95": sorted(timings)[min(iterations - 1, int(iterations * 0.95))],
+        "model": model_time,
+        "overhead": wall - model_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per model call")
+    args = parser.parse_args()
+
+    warm_llms()
+    model = get_chat_model()
+    print(f"{'path':<24} {'latency':>7} {'LLM calls':>9} {'wall ms':>9} {'p95 ms':>8} "
+          f"{'model ms':>9} {'overhead ms':>11} {'overhead %':>10}")
+    for name, run in PATHS.items():
+        for latency in (0.0, args.latency):
+            model.latency = latency
+            result = measure(model, run, args.iterations)
+            share = result["overhead"] / result["wall"] * 100 if result["wall"] else 0
+            print(f"{name:<24} {latency:>7.2f} {result['calls']:>9.1f} {result['wall'] * 1000:>9.2f} "
+                  f"{result['p95'] * 1000:>8.2f} {result['model'] * 1000:>9.2f} "
+                  f"{result['overhead'] * 1000:>11.2f} {share:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Prompt size and latency of long chat conversations.
+
+Runs one long conversation two ways on the fake chat model
+(``LLM_PROVIDER=fake``) and reports, at several turn numbers, the prompt
+tokens sent to the model during that turn (every call, summaries
+included) and the turn's wall time:
+
+- ``replay``: the whole history is sent again on every turn (the agent
+  without memory, given all earlier messages)
+- ``memory``: the chat agent with its checkpointer and context hook
+  (``api.ai.memory``, ``api.ai.context``); only the new message is sent
+
+Mail sending is replaced by a no-op. Needs no API key, network or
+database server (conversations are kept in memory).
+
+Usage (from backend/src)::
+
+    python ../benchmarks/chat_memory.py [--turns 50] [--latency 0]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["LLM_MODEL"] = "fake-benchmark"
+os.environ["CHAT_MEMORY"] = "memory"
+os.environ.pop("LLM_PROVIDERS", None)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from langchain_core.callbacks import BaseCallbackHandler  # noqa: E402
+from langchain_core.messages.utils import count_tokens_approximately  # noqa: E402
+
+import api.ai.tools as tools  # noqa: E402
+from api.ai.agents import agent_config, get_agent  # noqa: E402
+from api.ai.context import CHAT_CONTEXT_TOKENS, CHAT_HISTORY_TURNS  # noqa: E402
+from api.ai.llms import get_chat_model  # noqa: E402
+
+tools.send_mail = lambda **kwargs: None
+
+
+class PromptTokens(BaseCallbackHandler):
+    """Adds up the prompt tokens of every chat model call."""
+
+    def __init__(self):
+        self.tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.tokens += sum(count_tokens_approximately(batch) for batch in messages)
+
+
+def message(turn: int) -> str:
+    return (f"Turn {turn}: draft and send me a short note about item {turn} of the "
+            f"project plan, mention the deadline and who owns it.")
+
+
+def replay_turn(history: list, turn: int, config: dict) -> list:
+    history = history + [{"role": "user", "content": message(turn)}]
+    return get_agent("send_email").invoke({"messages": history}, config=config)["messages"]
+
+
+def memory_turn(conversation: str, turn: int, config: dict):
+    get_agent("chat").invoke(
+        {"messages": [{"role": "user", "content": message(turn)}]},
+        config={**config, **agent_config(thread_id=conversation)},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per model call")
+    args = parser.parse_args()
+
+    get_chat_model().latency = args.latency
+    report_at = sorted({1, 2, 5, 10, 25, 50, 100, args.turns} & set(range(1, args.turns + 1)))
+    print(f"memory: last {CHAT_HISTORY_TURNS} turns verbatim + summary, {CHAT_CONTEXT_TOKENS} token budget")
+    print(f"{'turn':>5} {'replay tokens':>13} {'replay ms':>10} {'memory tokens':>13} {'memory ms':>10}")
+    history = []
+    for turn in range(1, args.turns + 1):
+        replay, memory = PromptTokens(), PromptTokens()
+        start = time.perf_counter()
+        history = replay_turn(history, turn, {"callbacks": [replay]})
+        replay_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        memory_turn("benchmark", turn, {"callbacks": [memory]})
+        memory_ms = (time.perf_counter() - start) * 1000
+        if turn in report_at:
+            print(f"{turn:>5} {replay.tokens:>13,} {replay_ms:>10.1f} {memory.tokens:>13,} {memory_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
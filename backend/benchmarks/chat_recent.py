@@ -0,0 +1,75 @@
+"""Benchmark GET /api/chats/recent/ queries against table size.
+
+Fills a throwaway SQLite database with chat messages and times, per table
+size, the previous query (``select(ChatMessage)``, fetch every row, slice
+the first 10 in Python) against the keyset query used now
+(``recent_messages_query``): the first page and a page deep in the
+history reached through a cursor. Also prints the query plan to show the
+``(created_at, id)`` index is used.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/chat_recent.py [max rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "chat.db")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from sqlmodel import Session, SQLModel, select  # noqa: E402
+
+from api.chat.models import ChatMessage  # noqa: E402
+from api.chat.queries import recent_messages_query  # noqa: E402
+from api.db import engine  # noqa: E402
+from api.email.queries import encode_cursor  # noqa: E402
+
+
+def timed(run, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def grow(session: Session, start: int, stop: int):
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    session.execute(ChatMessage.__table__.insert(), [
+        {"message": f"Message {i}: please draft a follow-up about the Q3 plan. " * 3,
+         "conversation_id": f"{i // 20:032x}", "created_at": base + timedelta(seconds=i)}
+        for i in range(start, stop)
+    ])
+    session.commit()
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    SQLModel.metadata.create_all(engine)
+    print(f"{'rows':>8} {'old ms':>8} {'page 1 ms':>10} {'deep page ms':>13}")
+    with Session(engine) as session:
+        size = 0
+        for target in (1_000, 10_000, 50_000, max_rows):
+            if target > max_rows or target <= size:
+                continue
+            grow(session, size, target)
+            size = target
+            old = timed(lambda: session.exec(select(ChatMessage)).fetchall()[:10])
+            first = timed(lambda: session.exec(recent_messages_query(10)).all())
+            middle = session.get(ChatMessage, size // 2)
+            cursor = encode_cursor(middle.created_at, middle.id)
+            deep = timed(lambda: session.exec(recent_messages_query(10, cursor)).all())
+            print(f"{size:>8,} {old:>8.2f} {first:>10.3f} {deep:>13.3f}")
+
+        compiled = recent_messages_query(10, cursor).compile(engine, compile_kwargs={"literal_binds": True})
+        plan = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+        print("\nplan:", "; ".join(row[-1] for row in plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Perceived latency of a multi-step chat turn: blocking vs streamed.
+
+Runs chat turns that call a tool (model -> send_me_email -> model) on the
+fake chat model (``LLM_PROVIDER=fake``) with simulated model latency,
+output speed and tool time. Reports the blocking ``ainvoke`` time (what
+``POST /api/chats/`` waits for) against ``stream_agent_events`` (what
+``POST /api/chats/stream`` sends): time to the first event, to the first
+answer token and to the final message.
+
+Needs no API key, network or database server.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/chat_stream.py [--turns 5] [--latency 0.3] [--tool-seconds 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["LLM_MODEL"] = "fake-benchmark"
+os.environ["CHAT_MEMORY"] = "memory"
+os.environ.pop("LLM_PROVIDERS", None)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import api.ai.tools as tools  # noqa: E402
+from api.ai.agents import agent_config, get_agent, stream_agent_events  # noqa: E402
+from api.ai.llms import get_chat_model  # noqa: E402
+from api.ai.memory import open_chat_memory  # noqa: E402
+
+
+def message(turn: int) -> dict:
+    return {"messages": [{"role": "user", "content": f"Please send me an email about item {turn}"}]}
+
+
+async def blocking(agent, turn: int) -> float:
+    start = time.perf_counter()
+    await agent.ainvoke(message(turn), config=agent_config(thread_id=f"blocking-{turn}"))
+    return time.perf_counter() - start
+
+
+async def streamed(agent, turn: int) -> dict:
+    start = time.perf_counter()
+    marks = {}
+    async for event, _ in stream_agent_events(agent, message(turn), agent_config(thread_id=f"stream-{turn}")):
+        now = time.perf_counter() - start
+        marks.setdefault("first event", now)
+        if event == "token":
+            marks.setdefault("first token", now)
+    marks["final message"] = time.perf_counter() - start
+    return marks
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="simulated output speed")
+    parser.add_argument("--tool-seconds", type=float, default=0.5, help="simulated SMTP send time")
+    args = parser.parse_args()
+
+    tools.send_mail = lambda **kwargs: time.sleep(args.tool_seconds)
+    model = get_chat_model()
+    model.latency, model.tokens_per_second = args.latency, args.tokens_per_second
+    await open_chat_memory()
+    agent = get_agent("chat")
+    await blocking(agent, -1)  # warm-up
+
+    waits = [await blocking(agent, turn) for turn in range(args.turns)]
+    marks = [await streamed(agent, turn) for turn in range(args.turns)]
+    print(f"model: {args.latency}s to first token, {args.tokens_per_second:g} tokens/s; "
+          f"tool: {args.tool_seconds}s; median of {args.turns} turns")
+    print(f"{'blocking response':<22} {statistics.median(waits) * 1000:>8.0f} ms")
+    for mark in ("first event", "first token", "final message"):
+        values = [m[mark] for m in marks if mark in m]
+        print(f"{'stream ' + mark:<22} {statistics.median(values) * 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
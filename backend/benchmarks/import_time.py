@@ -0,0 +1,97 @@
+"""Import-time budget check for the API.
+
+Imports ``main`` in fresh interpreters under ``python -X importtime`` and
+fails (exit status 1) when:
+
+- the best cumulative import time of ``main`` is over ``--budget-ms``, or
+- any module of the AI stack (LangChain, LangGraph, LangSmith, provider
+  SDKs, httpx) is imported: those must load on first use or in the
+  background warm-up, not before uvicorn can serve ``/api/health``.
+
+Prints the slowest modules by self time and the heaviest top-level
+packages so a regression can be traced to the import that caused it.
+No API key is needed; an unset ``DATABASE_URL`` defaults to a throwaway
+SQLite file.
+
+Runs in the Jenkins "Test Backend" stage.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/import_time.py [--budget-ms 1000] [--runs 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Top-level packages that must not be imported with the app
+DEFERRED = ("langchain", "langchain_core", "langchain_openai", "langchain_groq", "langgraph",
+            "langsmith", "openai", "groq", "httpx")
+
+
+def import_profile(module: str):
+    """Import ``module`` in a new interpreter; return ``[(name, self_us, cumulative_us)]``."""
+    env = {**os.environ, "PYTHONPATH": SRC}
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "import.db"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        rows.append((name.strip(), int(head.split(":")[1]), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS") or 1000))
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters; the fastest counts")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    import_profile(args.module)  # compile .pyc files first
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [next(cum for name, _, cum in rows if name == args.module) / 1000 for rows in profiles]
+    best = min(range(args.runs), key=totals.__getitem__)
+    rows = profiles[best]
+
+    print(f"import {args.module}: best {totals[best]:.0f} ms, "
+          f"median {sorted(totals)[args.runs // 2]:.0f} ms over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f} ms), {len(rows)} modules")
+
+    print(f"\n{'self ms':>8}  slowest modules")
+    for name, self_us, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{self_us / 1000:>8.1f}  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print(f"\n{'ms':>8}  heaviest packages")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{self_us / 1000:>8.1f}  {package}")
+
+    failures = []
+    deferred = sorted({name.split(".")[0] for name, _, _ in rows} & set(DEFERRED))
+    if deferred:
+        failures.append(f"AI stack imported at startup: {', '.join(deferred)}")
+    if totals[best] > args.budget_ms:
+        failures.append(f"import {args.module} took {totals[best]:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
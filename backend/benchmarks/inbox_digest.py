@@ -0,0 +1,85 @@
+"""Compare the old get_unread_emails output with the token-budgeted digest.
+
+Builds synthetic inboxes of growing size (long plain bodies with quoted
+replies and links, HTML bodies, to/cc/bcc headers) and reports, per
+inbox size, the estimated tokens of the old every-field dump against
+page 1 of the digest (with bodies and fields-only), the number of pages
+and the digest build time. Needs no mail server or model.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/inbox_digest.py [budget]
+"""
+
+import os
+import random
+import sys
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from api.ai.digest import build_digest, estimate_tokens  # noqa: E402
+
+
+WORDS = ("please review the attached proposal before our meeting we need to confirm the budget "
+         "and timeline for the next quarter let me know if you have questions thanks").split()
+SENDERS = ["Alice <alice@example.com>", "Bob <bob@corp.example>", "noreply@shop.example",
+           "Weekly Newsletter <newsletter@news.example>", "Carol <carol@example.org>"]
+SUBJECTS = ["Quick question", "URGENT: invoice overdue", "Your weekly digest", "Meeting tomorrow",
+            "Re: proposal", "Sale ends today", "Lunch?"]
+
+
+def make_email(i: int, rng: random.Random) -> dict:
+    body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(100, 800)))
+    body += "\n\nhttps://example.com/track?id=" + "x" * 60
+    body += "\n\nOn Mon, Bob wrote:\n" + "\n".join("> " + " ".join(rng.sample(WORDS, 8)) for _ in range(20))
+    sent = datetime(2025, 10, 6, tzinfo=timezone.utc) - timedelta(minutes=rng.randint(0, 2880))
+    return {
+        "uid": str(1000 + i),
+        "timestamp": format_datetime(sent),
+        "to": "me@example.com",
+        "cc": "team@example.com, boss@example.com",
+        "bcc": None,
+        "from": rng.choice(SENDERS),
+        "subject": rng.choice(SUBJECTS),
+        "body": body,
+        "html_body": f"<html><body><p>{body}</p></body></html>",
+    }
+
+
+def old_format(emails) -> str:
+    """The previous get_unread_emails output."""
+    cleaned = []
+    for email in emails:
+        data = email.copy()
+        data.pop("html_body", None)
+        msg = ""
+        for k, v in data.items():
+            msg += f"{k}:\t {v}"
+        cleaned.append(msg)
+    return "\n-----\n".join(cleaned)
+
+
+def main():
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(3)
+    print(f"budget: {budget} tokens")
+    print(f"{'emails':>7} {'old tokens':>11} {'digest p1':>10} {'shown':>6} {'pages':>6} "
+          f"{'fields p1':>10} {'shown':>6} {'pages':>6} {'build ms':>9}")
+    for size in (5, 20, 100, 1000):
+        emails = [make_email(i, rng) for i in range(size)]
+        old = estimate_tokens(old_format(emails))
+        start = time.perf_counter()
+        digest = build_digest(emails, budget=budget)
+        elapsed = (time.perf_counter() - start) * 1000
+        fields = build_digest(emails, budget=budget, fields_only=True)
+        assert digest.tokens <= budget and fields.tokens <= budget
+        print(f"{size:>7} {old:>11,} {digest.tokens:>10} {digest.shown:>6} {digest.pages:>6} "
+              f"{fields.tokens:>10} {fields.shown:>6} {fields.pages:>6} {elapsed:>9.1f}")
+    print("\npage 1 sample:\n" + "\n".join(digest.text.splitlines()[:4]) + "\n...\n" + digest.text.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
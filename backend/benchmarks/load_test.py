@@ -0,0 +1,107 @@
+"""Concurrency load test for the LLM-bound endpoints.
+
+Fires batches of concurrent requests at a running server and reports, per
+concurrency level, throughput, latency percentiles and the concurrency the
+server actually sustained (throughput x mean latency, Little's law). A
+worker stops scaling once the sustained concurrency flattens out: for sync
+routes that is the threadpool size, for async routes it is bounded by the
+model provider instead.
+
+Usage::
+
+    python benchmarks/load_test.py --url http://localhost:8080 \\
+        --path /api/emails/draft --levels 10,50,100,200,400
+
+Run it against one uvicorn worker before and after a change to compare
+the maximum concurrent requests per worker. Use ``bypass_cache`` (the
+default payload sets it) so every request reaches the model.
+
+``--asgi main:app`` drives the app in-process instead (run from
+backend/src), which keeps client overhead out of the measurement on
+small machines.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import statistics
+import time
+
+import httpx
+
+
+DEFAULT_PAYLOAD = {
+    "recipient": "loadtest@example.com",
+    "prompt": "Thank you note after the quarterly review",
+    "bypass_cache": True,
+}
+
+
+async def run_level(client: httpx.AsyncClient, path: str, payload: dict, concurrency: int, rounds: int):
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+            if response.status_code >= 400:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    throughput = len(latencies) / elapsed
+    mean = statistics.fmean(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": throughput,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "sustained": throughput * mean,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--path", default="/api/emails/draft")
+    parser.add_argument("--levels", default="10,50,100,200,400",
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="Batches per level")
+    parser.add_argument("--payload", help="JSON request body (default: draft request)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--asgi", help="Load an app as module:attr and call it in-process")
+    args = parser.parse_args()
+
+    payload = json.loads(args.payload) if args.payload else DEFAULT_PAYLOAD
+    levels = [int(level) for level in args.levels.split(",")]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+
+    print(f"{'conc':>6} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'sustained':>10}")
+    transport = None
+    if args.asgi:
+        module, attr = args.asgi.split(":")
+        transport = httpx.ASGITransport(app=getattr(importlib.import_module(module), attr))
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=args.timeout, transport=transport
+    ) as client:
+        for level in levels:
+            r = await run_level(client, args.path, payload, level, args.rounds)
+            print(f"{r['concurrency']:>6} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+                  f"{r['p50']:>7.2f} {r['p95']:>7.2f} {r['sustained']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
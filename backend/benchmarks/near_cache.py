@@ -0,0 +1,128 @@
+"""Benchmark the near-duplicate draft cache on a synthetic prompt corpus.
+
+Fills ``NearDuplicateCache`` with N distinct synthetic prompts, then
+measures lookups for:
+
+- reworded copies of cached prompts (should hit),
+- cached prompts with one content word swapped (should miss; a hit here
+  is a false positive),
+- prompts that were never cached (should miss).
+
+Reports hit rates, lookup latency percentiles and resident memory.
+Needs no database or model.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/near_cache.py [entries] [threshold]
+"""
+
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from api.ai.near_cache import NearDuplicateCache  # noqa: E402
+
+
+INTENTS = [
+    "thank you", "follow up", "apology", "invitation", "reminder", "introduction",
+    "request", "announcement", "congratulations", "feedback", "proposal", "update",
+    "welcome", "farewell", "complaint", "confirmation", "rejection", "offer",
+]
+PREFIXES = ["", "write an email", "please draft a", "compose a", "can you write a"]
+LINKERS = ["about", "for", "regarding", "after", "to the", "on"]
+TONES = ["professional", "casual", "friendly", "formal"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "te", "su", "no", "vi", "pe", "da", "zo", "ri", "ba", "fe", "gu", "ho"]
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_prompt(intent: str, words, rng: random.Random) -> str:
+    prefix = rng.choice(PREFIXES)
+    return " ".join(filter(None, [prefix, intent, rng.choice(LINKERS), " ".join(words)]))
+
+
+def reword(prompt: str, rng: random.Random) -> str:
+    """Same request, different wording noise."""
+    words = prompt.split()
+    for prefix in PREFIXES[1:]:
+        if prompt.startswith(prefix):
+            words = words[len(prefix.split()):]
+            break
+    # Pluralize some topic words (the last three)
+    words = words[:-3] + [w + "s" if rng.random() < 0.2 else w for w in words[-3:]]
+    text = " ".join(words)
+    text = rng.choice(["Please write ", "Draft an email: ", "", "Compose a "]) + text
+    return text.upper() if rng.random() < 0.1 else text + rng.choice(["", ".", "!", " please"])
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def timed_lookups(cache, queries):
+    latencies, hits = [], 0
+    for prompt, tone in queries:
+        start = time.perf_counter()
+        found = cache.get(prompt, tone)
+        latencies.append(time.perf_counter() - start)
+        hits += found is not None
+    return hits / len(queries), latencies
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.95
+    queries = 10_000
+    rng = random.Random(7)
+    vocabulary = make_vocabulary(20_000, rng)
+
+    cache = NearDuplicateCache(threshold=threshold, maxsize=entries)
+    corpus = []
+    start = time.perf_counter()
+    for i in range(entries):
+        words = rng.sample(vocabulary, 3)
+        intent = rng.choice(INTENTS)
+        tone = rng.choice(TONES)
+        prompt = make_prompt(intent, words, rng)
+        cache.set(prompt, tone, {"id": i})
+        if i % max(1, entries // queries) == 0:
+            corpus.append((intent, words, prompt, tone))
+    fill = time.perf_counter() - start
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    reworded = [(reword(prompt, rng), tone) for _, _, prompt, tone in corpus]
+    swapped = []
+    for intent, words, _, tone in corpus:
+        changed = list(words)
+        changed[rng.randrange(len(changed))] = rng.choice(vocabulary)
+        swapped.append((make_prompt(intent, changed, rng), tone))
+    unseen = [
+        (make_prompt(rng.choice(INTENTS), rng.sample(vocabulary, 3), rng), rng.choice(TONES))
+        for _ in range(len(corpus))
+    ]
+
+    print(f"entries: {len(cache):,}  threshold: {threshold}  max distance: {cache.max_distance} bits")
+    print(f"fill: {fill:.1f} s ({entries / fill:,.0f} inserts/s)  peak RSS: {rss_mb:,.0f} MB")
+    print(f"{'query set':<26} {'hit rate':>9} {'p50 us':>8} {'p99 us':>8}")
+    for label, batch in [
+        ("reworded (want hit)", reworded),
+        ("one word swapped (miss)", swapped),
+        ("unseen (want miss)", unseen),
+    ]:
+        rate, latencies = timed_lookups(cache, batch)
+        print(f"{label:<26} {rate:>9.2%} {percentile(latencies, 0.5) * 1e6:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
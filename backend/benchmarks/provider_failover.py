@@ -0,0 +1,298 @@
+"""Exercise the provider router against local stub providers.
+
+Starts OpenAI-compatible stub servers on localhost (``/v1/chat/completions``)
+that can be slow, have a latency tail, or answer with 429/500, and routes
+concurrent structured-output calls (``EmailMessage``) through
+``RoutedChatModel``. For each scenario it reports which provider served,
+latency percentiles, hedges, failovers and errors, and checks the
+router's behaviour in each scenario.
+
+Scenarios:
+
+- healthy primary: everything is served by the primary, no hedges
+- primary latency tail, without and with hedging
+- primary rate limited (429): immediate failover, then cooldown
+- primary failing 30% with 500: failed calls fail over
+- primary down (connection refused)
+
+Checks (the script exits 1 if any fails):
+
+- no scenario returns an error to the caller
+- hedges are sent only in the latency-tail scenario with hedging on, and
+  there they cut p99 well below the 2 s tail
+- a rate-limited primary gets no requests while it is cooling down
+- failing or unreachable primaries fail over on every failed call
+
+Needs no API key or network access. Runs in the Jenkins "Test Backend"
+stage.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/provider_failover.py [requests] [concurrency]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import api.ai.router as router_module  # noqa: E402
+from api.ai.router import RoutedChatModel  # noqa: E402
+from api.ai.schemas import EmailMessage  # noqa: E402
+from langchain_openai import ChatOpenAI  # noqa: E402
+
+
+# Seconds rate-limited stubs ask clients to wait; outlasts the scenario
+RETRY_AFTER = 5
+
+
+class StubBehaviour:
+    """How a stub provider answers; mutable between scenarios."""
+
+    def __init__(self, delay=0.05, tail=0.0, tail_delay=2.0, status=None, error_rate=0.0):
+        self.delay = delay
+        self.tail = tail
+        self.tail_delay = tail_delay
+        self.status = status
+        self.error_rate = error_rate
+        self.requests = 0
+
+
+def make_handler(name: str, behaviour: StubBehaviour, rng: random.Random):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload: dict, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, request: dict, message: dict):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for delta, finish in [(message, None), ({}, "stop")]:
+                chunk = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", name),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            except ValueError:
+                return  # client gave up while sending
+            behaviour.requests += 1
+            if behaviour.status == 429:
+                return self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                  {"Retry-After": str(RETRY_AFTER)})
+            if behaviour.status or rng.random() < behaviour.error_rate:
+                return self._send(behaviour.status or 500, {"error": {"message": "upstream error"}})
+            time.sleep(behaviour.tail_delay if rng.random() < behaviour.tail else behaviour.delay)
+            message = {"role": "assistant", "content": f"Hello from {name}"}
+            if request.get("tools"):
+                function = request["tools"][0]["function"]
+                arguments = {"subject": f"Served by {name}", "content": "Stub draft."}
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "index": 0,
+                        "id": "call_stub",
+                        "type": "function",
+                        "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+                    }],
+                }
+            if request.get("stream"):
+                return self._stream(request, message)
+            self._send(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", name),
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 20, "completion_tokens": 10, "total_tokens": 30},
+            })
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Cancelled hedges close their connection before the stub answers
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_stub(name: str, behaviour: StubBehaviour, seed: int) -> str:
+    server = StubServer(("127.0.0.1", 0), make_handler(name, behaviour, random.Random(seed)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def provider(base_url: str, model: str) -> ChatOpenAI:
+    return ChatOpenAI(model=model, base_url=base_url, api_key="stub", max_retries=0, timeout=10)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else float("nan")
+
+
+async def run(router: RoutedChatModel, requests: int, concurrency: int):
+    llm = router.with_structured_output(EmailMessage)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, served, errors = [], {}, 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await llm.ainvoke(f"Write email {i}")
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            served[result.subject] = served.get(result.subject, 0) + 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, served, errors
+
+
+def report(label: str, router: RoutedChatModel, result):
+    latencies, served, errors = result
+    stats = router.stats()
+    print(f"\n{label}")
+    print(f"  p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+          f"  max {max(latencies, default=0) * 1000:7.1f} ms  errors {errors}")
+    print(f"  served: {', '.join(f'{k.split()[-1]}={v}' for k, v in sorted(served.items()))}")
+    for name, snapshot in stats.items():
+        print(f"  {name:<9} calls {snapshot['calls']:4}  errors {snapshot['errors']:4}  "
+              f"hedges {snapshot['hedges']:4}  failovers {snapshot['failovers']:4}  "
+              f"p95 {snapshot['p95_seconds']}  cooling down {snapshot['cooling_down']}")
+
+
+violations = []
+
+
+def check(ok: bool, message: str):
+    print(f"  {'ok  ' if ok else 'FAIL'} {message}")
+    if not ok:
+        violations.append(message)
+
+
+def total(router: RoutedChatModel, key: str) -> int:
+    return sum(snapshot[key] for snapshot in router.stats().values())
+
+
+def make_router(urls, hedge=True) -> RoutedChatModel:
+    return RoutedChatModel(
+        providers=[provider(url, name) for name, url in urls],
+        names=[name for name, _ in urls],
+        hedge=hedge,
+    )
+
+
+async def scenario(label, urls, requests, concurrency, hedge=True, warmup=0, hedges=False):
+    """Run a scenario, report it and check the checks every scenario shares.
+
+    Returns:
+        tuple: The router and the ``run`` result (latencies, served, errors)
+    """
+    router = make_router(urls, hedge)
+    if warmup:
+        await run(router, warmup, concurrency)  # learn the primary's p95
+    result = await run(router, requests, concurrency)
+    report(label, router, result)
+    check(result[2] == 0, f"{label}: no errors reach the caller (got {result[2]})")
+    if not hedges:
+        check(total(router, "hedges") == 0, f"{label}: no hedges sent (got {total(router, 'hedges')})")
+    return router, result
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    # The stubs answer in ~50 ms; learn p95 quickly. The hedge floor stays
+    # well above the stubs' normal latency so a busy CI machine doesn't hedge
+    router_module.LLM_HEDGE_MIN_SAMPLES = 20
+    router_module.LLM_HEDGE_DELAY = 0.5
+    router_module.LLM_HEDGE_MIN_DELAY = 0.5
+
+    primary, secondary = StubBehaviour(), StubBehaviour(delay=0.08)
+    urls = [("primary", start_stub("primary", primary, 1)), ("secondary", start_stub("secondary", secondary, 2))]
+
+    label = "healthy primary"
+    router, (_, served, _) = await scenario(label, urls, requests, concurrency)
+    check(served == {"Served by primary": requests}, f"{label}: the primary serves every request")
+
+    primary.tail = 0.04
+    await scenario("primary latency tail (4% take 2 s), hedging off", urls, requests, concurrency, hedge=False)
+    label = "primary latency tail (4% take 2 s), hedging at p95"
+    router, (latencies, _, _) = await scenario(label, urls, requests, concurrency, warmup=50, hedges=True)
+    check(router.stats()["primary"]["hedges"] > 0, f"{label}: hedges are sent")
+    p99 = percentile(latencies, 0.99)
+    check(p99 < primary.tail_delay / 2, f"{label}: p99 {p99 * 1000:.0f} ms is under half the tail")
+    primary.tail = 0.0
+
+    primary.status = 429
+    label = f"primary rate limited (429, Retry-After: {RETRY_AFTER})"
+    router, _ = await scenario(label, urls, requests, concurrency)
+    calls = router.stats()["primary"]["calls"]
+    check(calls <= concurrency, f"{label}: only the first wave reaches the primary ({calls} calls)")
+    before = primary.requests
+    await run(router, 20, concurrency)
+    during = primary.requests - before
+    print(f"  during cooldown the primary received {during} of 20 requests")
+    check(router.stats()["primary"]["cooling_down"] and during == 0,
+          f"{label}: no requests reach the primary while it cools down (got {during})")
+    primary.status = None
+
+    primary.error_rate = 0.3
+    label = "primary failing 30% with 500"
+    router, _ = await scenario(label, urls, requests, concurrency)
+    stats = router.stats()["primary"]
+    check(stats["errors"] > 0 and stats["failovers"] == stats["errors"],
+          f"{label}: every failed call fails over ({stats['failovers']} of {stats['errors']})")
+    primary.error_rate = 0.0
+
+    label = "primary down (connection refused)"
+    router, (_, served, _) = await scenario(
+        label, [("primary", "http://127.0.0.1:9/v1"), urls[1]], requests, concurrency)
+    check(served == {"Served by secondary": requests}, f"{label}: the secondary serves every request")
+
+    if violations:
+        print(f"\n{len(violations)} check(s) failed:")
+        for message in violations:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("\nall checks passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
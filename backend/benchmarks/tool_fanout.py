@@ -0,0 +1,80 @@
+"""Benchmark one multi-tool assistant turn: sequential vs concurrent.
+
+Simulates a turn where the model asks to read the inbox and send an email
+together, using stand-in tools that sleep for typical IMAP/SMTP latencies.
+Compares the old one-after-another loop with ``run_tool_calls``, and
+shows a hung tool being cut off by its timeout. No mail server or model
+is used.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/tool_fanout.py [rounds]
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from langchain_core.tools import tool  # noqa: E402
+
+from api.ai.assistants import run_tool_calls  # noqa: E402
+
+
+@tool
+def get_unread_emails(hours_ago: int = 48) -> str:
+    """Stand-in for the IMAP fetch."""
+    time.sleep(0.8)
+    return "from: a@example.com\tsubject: Hi"
+
+
+@tool
+def send_me_email(subject: str, content: str) -> str:
+    """Stand-in for the SMTP send."""
+    time.sleep(0.5)
+    return "sent email"
+
+
+@tool
+def hung_tool() -> str:
+    """Stand-in for a tool stuck on a dead connection."""
+    time.sleep(5)
+    return "too late"
+
+
+TOOLS = {t.name: t for t in (get_unread_emails, send_me_email, hung_tool)}
+TURN = [
+    {"name": "get_unread_emails", "args": {"hours_ago": 24}, "id": "call_1", "type": "tool_call"},
+    {"name": "send_me_email", "args": {"subject": "Summary", "content": "..."}, "id": "call_2", "type": "tool_call"},
+]
+
+
+def sequential(tool_calls):
+    return [TOOLS[call["name"]].invoke(call) for call in tool_calls]
+
+
+def timed(label: str, func, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        messages = func(TURN)
+    per_turn = (time.perf_counter() - start) / rounds
+    print(f"{label:<12} {per_turn * 1000:8.0f} ms/turn  -> {[m.content for m in messages]}")
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    timed("sequential", sequential, rounds)
+    timed("concurrent", lambda calls: run_tool_calls(calls, TOOLS), rounds)
+
+    start = time.perf_counter()
+    calls = TURN + [{"name": "hung_tool", "args": {}, "id": "call_3", "type": "tool_call"}]
+    messages = run_tool_calls(calls, TOOLS, timeout=1.0)
+    print(f"{'with hang':<12} {(time.perf_counter() - start) * 1000:8.0f} ms/turn  -> "
+          f"{[(m.tool_call_id, m.status) for m in messages]}")
+
+
+if __name__ == "__main__":
+    main()
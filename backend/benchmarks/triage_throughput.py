@@ -0,0 +1,111 @@
+"""Benchmark inbox triage throughput (emails triaged per minute).
+
+Runs ``triage_emails`` over a synthetic inbox with different packing and
+concurrency settings and reports emails/minute, LLM calls and estimated
+prompt tokens. The first row (one call per email, one at a time) is what
+triaging through one agent round trip per email amounts to.
+
+By default the model is simulated: each call waits
+``--ttft + output tokens / --tokens-per-second``, and the output scales
+with the number of emails packed into the call. Use ``--live`` to call
+the configured model instead (needs ``GROQ_API_KEY``; mind rate limits).
+Results are stored in a throwaway SQLite database.
+
+Usage (from backend/src)::
+
+    python ../benchmarks/triage_throughput.py [--emails 200] [--live]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "triage.db")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+import api.ai.triage as triage  # noqa: E402
+from api.ai.digest import estimate_tokens  # noqa: E402
+from api.ai.schemas import EmailTriage, InboxTriage  # noqa: E402
+from api.db import engine  # noqa: E402
+
+
+# (batch size, concurrency)
+SETTINGS = [(1, 1), (1, 4), (10, 1), (10, 4), (25, 4), (25, 8)]
+OUTPUT_TOKENS_PER_EMAIL = 40
+SUBJECTS = ["Invoice 4411 overdue", "Team lunch Friday?", "Your weekly digest", "Interview schedule",
+            "Password reset", "Re: Q3 budget proposal", "50% off this weekend only"]
+
+
+def make_inbox(size: int):
+    return [
+        {
+            "uid": str(10_000 + i),
+            "from": f"sender{i % 17}@example.com",
+            "subject": SUBJECTS[i % len(SUBJECTS)],
+            "body": ("Hi, following up on the item below. Could you confirm by Thursday? " * 12),
+        }
+        for i in range(size)
+    ]
+
+
+def simulated_model(ttft: float, tokens_per_second: float) -> RunnableLambda:
+    async def respond(messages):
+        count = messages[-1][1].count("\n\n") + 1
+        await asyncio.sleep(ttft + count * OUTPUT_TOKENS_PER_EMAIL / tokens_per_second)
+        return InboxTriage(emails=[
+            EmailTriage(number=n, category="work", priority="normal", needs_reply=n % 3 == 0,
+                        summary="Sender asks for confirmation by Thursday.")
+            for n in range(1, count + 1)
+        ])
+    return RunnableLambda(respond)
+
+
+def prompt_tokens(emails, batch_size: int) -> int:
+    return sum(
+        estimate_tokens(" ".join(text for _, text in triage.build_triage_messages(emails[i:i + batch_size])))
+        for i in range(0, len(emails), batch_size)
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.3, help="simulated seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500, help="simulated output speed")
+    parser.add_argument("--live", action="store_true", help="call the configured model")
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    if not args.live:
+        model = simulated_model(args.ttft, args.tokens_per_second)
+        triage.get_structured_llm = lambda schema: model
+        print(f"simulated model: {args.ttft}s to first token, {args.tokens_per_second:g} tokens/s")
+
+    emails = make_inbox(args.emails)
+    print(f"{'batch':>5} {'concurrency':>11} {'LLM calls':>9} {'prompt tokens':>13} "
+          f"{'seconds':>8} {'emails/min':>10} {'failed':>6}")
+    for batch_size, concurrency in SETTINGS:
+        start = time.perf_counter()
+        report = await triage.triage_emails(
+            emails, batch_size=batch_size, max_concurrency=concurrency, retriage=True
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>5} {concurrency:>11} {report.llm_calls:>9} "
+              f"{prompt_tokens(emails, batch_size):>13,} {elapsed:>8.1f} "
+              f"{report.triaged / elapsed * 60:>10,.0f} {report.failed:>6}")
+
+    start = time.perf_counter()
+    report = await triage.triage_emails(emails)
+    print(f"re-run over the same inbox: {report.skipped} skipped, {report.llm_calls} LLM calls, "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
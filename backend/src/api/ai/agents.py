@@ -2,19 +2,33 @@
 
 Provides LangGraph-based AI agents with tool-calling capabilities
 for email operations like sending, reading, and researching.
+
+Compiling a ReAct graph is relatively expensive, so request handlers get
+agents from ``get_agent`` which compiles each one once per process.
+Anything that varies per request (thread id, user context) is passed at
+invocation time through the graph ``config`` (see ``agent_config``).
+``stream_agent_events`` streams a run as answer tokens and tool progress.
+LangGraph and the tools are imported when an agent is first built, so
+importing this module does not load the AI stack.
 """
 
-from langgraph.prebuilt import create_react_agent
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
 from api.ai.llms import get_openai_llm
-from api.ai.tools import (send_me_email, get_unread_emails, research_email)
 
 
-# Dictionary mapping tool names to their implementations
-EMAIL_TOOLS = {
-    "send_me_email": send_me_email,
-    "get_unread_emails": get_unread_emails
+# Progress text shown while a tool runs (stream_agent_events)
+TOOL_LABELS = {
+    "send_me_email": "Sending email…",
+    "get_unread_emails": "Fetching inbox…",
+    "research_email": "Researching…",
 }
+# Characters of tool output included in tool_end events
+TOOL_PREVIEW_CHARS = 200
 
+SEND_EMAIL_PROMPT = ("You are a helpful assistant for managing my email inbox for "
+                     "generating, sending and reviewing emails")
 
 def send_email_agent():
     """Create an AI agent for email sending operations.
@@ -31,6 +45,9 @@ def send_email_agent():
         >>> result = agent.invoke({"messages": [{"role": "user", 
         ...     "content": "Send thank you email to john@example.com"}]})
     """
+    from langgraph.prebuilt import create_react_agent
+    from api.ai.tools import send_me_email
+
     # Get LLM model instance
     model = get_openai_llm()
     
@@ -38,12 +55,45 @@ def send_email_agent():
     agent = create_react_agent(
         model=model,
         tools=[send_me_email],
-        prompt="You are a helpful assistant for managing my email inbox for "
-               "generating, sending and reviewing emails"
+        prompt=SEND_EMAIL_PROMPT
     )
     return agent
 
 
+def chat_agent():
+    """Create the email agent used by the chat, with conversation memory.
+    
+    Same tools and prompt as ``send_email_agent``, compiled with the
+    shared checkpointer (``api.ai.memory``) so runs with the same
+    ``thread_id`` continue one conversation, and with a pre-model hook
+    (``api.ai.context``) that keeps the prompt to a summary plus the
+    last few turns.
+    
+    Returns:
+        Agent: LangGraph ReAct agent with persistent, bounded memory
+        
+    Example:
+        >>> agent = chat_agent()
+        >>> config = agent_config(thread_id="conversation-1")
+        >>> agent.invoke({"messages": [{"role": "user", "content": "Hi, I'm Ann"}]}, config=config)
+        >>> agent.invoke({"messages": [{"role": "user", "content": "What's my name?"}]}, config=config)
+    """
+    from langgraph.prebuilt import create_react_agent
+    from api.ai.context import ChatState, context_hook
+    from api.ai.memory import get_checkpointer
+    from api.ai.tools import send_me_email
+
+    return create_react_agent(
+        model=get_openai_llm(),
+        tools=[send_me_email],
+        prompt=SEND_EMAIL_PROMPT,
+        state_schema=ChatState,
+        pre_model_hook=context_hook,
+        checkpointer=get_checkpointer(),
+        name="chat_agent",
+    )
+
+
 def get_research_agent():
     """Create an AI agent for email research and preparation.
     
@@ -58,6 +108,9 @@ def get_research_agent():
         >>> result = agent.invoke({"messages": [{"role": "user",
         ...     "content": "Research about product launch announcement"}]})
     """
+    from langgraph.prebuilt import create_react_agent
+    from api.ai.tools import research_email
+
     # Get LLM model instance
     model = get_openai_llm()
     
@@ -69,3 +122,125 @@ def get_research_agent():
         name='research_agent'
     )
     return agent
+
+
+# Agent factories by registry name
+AGENT_FACTORIES: Dict[str, Callable] = {
+    "send_email": send_email_agent,
+    "research": get_research_agent,
+    "chat": chat_agent,
+}
+
+_agents: Dict[str, Any] = {}
+_agents_lock = threading.Lock()
+
+
+def get_agent(name: str):
+    """Return the compiled agent registered as ``name``, building it once.
+    
+    Args:
+        name: Key in ``AGENT_FACTORIES`` ("send_email", "research" or "chat")
+    
+    Returns:
+        Agent: Shared compiled LangGraph agent; safe to invoke concurrently
+    
+    Example:
+        >>> agent = get_agent("send_email")
+        >>> result = agent.invoke(
+        ...     {"messages": [{"role": "user", "content": "Say hi to bob@example.com"}]},
+        ...     config=agent_config(thread_id="42"))
+    """
+    agent = _agents.get(name)
+    if agent is None:
+        factory = AGENT_FACTORIES.get(name)
+        if factory is None:
+            raise KeyError(f"Unknown agent: {name}")
+        with _agents_lock:
+            agent = _agents.get(name)
+            if agent is None:
+                agent = _agents[name] = factory()
+    return agent
+
+
+def agent_config(thread_id: Optional[str] = None, **context) -> Dict:
+    """Build the per-request ``config`` for invoking a shared agent.
+    
+    Args:
+        thread_id: Conversation/thread identifier for the run
+        **context: Extra per-request values (e.g. user id); available to
+            tools via ``configurable`` and recorded as run metadata
+    
+    Returns:
+        Dict: RunnableConfig for ``agent.invoke(..., config=...)``
+    """
+    configurable = dict(context)
+    if thread_id is not None:
+        configurable["thread_id"] = str(thread_id)
+    return {"configurable": configurable, "metadata": dict(configurable)}
+
+
+async def stream_agent_events(
+    agent, input: Dict, config: Optional[Dict] = None
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """Run an agent and stream its progress (LangGraph ``astream_events``).
+    
+    Only the agent's own model calls produce tokens: summaries made by the
+    context hook and model calls inside tools (e.g. ``research_email``)
+    are not part of the answer and are left out.
+    
+    Args:
+        agent: Compiled agent (``get_agent``)
+        input: Graph input, e.g. ``{"messages": [...]}``
+        config: Per-request config (``agent_config``)
+    
+    Yields:
+        Tuple[str, Dict]: ``("token", {"delta"})`` as the answer is written,
+            ``("tool_start", {"id", "name", "label", "input"})`` and
+            ``("tool_end", {"id", "name", "status", "output"})`` around each
+            tool call, and finally ``("message", {"content"})``
+    
+    Example:
+        >>> async for event, data in stream_agent_events(
+        ...         get_agent("chat"), {"messages": [("user", "Any new mail?")]},
+        ...         agent_config(thread_id="42")):
+        ...     print(event, data)
+        tool_start {'id': '...', 'name': 'get_unread_emails', 'label': 'Fetching inbox…', ...}
+    """
+    final = None
+    async for event in agent.astream_events(input, config=config, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            if event["metadata"].get("langgraph_node") != "agent":
+                continue
+            delta = event["data"]["chunk"].text
+            if delta:
+                yield "token", {"delta": delta}
+        elif kind == "on_tool_start":
+            yield "tool_start", {
+                "id": event["run_id"],
+                "name": event["name"],
+                "label": TOOL_LABELS.get(event["name"], f"Running {event['name']}…"),
+                "input": event["data"].get("input"),
+            }
+        elif kind in ("on_tool_end", "on_tool_error"):
+            output = event["data"].get("output", event["data"].get("error"))
+            status = getattr(output, "status", None) or ("error" if kind == "on_tool_error" else "success")
+            text = str(getattr(output, "content", output))
+            yield "tool_end", {
+                "id": event["run_id"],
+                "name": event["name"],
+                "status": status,
+                "output": text[:TOOL_PREVIEW_CHARS],
+            }
+        elif kind == "on_chain_end" and not event["parent_ids"]:
+            final = event["data"].get("output")
+    messages = (final or {}).get("messages") if isinstance(final, dict) else None
+    if not messages:
+        raise RuntimeError("Agent run produced no messages")
+    yield "message", {"content": messages[-1].content}
+
+
+def warm_agents():
+    """Compile every registered agent ahead of the first request."""
+    for name in AGENT_FACTORIES:
+        get_agent(name)
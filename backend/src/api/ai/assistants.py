@@ -1,15 +1,105 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
 
 from api.ai.tools import ( send_me_email, get_unread_emails )
-from api.ai.llms import get_openai_llm
+from api.ai.llms import get_tool_llm
 EMAIL_TOOLS= {
     "send_me_email": send_me_email,
     "get_unread_emails": get_unread_emails
 }
 
 
+
+def parse_tool_timeouts(value: str) -> Dict[str, float]:
+    """Parse ``tool=seconds,...`` into per-tool timeouts.
+
+    Example:
+        >>> parse_tool_timeouts("research_email=30,get_unread_emails=10")
+        {'research_email': 30.0, 'get_unread_emails': 10.0}
+    """
+    timeouts = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = entry.partition("=")
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"`TOOL_TIMEOUTS` entry {entry!r} must look like tool=seconds") from None
+    return timeouts
+
+
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT") or 30)
+TOOL_MAX_WORKERS = int(os.environ.get("TOOL_MAX_WORKERS") or 16)
+# Per-tool overrides of TOOL_TIMEOUT, in seconds
+TOOL_TIMEOUTS = parse_tool_timeouts(os.environ.get("TOOL_TIMEOUTS") or "")
+
+# Tools do blocking IMAP/SMTP I/O, so they run on threads
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="email-tool")
+
+
+def _error_message(tool_call: Dict, content: str) -> ToolMessage:
+    return ToolMessage(
+        content=content,
+        name=tool_call.get("name"),
+        tool_call_id=tool_call.get("id"),
+        status="error",
+    )
+
+
+def run_tool_calls(tool_calls: List[Dict], tools: Dict = EMAIL_TOOLS, timeout: Optional[float] = None) -> List[ToolMessage]:
+    """Run one turn's tool calls concurrently.
+
+    Every call is dispatched to a thread at once, so a turn that reads the
+    inbox and sends an email costs the slowest tool rather than the sum.
+    Each call gets a ``ToolMessage`` back, in call order; unknown tools,
+    tool errors and timeouts become error messages the model can read
+    instead of failing the turn.
+
+    Args:
+        tool_calls: ``tool_calls`` of the model's response
+        tools: Tool name to LangChain tool
+        timeout: Seconds to wait per call (default: ``TOOL_TIMEOUTS`` or ``TOOL_TIMEOUT``)
+
+    Returns:
+        List[ToolMessage]: One message per tool call, in call order
+
+    Note:
+        A timed-out tool keeps running on its thread; only the wait stops.
+    """
+    start = time.monotonic()
+    futures = []
+    for tool_call in tool_calls:
+        tool_func = tools.get(tool_call.get("name"))
+        if tool_func is None:
+            futures.append(None)
+            continue
+        # Keep request context (instrumentation records, callbacks) on the worker thread
+        context = contextvars.copy_context()
+        futures.append(_tool_executor.submit(context.run, tool_func.invoke, {**tool_call, "type": "tool_call"}))
+
+    messages = []
+    for tool_call, future in zip(tool_calls, futures):
+        name = tool_call.get("name")
+        if future is None:
+            messages.append(_error_message(tool_call, f"Error: unknown tool {name!r}"))
+            continue
+        limit = timeout if timeout is not None else TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT)
+        try:
+            messages.append(future.result(timeout=max(0.0, start + limit - time.monotonic())))
+        except TimeoutError:
+            print(f"Tool {name} timed out after {limit}s")
+            messages.append(_error_message(tool_call, f"Error: {name} timed out after {limit:g} seconds"))
+        except Exception as e:
+            messages.append(_error_message(tool_call, f"Error: {name} failed: {e}"))
+    return messages
+
+
 def email_assistant(query: str):
-    llm_base = get_openai_llm()
-    llm = llm_base.bind_tools(list(EMAIL_TOOLS.values()))
+    llm = get_tool_llm("email_assistant", EMAIL_TOOLS.values())
 
     messages = [
         (
@@ -21,14 +111,7 @@ def email_assistant(query: str):
     response =  llm.invoke(messages)
     messages.append(response)
     if hasattr(response, "tool_calls") and response.tool_calls:
-        for tool_call in response.tool_calls:
-            tool_name = tool_call.get("name")
-            tool_func = EMAIL_TOOLS.get(tool_name)
-            tool_args = tool_call.get('args')
-            if not tool_func:
-                continue
-            tool_result = tool_func.invoke(tool_args)
-            messages.append(tool_result)
+        messages.extend(run_tool_calls(response.tool_calls))
         final_response = llm.invoke(messages)
         return final_response
     return response
@@ -0,0 +1,234 @@
+"""Generation cache for AI email drafts.
+
+Caches ``generate_email_message`` results keyed by the normalized prompt,
+tone and model name. Lookups hit a bounded in-process LRU with a TTL
+first; with ``DRAFT_CACHE_BACKEND=db`` misses fall through to a shared
+table so every worker benefits from a draft generated by any of them.
+An optional near-duplicate tier matches reworded prompts.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Optional
+
+from sqlmodel import Session, delete, select
+
+from api.db import engine
+from api.ai.models import GenerationCacheEntry, get_utc_now
+from api.ai.near_cache import DRAFT_NEAR_CACHE, NearDuplicateCache
+
+
+DRAFT_CACHE_SIZE = int(os.environ.get("DRAFT_CACHE_SIZE") or 1024)
+DRAFT_CACHE_TTL = float(os.environ.get("DRAFT_CACHE_TTL") or 3600)
+DRAFT_CACHE_BACKEND = (os.environ.get("DRAFT_CACHE_BACKEND") or "memory").lower()
+# Seconds between deletes of expired rows from the DB tier, per worker
+DRAFT_CACHE_PURGE_INTERVAL = 600
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase and collapse whitespace so trivial edits share a key."""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+def cache_key(prompt: str, tone: str, model: str) -> str:
+    raw = json.dumps([normalize_prompt(prompt), tone.strip().lower(), model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = DRAFT_CACHE_SIZE, ttl: float = DRAFT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _upsert_statement(session: Session):
+    """Dialect-specific INSERT that replaces an existing entry for the key."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(GenerationCacheEntry)
+    return statement.on_conflict_do_update(
+        index_elements=["key"],
+        set_={column: statement.excluded[column] for column in ("value", "expires_at", "created_at")},
+    )
+
+
+class DBCacheBackend:
+    """Shared cache tier stored in the application database.
+
+    Expired rows are deleted from ``set`` at most every
+    ``DRAFT_CACHE_PURGE_INTERVAL`` seconds.
+    """
+
+    def __init__(self, ttl: float = DRAFT_CACHE_TTL, purge_interval: float = DRAFT_CACHE_PURGE_INTERVAL):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.hits = 0
+        self.misses = 0
+        self.purged = 0
+        self._next_purge = time.monotonic() + purge_interval
+
+    def get(self, key: str) -> Optional[Dict]:
+        with Session(engine) as session:
+            entry = session.exec(
+                select(GenerationCacheEntry).where(
+                    GenerationCacheEntry.key == key,
+                    GenerationCacheEntry.expires_at > get_utc_now(),
+                )
+            ).first()
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(entry.value)
+
+    def set(self, key: str, value: Dict):
+        entry = GenerationCacheEntry(
+            key=key,
+            value=json.dumps(value),
+            expires_at=get_utc_now() + timedelta(seconds=self.ttl),
+        )
+        with Session(engine) as session:
+            statement = _upsert_statement(session)
+            if statement is not None:
+                session.execute(statement, [entry.model_dump()])
+            else:
+                session.merge(entry)
+            session.commit()
+        if time.monotonic() >= self._next_purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete expired rows; returns how many were removed."""
+        self._next_purge = time.monotonic() + self.purge_interval
+        with Session(engine) as session:
+            result = session.exec(delete(GenerationCacheEntry).where(
+                GenerationCacheEntry.expires_at < get_utc_now()
+            ))
+            session.commit()
+        self.purged += result.rowcount
+        return result.rowcount
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "purged": self.purged}
+
+
+class DraftCache:
+    """Two-tier draft cache: in-process LRU in front of an optional DB tier.
+
+    With ``DRAFT_NEAR_CACHE=1`` exact misses also try the near-duplicate
+    tier (``api.ai.near_cache``), which needs the raw prompt and tone.
+    Values are plain dicts (``EmailMessage.model_dump()``), so callers
+    always get a fresh model instance back.
+    """
+
+    def __init__(self, backend: str = DRAFT_CACHE_BACKEND, near: bool = DRAFT_NEAR_CACHE):
+        self.memory = TTLCache()
+        self.shared = DBCacheBackend() if backend == "db" else None
+        self.near = NearDuplicateCache(ttl=DRAFT_CACHE_TTL) if near else None
+
+    def get(self, key: str, prompt: Optional[str] = None, tone: str = "professional") -> Optional[Dict]:
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                print(f"Draft cache lookup failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None and self.near is not None and prompt:
+            value = self.near.get(prompt, tone)
+        return value
+
+    def set(self, key: str, value: Dict, prompt: Optional[str] = None, tone: str = "professional"):
+        self.memory.set(key, value)
+        if self.near is not None and prompt:
+            self.near.set(prompt, tone, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                print(f"Draft cache write failed: {e}")
+
+    async def aget(self, key: str, prompt: Optional[str] = None, tone: str = "professional") -> Optional[Dict]:
+        """``get`` for async callers; only the DB tier runs in a thread."""
+        if self.shared is None:
+            return self.get(key, prompt, tone)
+        return await asyncio.to_thread(self.get, key, prompt, tone)
+
+    async def aset(self, key: str, value: Dict, prompt: Optional[str] = None, tone: str = "professional"):
+        if self.shared is None:
+            self.set(key, value, prompt, tone)
+        else:
+            await asyncio.to_thread(self.set, key, value, prompt, tone)
+
+    def stats(self) -> Dict:
+        stats = {"backend": "db" if self.shared else "memory", "memory": self.memory.stats()}
+        if self.shared is not None:
+            stats["db"] = self.shared.stats()
+        if self.near is not None:
+            stats["near"] = self.near.stats()
+        return stats
+
+
+draft_cache = DraftCache()
@@ -0,0 +1,162 @@
+"""LangChain callback handler behind ``api.ai.instrumentation``.
+
+Kept apart from the metrics registry so importing the app does not load
+LangChain; ``api.ai.llms`` and ``api.ai.tools`` import it when they build
+models and tools.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from api.ai.instrumentation import TOKEN_BUCKETS, MetricsRegistry, _request_calls, metrics
+
+
+def _model_name(serialized: Optional[Dict], metadata: Optional[Dict], kwargs: Dict) -> str:
+    metadata = metadata or {}
+    params = kwargs.get("invocation_params") or {}
+    return (
+        metadata.get("ls_model_name")
+        or params.get("model")
+        or params.get("model_name")
+        or (serialized or {}).get("name")
+        or "unknown"
+    )
+
+
+def _token_usage(response) -> Tuple[Optional[int], Optional[int]]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+def _served_by(response) -> Optional[str]:
+    """Provider that answered, as reported by the provider router."""
+    provider = (response.llm_output or {}).get("provider")
+    if provider:
+        return provider
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None and message.response_metadata.get("provider"):
+                return message.response_metadata["provider"]
+    return None
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """Callback handler feeding ``metrics`` and the per-request records."""
+
+    # Cheap bookkeeping only: run in the caller instead of an executor
+    run_inline = True
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.registry = registry
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, **record):
+        record["start"] = time.perf_counter()
+        record["calls"] = _request_calls.get()
+        with self._lock:
+            self._runs[run_id] = record
+
+    def _pop(self, run_id: UUID) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    def _publish(self, run: Dict[str, Any], record: Dict):
+        if run["calls"] is not None:
+            run["calls"].append(record)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, model=_model_name(serialized, metadata, kwargs), ttft=None)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, model=_model_name(serialized, metadata, kwargs), ttft=None)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and run["ttft"] is None:
+                run["ttft"] = time.perf_counter() - run["start"]
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run is None:
+            return
+        latency = time.perf_counter() - run["start"]
+        prompt_tokens, completion_tokens = _token_usage(response)
+        model = _served_by(response) or run["model"]
+        self.registry.increment("llm_calls", model)
+        self.registry.observe("llm_latency_seconds", model, latency)
+        if run["ttft"] is not None:
+            self.registry.observe("llm_ttft_seconds", model, run["ttft"])
+        if prompt_tokens is not None:
+            self.registry.observe("llm_prompt_tokens", model, prompt_tokens, TOKEN_BUCKETS)
+        if completion_tokens is not None:
+            self.registry.observe("llm_completion_tokens", model, completion_tokens, TOKEN_BUCKETS)
+        self._publish(run, {
+            "type": "llm",
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "ttft_ms": round(run["ttft"] * 1000, 1) if run["ttft"] is not None else None,
+            "latency_ms": round(latency * 1000, 1),
+        })
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._pop(run_id)
+        if run is None:
+            return
+        self.registry.increment("llm_errors", run["model"])
+        self._publish(run, {
+            "type": "llm",
+            "model": run["model"],
+            "error": type(error).__name__,
+            "latency_ms": round((time.perf_counter() - run["start"]) * 1000, 1),
+        })
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        self.registry.increment("llm_retries")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._start(run_id, name=name)
+
+    def _tool_done(self, run_id: UUID, error: Optional[BaseException] = None):
+        run = self._pop(run_id)
+        if run is None:
+            return
+        latency = time.perf_counter() - run["start"]
+        self.registry.increment("tool_calls", run["name"])
+        self.registry.observe("tool_latency_seconds", run["name"], latency)
+        record = {"type": "tool", "name": run["name"], "latency_ms": round(latency * 1000, 1)}
+        if error is not None:
+            self.registry.increment("tool_errors", run["name"])
+            record["error"] = type(error).__name__
+        self._publish(run, record)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._tool_done(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_done(run_id, error)
+
+
+instrumentation = InstrumentationHandler()
+
+
+def instrument_tools(*tools):
+    """Attach the instrumentation handler to LangChain tools."""
+    for tool in tools:
+        callbacks = list(tool.callbacks or [])
+        if instrumentation not in callbacks:
+            tool.callbacks = callbacks + [instrumentation]
+    return tools
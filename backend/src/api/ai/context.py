@@ -0,0 +1,166 @@
+"""Context-window management for the chat agent.
+
+A conversation kept by the checkpointer (``api.ai.memory``) grows with
+every turn; replaying it whole would make each request slower and more
+expensive than the last. ``context_hook`` runs before every model call of
+the chat agent and keeps the prompt a constant size:
+
+- The last ``CHAT_HISTORY_TURNS`` turns (a user message and everything the
+  agent did in response) are kept verbatim.
+- Older turns are folded into a rolling summary, stored in the graph
+  state, and removed from the checkpointed messages, so loading the
+  conversation stays cheap too.
+- What is sent to the model (summary plus recent turns) is trimmed to
+  ``CHAT_CONTEXT_TOKENS``, dropping whole turns from the oldest end and
+  never the current one.
+
+If the summary call fails the old turns stay in place for the next try
+and the prompt is still trimmed.
+"""
+
+import os
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from langchain_core.runnables import RunnableLambda
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+from api.ai.digest import truncate_to_tokens
+from api.ai.instrumentation import metrics
+from api.ai.llms import MODEL_NAME, get_chat_model
+
+
+CHAT_HISTORY_TURNS = int(os.environ.get("CHAT_HISTORY_TURNS") or 4)
+CHAT_CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS") or 3000)
+CHAT_SUMMARY_TOKENS = int(os.environ.get("CHAT_SUMMARY_TOKENS") or 300)
+# Per message, when writing old turns out for the summarizer
+SUMMARY_INPUT_TOKENS = 200
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep a running summary of a conversation between me and my email "
+    "assistant. Update the summary with the new messages. Keep names, email "
+    "addresses, subjects, decisions, emails sent and open requests; drop "
+    "small talk. Reply with the updated summary only, in at most {words} words."
+)
+
+
+class ChatState(AgentState):
+    """Agent state plus the rolling summary of turns no longer kept."""
+    summary: str
+
+
+def split_turns(messages: Sequence[AnyMessage]) -> List[List[AnyMessage]]:
+    """Group messages into turns, each starting at a user message."""
+    turns: List[List[AnyMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def plan_context(messages: Sequence[AnyMessage], keep_turns: int = CHAT_HISTORY_TURNS) -> Tuple[List, List]:
+    """Split history into (turns to summarize, turns to keep verbatim)."""
+    turns = split_turns(messages)
+    keep_turns = max(1, keep_turns)
+    return turns[:-keep_turns], turns[-keep_turns:]
+
+
+def _transcript(turns: Sequence[Sequence[AnyMessage]]) -> str:
+    lines = []
+    for message in (message for turn in turns for message in turn):
+        if isinstance(message, HumanMessage):
+            role = "Me"
+        elif isinstance(message, ToolMessage):
+            role = f"Tool {message.name}"
+        else:
+            role = "Assistant"
+        text = message.content if isinstance(message.content, str) else str(message.content)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            text += " " + "; ".join(f"[called {call['name']} {call['args']}]" for call in message.tool_calls)
+        if text.strip():
+            lines.append(f"{role}: {truncate_to_tokens(text.strip(), SUMMARY_INPUT_TOKENS)}")
+    return "\n".join(lines)
+
+
+def summary_messages(summary: str, turns: Sequence[Sequence[AnyMessage]]) -> list:
+    """Messages asking the model to fold ``turns`` into ``summary``."""
+    return [
+        ("system", SUMMARY_INSTRUCTIONS.format(words=int(CHAT_SUMMARY_TOKENS * 0.75))),
+        ("human", f"Current summary:\n{summary or '(none yet)'}\n\nNew messages:\n{_transcript(turns)}"),
+    ]
+
+
+def context_messages(summary: str, turns: Sequence[Sequence[AnyMessage]],
+                     budget: int = CHAT_CONTEXT_TOKENS) -> List[AnyMessage]:
+    """Summary plus recent turns, trimmed to ``budget`` tokens.
+
+    Whole turns are dropped from the oldest end; the current turn is always
+    kept so tool calls stay paired with their results.
+    """
+    head = [SystemMessage(content=f"Summary of our earlier conversation:\n{summary}")] if summary else []
+    recent = [message for turn in turns for message in turn]
+    budget -= count_tokens_approximately(head)
+    kept = trim_messages(
+        recent,
+        max_tokens=max(0, budget),
+        token_counter=count_tokens_approximately,
+        strategy="last",
+        start_on="human",
+    )
+    if not kept and turns:
+        kept = list(turns[-1])
+    return head + kept
+
+
+def _update(state: Dict, old: List, summary: str, kept: List) -> Dict:
+    update = {"llm_input_messages": context_messages(summary, kept)}
+    if old:
+        update["summary"] = summary
+        update["messages"] = [RemoveMessage(id=message.id) for turn in old for message in turn]
+        metrics.increment("chat_summaries", MODEL_NAME)
+    return update
+
+
+def _summary_failed(error: Exception):
+    print(f"Chat summary failed ({error!r}), keeping older turns for now")
+    metrics.increment("chat_summary_errors", MODEL_NAME)
+
+
+def manage_context(state: Dict) -> Dict:
+    """``pre_model_hook`` for the chat agent (sync graph runs)."""
+    summary = state.get("summary", "")
+    old, kept = plan_context(state["messages"])
+    if old:
+        try:
+            reply = get_chat_model().invoke(summary_messages(summary, old))
+            summary = truncate_to_tokens(reply.text.strip(), CHAT_SUMMARY_TOKENS)
+        except Exception as e:
+            _summary_failed(e)
+            old, kept = [], old + kept
+    return _update(state, old, summary, kept)
+
+
+async def amanage_context(state: Dict) -> Dict:
+    """``pre_model_hook`` for the chat agent (async graph runs)."""
+    summary = state.get("summary", "")
+    old, kept = plan_context(state["messages"])
+    if old:
+        try:
+            reply = await get_chat_model().ainvoke(summary_messages(summary, old))
+            summary = truncate_to_tokens(reply.text.strip(), CHAT_SUMMARY_TOKENS)
+        except Exception as e:
+            _summary_failed(e)
+            old, kept = [], old + kept
+    return _update(state, old, summary, kept)
+
+
+context_hook = RunnableLambda(manage_context, afunc=amanage_context, name="manage_context")
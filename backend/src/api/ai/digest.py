@@ -0,0 +1,183 @@
+"""Token-budgeted inbox digests for the LLM context.
+
+``build_digest`` turns parsed inbox emails (``GmailImapParser`` dicts) into
+compact text that fits a token budget, so a busy inbox cannot overflow the
+model's context:
+
+- Only ``uid``, ``from``, ``subject``, ``timestamp`` and the plain body are
+  used; ``to``/``cc``/``bcc`` and HTML bodies are dropped.
+- Bodies are cleaned (quoted replies, links and whitespace runs removed)
+  and truncated to a per-message budget, or left out in fields-only mode.
+- Emails are ranked (urgent-looking and direct mail before newsletters,
+  then newest first) and packed in that order into pages of at most the
+  budget. A footer tells the model how to ask for the next page.
+
+Token counts are estimated at ~4 characters per token, which is close
+enough for budgeting without a tokenizer dependency.
+"""
+
+import math
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+
+INBOX_DIGEST_TOKENS = int(os.environ.get("INBOX_DIGEST_TOKENS") or 2000)
+INBOX_BODY_TOKENS = int(os.environ.get("INBOX_BODY_TOKENS") or 150)
+
+CHARS_PER_TOKEN = 4
+# A truncated body shorter than this is not worth including
+MIN_BODY_TOKENS = 20
+
+URGENT = re.compile(
+    r"\b(urgent|asap|action required|deadline|due|overdue|invoice|payment|"
+    r"meeting|interview|reminder|important|today|tomorrow)\b",
+    re.IGNORECASE,
+)
+BULK_SENDER = re.compile(r"(no-?reply|newsletter|notifications?|digest|marketing|mailer)", re.IGNORECASE)
+_QUOTED_REPLY = re.compile(r"^\s*>.*$|^On .{0,200}wrote:\s*$", re.MULTILINE)
+_URL = re.compile(r"https?://\S+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of ``text`` (~4 characters per token)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut ``text`` to about ``tokens`` tokens at a word boundary."""
+    limit = tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:max(0, limit - 1)]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def clean_body(body: Optional[str]) -> str:
+    """Drop quoted replies and links and collapse whitespace."""
+    if not body:
+        return ""
+    body = _QUOTED_REPLY.sub("", body)
+    body = _URL.sub("[link]", body)
+    return _WHITESPACE.sub(" ", body).strip()
+
+
+def _received_at(email: Dict) -> datetime:
+    try:
+        received = parsedate_to_datetime(email.get("timestamp") or "")
+    except (TypeError, ValueError):
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return received if received.tzinfo else received.replace(tzinfo=timezone.utc)
+
+
+def priority(email: Dict) -> int:
+    """Ranking score: urgent-looking subjects up, bulk senders down."""
+    score = 0
+    if URGENT.search(email.get("subject") or ""):
+        score += 2
+    if BULK_SENDER.search(email.get("from") or ""):
+        score -= 2
+    elif "unsubscribe" in (email.get("body") or "").lower():
+        score -= 1
+    return score
+
+
+def rank_emails(emails: List[Dict]) -> List[Dict]:
+    """Emails ordered by priority, newest first within the same priority."""
+    return sorted(emails, key=lambda email: (priority(email), _received_at(email)), reverse=True)
+
+
+@dataclass
+class DigestPage:
+    text: str
+    page: int
+    pages: int
+    shown: int
+    total: int
+    tokens: int
+
+
+def _header(email: Dict) -> str:
+    return " | ".join([
+        f"uid={email.get('uid')}",
+        f"date: {email.get('timestamp')}",
+        f"from: {email.get('from')}",
+        f"subject: {email.get('subject')}",
+    ])
+
+
+def _entry(email: Dict, body_tokens: int) -> str:
+    header = _header(email)
+    if body_tokens < MIN_BODY_TOKENS:
+        return header
+    body = truncate_to_tokens(clean_body(email.get("body")), body_tokens)
+    return f"{header}\n  {body}" if body else header
+
+
+def _paginate(emails: List[Dict], budget: int, body_tokens: int) -> List[List[str]]:
+    """Greedily pack rendered emails into pages of at most ``budget`` tokens."""
+    pages: List[List[str]] = [[]]
+    used = 0
+    for email in emails:
+        entry = _entry(email, body_tokens)
+        # +2 for the "[n] " prefix and newline
+        cost = estimate_tokens(entry) + 2
+        if cost > budget:
+            # A single email larger than a page keeps only as much body as fits
+            entry = truncate_to_tokens(
+                _entry(email, budget - estimate_tokens(_header(email)) - 4), budget - 2
+            )
+            cost = estimate_tokens(entry) + 2
+        if used + cost > budget and pages[-1]:
+            pages.append([])
+            used = 0
+        pages[-1].append(entry)
+        used += cost
+    return pages
+
+
+def build_digest(
+    emails: List[Dict],
+    page: int = 1,
+    budget: int = INBOX_DIGEST_TOKENS,
+    body_tokens: int = INBOX_BODY_TOKENS,
+    fields_only: bool = False,
+) -> DigestPage:
+    """Render one page of an inbox digest within ``budget`` tokens.
+
+    Args:
+        emails: Parsed emails from ``read_inbox``
+        page: 1-based page number
+        budget: Token budget for the page, footer included
+        body_tokens: Token budget for each email body
+        fields_only: Leave bodies out (uid, date, sender and subject only)
+
+    Returns:
+        DigestPage: Page text plus paging and size information
+
+    Example:
+        >>> digest = build_digest(read_inbox(hours_ago=24), budget=1000)
+        >>> digest.text.splitlines()[-1]
+        'Showing 1-8 of 31 emails (page 1 of 4). Call again with page=2 for more.'
+    """
+    if not emails:
+        return DigestPage("No unread emails.", page, 0, 0, 0, 0)
+    ranked = rank_emails(emails)
+    # Reserve room for the paging footer
+    pages = _paginate(ranked, max(budget - 40, 1), 0 if fields_only else body_tokens)
+    page = min(max(page, 1), len(pages))
+    entries = pages[page - 1]
+    first = sum(len(p) for p in pages[:page - 1]) + 1
+    last = first + len(entries) - 1
+    footer = f"Showing {first}-{last} of {len(ranked)} emails (page {page} of {len(pages)})."
+    if page < len(pages):
+        footer += f" Call again with page={page + 1} for more."
+    text = "\n".join(f"[{first + i}] {entry}" for i, entry in enumerate(entries)) + "\n" + footer
+    return DigestPage(text, page, len(pages), len(entries), len(ranked), estimate_tokens(text))
@@ -0,0 +1,304 @@
+"""Deterministic fake chat model for offline runs, tests and benchmarks.
+
+Selected with ``LLM_PROVIDER=fake`` (or a ``fake:<name>`` entry in
+``LLM_PROVIDERS``); needs no API key or network. It behaves like a real
+tool-calling chat model, so every code path in ``api.ai`` runs unchanged:
+
+- With a forced tool (``with_structured_output``, ``tool_choice``) it
+  returns a call to that tool, arguments generated from the tool's JSON
+  schema (enums, nested objects, lists, defaults respected).
+- With optional tools it calls every tool whose distinctive name words
+  appear in the last user message ("send", "unread", "research"), and
+  answers in text once tool results are in.
+- Otherwise it answers in text.
+
+Responses are seeded by ``LLM_FAKE_SEED`` and the conversation, so the
+same input always gets the same output. ``LLM_FAKE_SCRIPT`` points to a
+JSON list of scripted responses instead (strings, or objects with
+``content`` and ``tool_calls``), returned in order and cycled.
+
+Latency is ``LLM_FAKE_LATENCY`` seconds to the first token plus output
+tokens at ``LLM_FAKE_TOKENS_PER_SECOND`` (0 = instant); streaming paces
+chunks the same way. ``stats()`` reports calls and time spent "in the
+model", which benchmarks subtract to measure framework overhead.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from api.ai.router import openai_tool_kwargs
+
+
+LLM_FAKE_SEED = int(os.environ.get("LLM_FAKE_SEED") or 0)
+LLM_FAKE_LATENCY = float(os.environ.get("LLM_FAKE_LATENCY") or 0)
+LLM_FAKE_TOKENS_PER_SECOND = float(os.environ.get("LLM_FAKE_TOKENS_PER_SECOND") or 0)
+LLM_FAKE_SCRIPT = os.environ.get("LLM_FAKE_SCRIPT")
+
+WORDS = (
+    "thank you for your time today we appreciate the update and look forward to "
+    "working together on the next steps please let us know if anything changes "
+    "the team will follow up with details about the schedule budget and plan"
+).split()
+# Name words that say nothing about when a tool applies
+GENERIC_NAME_WORDS = {"get", "me", "my", "email", "emails", "the", "a", "to", "of"}
+SHORT_FIELDS = {"subject", "title", "name", "category", "label"}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def _text_of(message) -> str:
+    content = message.content if isinstance(message, BaseMessage) else str(message)
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def _resolve(schema: Dict, defs: Dict) -> Dict:
+    while "$ref" in schema:
+        schema = defs[schema["$ref"].split("/")[-1]]
+    if "anyOf" in schema:
+        # Optional[X]: generate an X
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        merged = {key: value for key, value in schema.items() if key != "anyOf"}
+        if options:
+            merged.update(_resolve(options[0], defs))
+        schema = merged
+    return schema
+
+
+def fake_value(schema: Dict, rng: random.Random, defs: Dict, name: str = "") -> Any:
+    """Generate a value matching a JSON schema, deterministic for ``rng``."""
+    schema = _resolve(schema, defs)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "string")
+    if kind == "object":
+        required = set(schema.get("required", []))
+        value = {}
+        for key, prop in schema.get("properties", {}).items():
+            if key not in required and "default" in prop:
+                value[key] = prop["default"]
+            else:
+                value[key] = fake_value(prop, rng, defs, key)
+        return value
+    if kind == "array":
+        return [fake_value(schema.get("items", {}), rng, defs, name) for _ in range(rng.randint(1, 3))]
+    if kind == "integer":
+        return rng.randint(1, 5)
+    if kind == "number":
+        return round(rng.uniform(0, 10), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    count = rng.randint(3, 6) if name.lower() in SHORT_FIELDS else rng.randint(20, 40)
+    words = [rng.choice(WORDS) for _ in range(count)]
+    return " ".join(words).capitalize() + ("" if name.lower() in SHORT_FIELDS else ".")
+
+
+def _forced_tool(tools: List[Dict], tool_choice) -> Optional[Dict]:
+    if not tools or tool_choice in (None, "auto", "none"):
+        return None
+    if isinstance(tool_choice, dict):
+        name = tool_choice.get("function", {}).get("name")
+        return next((t for t in tools if t["function"]["name"] == name), tools[0])
+    return tools[0]  # "required"/"any"
+
+
+class FakeChatModel(BaseChatModel):
+    """Seeded or scripted chat model with tool calling and simulated latency.
+
+    Args:
+        model_name: Name reported in metadata and metrics
+        seed: Seed mixed with the conversation for generated responses
+        latency: Seconds before the first token
+        tokens_per_second: Output speed; 0 returns the rest instantly
+        responses: Scripted responses (str or dict), used in order and cycled
+
+    Example:
+        >>> llm = FakeChatModel(latency=0.2).with_structured_output(EmailMessage)
+        >>> llm.invoke("Thank you note")  # same EmailMessage every time
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model_name: str = "fake"
+    seed: int = LLM_FAKE_SEED
+    latency: float = LLM_FAKE_LATENCY
+    tokens_per_second: float = LLM_FAKE_TOKENS_PER_SECOND
+    responses: Optional[List[Any]] = None
+
+    _script: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+    _model_seconds: float = PrivateAttr(default=0.0)
+
+    def model_post_init(self, __context: Any):
+        if self.responses:
+            self._script = itertools.cycle(self.responses)
+
+    @classmethod
+    def from_env(cls, model_name: str = "fake", **kwargs) -> "FakeChatModel":
+        """Build the model configured by the ``LLM_FAKE_*`` environment."""
+        if LLM_FAKE_SCRIPT and "responses" not in kwargs:
+            with open(LLM_FAKE_SCRIPT) as f:
+                kwargs["responses"] = json.load(f)
+        return cls(model_name=model_name, **kwargs)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "seed": self.seed}
+
+    def bind_tools(self, tools: Sequence, *, tool_choice=None, **kwargs):
+        return self.bind(**openai_tool_kwargs(tools, tool_choice, **kwargs))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"calls": self._calls, "model_seconds": round(self._model_seconds, 6)}
+
+    def reset_stats(self):
+        with self._lock:
+            self._calls = 0
+            self._model_seconds = 0.0
+
+    # -- responses ----------------------------------------------------------
+
+    def _respond(self, messages: List[BaseMessage], tools=None, tool_choice=None) -> AIMessage:
+        if self._script is not None:
+            with self._lock:
+                scripted = next(self._script)
+            if isinstance(scripted, str):
+                return AIMessage(content=scripted)
+            return AIMessage(content=scripted.get("content", ""), tool_calls=[
+                {"name": call["name"], "args": call.get("args", {}), "id": call.get("id") or f"call_{i}"}
+                for i, call in enumerate(scripted.get("tool_calls", []))
+            ])
+
+        digest = hashlib.sha256(
+            "\x00".join(f"{m.type}:{_text_of(m)}" for m in messages).encode()
+        ).hexdigest()
+        rng = random.Random(f"{self.seed}:{digest}")
+        tools = tools or []
+        last = messages[-1] if messages else None
+
+        chosen = []
+        forced = _forced_tool(tools, tool_choice)
+        if forced is not None:
+            chosen = [forced]
+        elif tools and isinstance(last, HumanMessage):
+            asked = set(_WORD.findall(_text_of(last).lower()))
+            for tool in tools:
+                name_words = set(tool["function"]["name"].lower().split("_")) - GENERIC_NAME_WORDS
+                if name_words & asked:
+                    chosen.append(tool)
+        if chosen:
+            calls = []
+            for i, tool in enumerate(chosen):
+                parameters = tool["function"].get("parameters", {})
+                args = fake_value(parameters, rng, parameters.get("$defs", {}))
+                calls.append({"name": tool["function"]["name"], "args": args, "id": f"call_{digest[:8]}_{i}"})
+            return AIMessage(content="", tool_calls=calls)
+
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=f"Done. {_text_of(last)[:200]}")
+        return AIMessage(content=fake_value({"type": "string"}, rng, {}, "content"))
+
+    def _finish(self, messages: List[BaseMessage], message: AIMessage) -> AIMessage:
+        output = message.content + json.dumps([call["args"] for call in message.tool_calls])
+        message.usage_metadata = {
+            "input_tokens": sum(_estimate_tokens(_text_of(m)) for m in messages),
+            "output_tokens": _estimate_tokens(output),
+            "total_tokens": 0,
+        }
+        message.usage_metadata["total_tokens"] = (
+            message.usage_metadata["input_tokens"] + message.usage_metadata["output_tokens"]
+        )
+        message.response_metadata = {"model_name": self.model_name}
+        return message
+
+    def _duration(self, message: AIMessage) -> float:
+        seconds = self.latency
+        if self.tokens_per_second:
+            seconds += message.usage_metadata["output_tokens"] / self.tokens_per_second
+        return seconds
+
+    def _record(self, seconds: float):
+        with self._lock:
+            self._calls += 1
+            self._model_seconds += seconds
+
+    def _pieces(self, message: AIMessage) -> List[AIMessageChunk]:
+        """Split a response into ~4-character chunks, like a token stream."""
+        chunks = []
+        text = message.content
+        for start in range(0, len(text), 4):
+            chunks.append(AIMessageChunk(content=text[start:start + 4]))
+        for index, call in enumerate(message.tool_calls):
+            args = json.dumps(call["args"])
+            for start in range(0, max(len(args), 1), 4):
+                chunks.append(AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": call["name"] if start == 0 else None,
+                    "id": call["id"] if start == 0 else None,
+                    "args": args[start:start + 4],
+                    "index": index,
+                }]))
+        if chunks:
+            chunks[-1].usage_metadata = message.usage_metadata
+            chunks[-1].response_metadata = message.response_metadata
+        return chunks or [AIMessageChunk(content="", usage_metadata=message.usage_metadata)]
+
+    # -- BaseChatModel ------------------------------------------------------
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._finish(messages, self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")))
+        seconds = self._duration(message)
+        time.sleep(seconds)
+        self._record(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._finish(messages, self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")))
+        seconds = self._duration(message)
+        await asyncio.sleep(seconds)
+        self._record(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._finish(messages, self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")))
+        chunks = self._pieces(message)
+        per_chunk = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        time.sleep(self.latency)
+        for chunk in chunks:
+            time.sleep(per_chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        self._record(self.latency + per_chunk * len(chunks))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._finish(messages, self._respond(messages, kwargs.get("tools"), kwargs.get("tool_choice")))
+        chunks = self._pieces(message)
+        per_chunk = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        await asyncio.sleep(self.latency)
+        for chunk in chunks:
+            await asyncio.sleep(per_chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+        self._record(self.latency + per_chunk * len(chunks))
@@ -0,0 +1,181 @@
+"""LLM and tool call instrumentation.
+
+``InstrumentationHandler`` (``api.ai.callbacks``) is a LangChain callback
+handler attached to the shared chat models (``api.ai.llms``) and to the
+agent tools, so every model call and tool call is measured wherever it
+runs: plain services, ``email_assistant`` or LangGraph agents. Per call it
+records the model, prompt/completion tokens, time to first token
+(streamed calls only), total latency, and tool latencies and errors.
+
+Measurements are aggregated into in-process histograms (``metrics``),
+served by ``/api/metrics``. With ``LLM_DEBUG_HEADERS=1`` the calls made
+while handling a request are also summarized in ``X-LLM-*`` response
+headers (see ``track_request``).
+
+This module does not import LangChain, so the app, the metrics endpoint
+and the middleware can load without the AI stack.
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+LLM_DEBUG_HEADERS = os.environ.get("LLM_DEBUG_HEADERS", "").lower() in ("1", "true", "yes")
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe labelled histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+
+    def observe(self, name: str, label: str, value: float, buckets: Sequence[float] = SECONDS_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get((name, label))
+            if histogram is None:
+                histogram = self._histograms[(name, label)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name: str, label: str = "", amount: int = 1):
+        with self._lock:
+            self._counters[(name, label)] = self._counters.get((name, label), 0) + amount
+
+    def snapshot(self) -> Dict:
+        """``{"histograms": {name: {label: ...}}, "counters": {name: {label: n}}}``."""
+        with self._lock:
+            histograms: Dict[str, Dict] = {}
+            for (name, label), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(name, {})[label] = histogram.snapshot()
+            counters: Dict[str, Dict] = {}
+            for (name, label), value in sorted(self._counters.items()):
+                counters.setdefault(name, {})[label] = value
+        return {"histograms": histograms, "counters": counters}
+
+    def prometheus(self) -> str:
+        """Render everything in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (name, label), value in sorted(self._counters.items()):
+                lines.append(f"{name}_total{_labels(name, label)} {value}")
+            for (name, label), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(name, label, le=bound)} {cumulative}')
+                lines.append(f"{name}_sum{_labels(name, label)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(name, label)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _labels(name: str, label: str, **extra) -> str:
+    pairs = []
+    if label:
+        key = "tool" if name.startswith("tool_") else "model"
+        pairs.append(f'{key}="{label}"')
+    pairs.extend(f'{key}="{value}"' for key, value in extra.items())
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+metrics = MetricsRegistry()
+
+
+# Calls made while handling the current request (debug headers)
+_request_calls: contextvars.ContextVar[Optional[List[Dict]]] = contextvars.ContextVar(
+    "llm_request_calls", default=None
+)
+
+
+@contextmanager
+def track_request():
+    """Collect the LLM/tool call records made inside the block.
+
+    Example:
+        >>> with track_request() as calls:
+        ...     generate_email_message("Thank you note")
+        >>> calls[0]["latency_ms"]
+    """
+    calls: List[Dict] = []
+    token = _request_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _request_calls.reset(token)
+
+
+def debug_headers(calls: List[Dict]) -> Dict[str, str]:
+    """Summarize call records as ``X-LLM-*`` response headers."""
+    llm = [c for c in calls if c["type"] == "llm"]
+    tools = [c for c in calls if c["type"] == "tool"]
+    headers = {"X-LLM-Calls": str(len(llm))}
+    if llm:
+        headers["X-LLM-Model"] = ",".join(sorted({c["model"] for c in llm}))
+        headers["X-LLM-Tokens"] = "prompt={};completion={}".format(
+            sum(c.get("prompt_tokens") or 0 for c in llm),
+            sum(c.get("completion_tokens") or 0 for c in llm),
+        )
+        headers["X-LLM-Latency-Ms"] = ",".join(str(c["latency_ms"]) for c in llm)
+        ttft = [str(c["ttft_ms"]) for c in llm if c.get("ttft_ms") is not None]
+        if ttft:
+            headers["X-LLM-TTFT-Ms"] = ",".join(ttft)
+    if tools:
+        headers["X-LLM-Tools"] = ",".join(f"{c['name']}={c['latency_ms']}" for c in tools)
+    return headers
+
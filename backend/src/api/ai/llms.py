@@ -1,15 +1,186 @@
+"""LLM client registry.
+
+Chat models and the runnables derived from them (structured output, bound
+tools) are built once per process and reused by every request, sharing
+keep-alive HTTP connection pools instead of rebuilding clients and tool
+schemas per call. The model is configured through the environment.
+
+With several entries in ``LLM_PROVIDERS`` the default chat model is a
+``RoutedChatModel`` (``api.ai.router``) that hedges and fails over
+between them; the first entry is the preferred provider.
+
+Importing this module is cheap and has no side effects: LangChain, the
+provider SDKs and HTTP clients are loaded when the first model is built
+(``warm_llms`` at startup, or the first request), and a missing API key is
+reported then rather than at import.
+"""
+
 import os
-from langchain.chat_models import init_chat_model
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+def parse_providers(value: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Parse ``provider:model[@base_url],...`` into ``(provider, model, base_url)``.
+
+    Example:
+        >>> parse_providers("groq:llama-3.1-8b-instant,openai:gpt-4o-mini@http://localhost:8001/v1")
+        [('groq', 'llama-3.1-8b-instant', None), ('openai', 'gpt-4o-mini', 'http://localhost:8001/v1')]
+    """
+    providers = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        entry, _, base_url = entry.partition("@")
+        provider, _, model = entry.partition(":")
+        if not model:
+            raise ValueError(f"`LLM_PROVIDERS` entry {entry!r} must look like provider:model[@base_url]")
+        providers.append((provider, model, base_url or None))
+    return providers
 
 
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+LLM_PROVIDERS = parse_providers(os.environ.get("LLM_PROVIDERS") or "")
+LLM_PROVIDER = LLM_PROVIDERS[0][0] if LLM_PROVIDERS else os.environ.get("LLM_PROVIDER") or "groq"
+MODEL_NAME = LLM_PROVIDERS[0][1] if LLM_PROVIDERS else os.environ.get("LLM_MODEL") or "llama-3.1-8b-instant"
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS") or 100)
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT") or 60)
+# Build models and agents in the background at startup (else on first use)
+LLM_WARMUP = os.environ.get("LLM_WARMUP", "1").lower() not in ("0", "false", "no")
+
+
+_lock = threading.RLock()
+_registry: Dict[tuple, object] = {}
+
+
+def _cached(key: tuple, factory: Callable):
+    """Return the registry entry for ``key``, building it once if needed."""
+    value = _registry.get(key)
+    if value is None:
+        with _lock:
+            value = _registry.get(key)
+            if value is None:
+                value = _registry[key] = factory()
+    return value
+
+
+def _http_clients():
+    """Process-wide keep-alive HTTP clients shared by all chat models."""
+    def build():
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        )
+        return (
+            httpx.Client(limits=limits, timeout=LLM_TIMEOUT),
+            httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT),
+        )
+    return _cached(("http",), build)
+
+
+def _init_model(provider: str, model: str, base_url: Optional[str] = None, **kwargs):
+    if provider == "fake":
+        from api.ai.fake import FakeChatModel
+
+        return FakeChatModel.from_env(model, callbacks=kwargs.get("callbacks"))
+    if provider == "groq" and not GROQ_API_KEY:
+        raise NotImplementedError("`GROQ_API_KEY` is required")
+    from langchain.chat_models import init_chat_model
+
+    http_client, http_async_client = _http_clients()
+    if base_url:
+        kwargs["base_url"] = base_url
+    return init_chat_model(
+        model,
+        model_provider=provider,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        **kwargs,
+    )
 
-if not GROQ_API_KEY:
-    raise NotImplementedError("`GROQ_API_KEY` is required")
 
+def get_chat_model(model: str = MODEL_NAME, provider: str = LLM_PROVIDER):
+    """Return the shared chat model for ``provider``/``model``.
 
+    The default model is the provider router when ``LLM_PROVIDERS`` lists
+    more than one provider.
+    """
+    if len(LLM_PROVIDERS) > 1 and (provider, model) == (LLM_PROVIDER, MODEL_NAME):
+        return get_router()
+
+    def build():
+        from api.ai.callbacks import instrumentation
+
+        # Every call through this model is measured (api.ai.instrumentation)
+        return _init_model(provider, model, callbacks=[instrumentation])
+    return _cached(("model", provider, model), build)
+
+
+def get_router():
+    """Return the shared ``RoutedChatModel`` over ``LLM_PROVIDERS``."""
+    def build():
+        from api.ai.callbacks import instrumentation
+        from api.ai.router import RoutedChatModel
+
+        return RoutedChatModel(
+            # The router fails over instead of letting each SDK retry
+            providers=[_init_model(*entry, max_retries=0) for entry in LLM_PROVIDERS],
+            names=[f"{provider}:{model}" for provider, model, _ in LLM_PROVIDERS],
+            callbacks=[instrumentation],
+        )
+    return _cached(("router",), build)
+
+
+def router_stats() -> Dict:
+    """Per-provider routing stats, empty when a single provider is configured."""
+    if len(LLM_PROVIDERS) < 2:
+        return {}
+    return get_router().stats()
 
 
 def get_openai_llm():
-    model = init_chat_model("llama-3.1-8b-instant", model_provider="groq")
-    return model
+    """Return the default chat model (kept for existing callers)."""
+    return get_chat_model()
+
+
+def get_structured_llm(schema):
+    """Return the default model pre-bound to produce ``schema`` instances."""
+    return _cached(
+        ("structured", LLM_PROVIDER, MODEL_NAME, schema),
+        lambda: get_chat_model().with_structured_output(schema),
+    )
+
+
+def _tool_name(tool) -> str:
+    """Name the model sees for a LangChain tool, schema class or function."""
+    if isinstance(tool, dict):
+        return tool.get("name") or tool.get("function", {}).get("name") or repr(tool)
+    return getattr(tool, "name", None) or getattr(tool, "__name__", None) or repr(tool)
+
+
+def get_tool_llm(name: str, tools: Sequence, **kwargs):
+    """Return the default model with ``tools`` bound, cached per binding.
+
+    The cache key covers ``name``, the tool names and ``bind_tools``
+    arguments, so a different binding under the same name gets its own
+    runnable.
+    """
+    tools = list(tools)
+    binding = (
+        tuple(_tool_name(tool) for tool in tools),
+        tuple(sorted((key, repr(value)) for key, value in kwargs.items())),
+    )
+    return _cached(
+        ("tools", LLM_PROVIDER, MODEL_NAME, name, binding),
+        lambda: get_chat_model().bind_tools(tools, **kwargs),
+    )
+
+
+def warm_llms():
+    """Build the shared clients and common runnables ahead of the first request."""
+    from api.ai.schemas import EmailMessage
+    from api.ai.assistants import EMAIL_TOOLS
+
+    get_structured_llm(EmailMessage)
+    get_tool_llm("email_assistant", EMAIL_TOOLS.values())
+    get_tool_llm("email_draft_stream", [EmailMessage], tool_choice=EmailMessage.__name__)
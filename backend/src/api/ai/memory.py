@@ -0,0 +1,160 @@
+"""Conversation memory for the chat agent.
+
+The chat agent (``get_agent("chat")``) is compiled with a LangGraph
+checkpointer, so every ``POST /api/chats/`` continues the conversation
+stored under its ``conversation_id`` (the graph ``thread_id``) instead of
+starting from the latest message alone. What reaches the model is kept
+bounded by ``api.ai.context``.
+
+``CHAT_MEMORY`` picks the checkpointer:
+
+- ``auto`` (default): PostgreSQL when ``DATABASE_URL`` points at it,
+  otherwise in process memory
+- ``postgres``: ``AsyncPostgresSaver`` over its own connection pool; needs
+  ``langgraph-checkpoint-postgres``, falls back to memory without it
+- ``memory``: ``InMemorySaver``, conversations are lost on restart; only
+  the ``CHAT_MEMORY_MAX_CONVERSATIONS`` most recently used are kept, older
+  ones are evicted and start over
+- ``off``: no memory, every message starts a new conversation
+
+The Postgres saver binds to the event loop it is opened on, so the app
+opens it with ``open_chat_memory`` (startup warm-up, or the first chat
+request) before the chat agent is built. Importing this module loads
+neither LangGraph nor psycopg.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from api.db import DB_URL
+
+
+CHAT_MEMORY = (os.environ.get("CHAT_MEMORY") or "auto").lower()
+CHAT_MEMORY_POOL_SIZE = int(os.environ.get("CHAT_MEMORY_POOL_SIZE") or 10)
+CHAT_MEMORY_MAX_CONVERSATIONS = int(os.environ.get("CHAT_MEMORY_MAX_CONVERSATIONS") or 1000)
+
+_checkpointer = None
+_pool = None
+_lock = threading.Lock()
+_open_lock = asyncio.Lock()
+
+
+def memory_backend() -> Optional[str]:
+    """Configured checkpointer backend: "postgres", "memory" or None (off)."""
+    if CHAT_MEMORY == "off":
+        return None
+    if CHAT_MEMORY == "auto":
+        return "postgres" if (DB_URL or "").startswith(("postgres://", "postgresql")) else "memory"
+    return CHAT_MEMORY
+
+
+def postgres_conninfo(url: str) -> str:
+    """Turn a SQLAlchemy URL (``postgresql+psycopg://...``) into a libpq one."""
+    from sqlalchemy.engine import make_url
+
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+async def _open_postgres():
+    try:
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+    except ImportError:
+        print("Chat memory: langgraph-checkpoint-postgres is not installed, keeping conversations in memory")
+        return None
+    global _pool
+    pool = AsyncConnectionPool(
+        postgres_conninfo(DB_URL),
+        max_size=CHAT_MEMORY_POOL_SIZE,
+        # Settings required by the saver (autocommit, dict rows, no server-side prepares)
+        kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        open=False,
+    )
+    await pool.open()
+    saver = AsyncPostgresSaver(pool)
+    await saver.setup()  # creates/migrates the checkpoint tables, idempotent
+    _pool = pool
+    return saver
+
+
+async def open_chat_memory():
+    """Open the configured checkpointer once; cheap on later calls.
+
+    Returns:
+        BaseCheckpointSaver | None: The shared checkpointer, None when off
+    """
+    if _checkpointer is not None or memory_backend() is None:
+        return _checkpointer
+    async with _open_lock:
+        if _checkpointer is None and memory_backend() == "postgres":
+            try:
+                saver = await _open_postgres()
+            except Exception as e:
+                print(f"Chat memory: PostgreSQL checkpointer failed ({e}), keeping conversations in memory")
+                saver = None
+            if saver is not None:
+                _set_checkpointer(saver)
+    return get_checkpointer()
+
+
+def _set_checkpointer(saver):
+    global _checkpointer
+    with _lock:
+        if _checkpointer is None:
+            _checkpointer = saver
+
+
+def _bounded_memory_saver(max_threads: int):
+    """``InMemorySaver`` that keeps only the ``max_threads`` latest conversations.
+
+    Every checkpoint write marks its ``thread_id`` as recently used; past
+    the limit the least recently used thread is deleted with all its
+    checkpoints, writes and blobs. ``aput`` delegates to ``put``, so both
+    paths are covered.
+    """
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    class BoundedInMemorySaver(InMemorySaver):
+        def __init__(self):
+            super().__init__()
+            self._recent = OrderedDict()
+            self._recent_lock = threading.Lock()
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            result = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            with self._recent_lock:
+                self._recent[thread_id] = None
+                self._recent.move_to_end(thread_id)
+                while len(self._recent) > max_threads:
+                    evicted, _ = self._recent.popitem(last=False)
+                    super().delete_thread(evicted)
+            return result
+
+        def delete_thread(self, thread_id):
+            with self._recent_lock:
+                self._recent.pop(thread_id, None)
+                super().delete_thread(thread_id)
+
+    return BoundedInMemorySaver()
+
+
+def get_checkpointer():
+    """Return the shared checkpointer, in memory unless one was opened.
+
+    Called when the chat agent is compiled. Outside the app (scripts,
+    benchmarks) nothing opens the Postgres saver, so memory is used.
+    """
+    if _checkpointer is None and memory_backend() is not None:
+        _set_checkpointer(_bounded_memory_saver(CHAT_MEMORY_MAX_CONVERSATIONS))
+    return _checkpointer
+
+
+async def close_chat_memory():
+    """Close the Postgres connection pool, if one was opened."""
+    if _pool is not None:
+        await _pool.close()
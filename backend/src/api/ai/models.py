@@ -0,0 +1,42 @@
+from sqlmodel import SQLModel, Field, DateTime
+from datetime import timezone, datetime
+from typing import Optional
+
+
+def get_utc_now():
+    return datetime.now().replace(tzinfo=timezone.utc)
+
+
+class GenerationCacheEntry(SQLModel, table=True):
+    # * shared draft cache (DRAFT_CACHE_BACKEND=db), see api.ai.cache
+    key: str = Field(primary_key=True, max_length=64)
+    value: str
+    expires_at: datetime = Field(
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+        index=True,
+    )
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+
+
+class EmailTriageResult(SQLModel, table=True):
+    # * one row per triaged inbox message, so nothing is triaged twice
+    # * (see api.ai.triage)
+    uid: str = Field(primary_key=True, max_length=64)
+    category: str
+    priority: str = Field(index=True)  # high, normal, low
+    needs_reply: bool = False
+    summary: str
+    sender: Optional[str] = None
+    subject: Optional[str] = None
+    model: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+        index=True,
+    )
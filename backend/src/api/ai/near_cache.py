@@ -0,0 +1,230 @@
+"""Near-duplicate draft cache.
+
+Catches prompts that differ only in wording noise ("write a thank you
+email for the interview" vs "thank-you email after interview"), which
+the exact-key draft cache misses. Prompts are reduced to word shingles
+(lowercase, punctuation, stopwords and plural "s" removed) and hashed
+into a 64-bit SimHash. Two prompts match when their SimHashes are within
+a Hamming distance derived from ``DRAFT_NEAR_CACHE_THRESHOLD``.
+
+Lookups use LSH banding: with a maximum distance ``d`` the hash is cut
+into ``d + 1`` bands, and any hash within distance ``d`` must equal the
+query in at least one band (pigeonhole). Only entries sharing a band
+bucket are compared, so lookups stay fast with a million entries.
+Entries are scoped by tone and evicted least-recently-used or on TTL.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+
+DRAFT_NEAR_CACHE = os.environ.get("DRAFT_NEAR_CACHE", "").lower() in ("1", "true", "yes")
+DRAFT_NEAR_CACHE_THRESHOLD = float(os.environ.get("DRAFT_NEAR_CACHE_THRESHOLD") or 0.95)
+DRAFT_NEAR_CACHE_SIZE = int(os.environ.get("DRAFT_NEAR_CACHE_SIZE") or 10_000)
+
+HASH_BITS = 64
+
+# Common words plus drafting boilerplate that every prompt shares
+STOPWORDS = frozenset("""
+a an the and or but of for to in on at by with from after before about as
+regarding concerning re is are be was were this that these those it its
+my our your their his her me we you i us them he she they do does please
+kindly just can could would should will hi hello hey write draft compose
+create generate make send email mail message note
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingle_tokens(prompt: str) -> List[str]:
+    """Normalize a prompt into the content words used for hashing."""
+    tokens = []
+    for word in _WORD.findall(prompt.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def shingles(prompt: str) -> Set[str]:
+    """Unigram and bigram word shingles of the normalized prompt."""
+    tokens = shingle_tokens(prompt)
+    features = set(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+@lru_cache(maxsize=65536)
+def _feature_bits(feature: str) -> Tuple[int, ...]:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "big")
+    return tuple((value >> bit) & 1 for bit in range(HASH_BITS))
+
+
+def simhash(prompt: str) -> Optional[int]:
+    """64-bit SimHash of the prompt's shingles (None if nothing is left)."""
+    features = shingles(prompt)
+    if not features:
+        return None
+    half = len(features) / 2
+    value = 0
+    for bit, ones in enumerate(map(sum, zip(*map(_feature_bits, features)))):
+        if ones > half:
+            value |= 1 << bit
+    return value
+
+
+def max_distance_for(threshold: float) -> int:
+    """Largest Hamming distance that still counts as ``threshold`` similar."""
+    threshold = min(max(threshold, 0.0), 1.0)
+    return int(round((1.0 - threshold) * HASH_BITS, 6))
+
+
+class SimHashIndex:
+    """LSH band index over SimHash values for Hamming-radius queries."""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.width = HASH_BITS // self.bands
+        self._mask = (1 << self.width) - 1
+        self._buckets: Dict[int, Set[int]] = {}
+
+    def _keys(self, value: int):
+        for band in range(self.bands):
+            bits = (value >> (band * self.width)) & self._mask
+            yield (band << self.width) | bits
+
+    def add(self, value: int):
+        for key in self._keys(value):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = set()
+            bucket.add(value)
+
+    def remove(self, value: int):
+        for key in self._keys(value):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del self._buckets[key]
+
+    def nearest(self, value: int) -> Optional[Tuple[int, int]]:
+        """Return ``(value, distance)`` of the closest entry within range."""
+        best = None
+        best_distance = self.max_distance + 1
+        for key in self._keys(value):
+            for candidate in self._buckets.get(key, ()):
+                distance = (value ^ candidate).bit_count()
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+                    if distance == 0:
+                        return best, 0
+        return (best, best_distance) if best is not None else None
+
+
+class NearDuplicateCache:
+    """LRU + TTL cache whose lookups match near-duplicate prompts.
+
+    Args:
+        threshold: Minimum SimHash similarity (1 - distance / 64) for a hit
+        maxsize: Entries kept across all tones before LRU eviction
+        ttl: Seconds an entry stays valid
+
+    Example:
+        >>> cache = NearDuplicateCache(threshold=0.95)
+        >>> cache.set("Write a thank you email for the interview", "professional", draft)
+        >>> cache.get("thank-you email after interview", "professional")
+    """
+
+    def __init__(
+        self,
+        threshold: float = DRAFT_NEAR_CACHE_THRESHOLD,
+        maxsize: int = DRAFT_NEAR_CACHE_SIZE,
+        ttl: float = 3600,
+    ):
+        self.threshold = threshold
+        self.max_distance = max_distance_for(threshold)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._indexes: Dict[str, SimHashIndex] = {}
+        # (tone, simhash) -> (expires_at, value), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, entry_key: Tuple[str, int]):
+        del self._entries[entry_key]
+        tone, value = entry_key
+        index = self._indexes.get(tone)
+        if index is not None:
+            index.remove(value)
+
+    def get(self, prompt: str, tone: str):
+        value = simhash(prompt)
+        tone = tone.strip().lower()
+        if value is None:
+            return None
+        with self._lock:
+            index = self._indexes.get(tone)
+            found = index.nearest(value) if index is not None else None
+            if found is not None:
+                entry_key = (tone, found[0])
+                expires_at, cached = self._entries[entry_key]
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                    return cached
+                self._remove(entry_key)
+            self.misses += 1
+            return None
+
+    def set(self, prompt: str, tone: str, value, ttl: Optional[float] = None):
+        entry_key = (tone.strip().lower(), simhash(prompt))
+        if entry_key[1] is None:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if entry_key not in self._entries:
+                index = self._indexes.get(entry_key[0])
+                if index is None:
+                    index = self._indexes[entry_key[0]] = SimHashIndex(self.max_distance)
+                index.add(entry_key[1])
+            self._entries[entry_key] = (expires_at, value)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,352 @@
+"""Latency-aware routing across several chat model providers.
+
+``RoutedChatModel`` is a chat model that forwards every call to one of
+several configured provider models (e.g. Groq and an OpenAI-compatible
+endpoint) and keeps rolling latency and error statistics for each:
+
+- Providers are tried in configured order, except that providers cooling
+  down after a 429 or failing most recent calls are moved to the back.
+- If the first provider has not answered by its rolling p95 latency, a
+  hedged duplicate request goes to the next provider (never to one
+  cooling down after a 429); the first answer wins and the other request
+  is cancelled (async) or ignored (sync).
+- A 429, 5xx, timeout or connection error fails over to the next
+  provider immediately. Other errors (bad request, auth) are raised.
+
+Because it is a regular ``BaseChatModel`` (tools are bound in the OpenAI
+format all providers share), ``with_structured_output``, ``bind_tools``
+and LangGraph agents work with it unchanged. Streams fail over only
+until the first chunk has been yielded.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict, PrivateAttr
+
+
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "1").lower() not in ("0", "false", "no")
+# Hedge delay before enough samples exist to estimate a p95
+LLM_HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY") or 5.0)
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY") or 0.2)
+LLM_HEDGE_MIN_SAMPLES = 20
+# Seconds a provider is deprioritized after a 429 without Retry-After
+LLM_COOLDOWN = float(os.environ.get("LLM_COOLDOWN") or 10.0)
+# Outcomes older than this no longer count towards a provider's error rate,
+# so a provider that was failing gets tried first again once it has been quiet
+LLM_ERROR_WINDOW = float(os.environ.get("LLM_ERROR_WINDOW") or 60.0)
+STATS_WINDOW = 200
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider SDK or httpx error, if it has one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether another provider might succeed where this one failed."""
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    # openai/groq SDKs (and langchain's subclasses of them): no status attached
+    return any(cls.__name__ in ("APIConnectionError", "APITimeoutError") for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def openai_tool_kwargs(tools: Sequence, tool_choice=None, **kwargs) -> Dict[str, Any]:
+    """``bind`` kwargs for tools and tool_choice in the OpenAI format."""
+    formatted = [convert_to_openai_tool(tool) for tool in tools]
+    if tool_choice:
+        if tool_choice == "any":
+            tool_choice = "required"
+        if isinstance(tool_choice, bool):
+            tool_choice = formatted[0]["function"]["name"]
+        if isinstance(tool_choice, str) and tool_choice not in ("auto", "none", "required"):
+            tool_choice = {"type": "function", "function": {"name": tool_choice}}
+        kwargs["tool_choice"] = tool_choice
+    kwargs.pop("strict", None)
+    return {"tools": formatted, **kwargs}
+
+
+class ProviderStats:
+    """Rolling latency and outcome window for one provider."""
+
+    def __init__(self, name: str, window: int = STATS_WINDOW):
+        self.name = name
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.failovers = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(latency)
+            self.outcomes.append((time.monotonic(), True))
+
+    def failure(self, error: BaseException):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self.outcomes.append((time.monotonic(), False))
+            if error_status(error) == 429:
+                self.cooldown_until = time.monotonic() + (retry_after(error) or LLM_COOLDOWN)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    def error_rate(self) -> float:
+        """Share of failed calls within the last ``LLM_ERROR_WINDOW`` seconds."""
+        since = time.monotonic() - LLM_ERROR_WINDOW
+        with self._lock:
+            recent = [ok for at, ok in self.outcomes if at >= since]
+        return recent.count(False) / len(recent) if recent else 0.0
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for this provider before sending a hedge."""
+        if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, self.percentile(0.95))
+
+    @property
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def snapshot(self) -> Dict:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate(), 4),
+            "p50_seconds": round(p50, 4) if p50 is not None else None,
+            "p95_seconds": round(p95, 4) if p95 is not None else None,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "cooling_down": self.cooling_down,
+        }
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model that routes, hedges and fails over between providers.
+
+    Args:
+        providers: Provider chat models, in order of preference
+        names: Label for each provider (used in stats and metrics)
+        hedge: Send hedged requests once the primary passes its p95
+
+    Example:
+        >>> router = RoutedChatModel(providers=[groq, openai], names=["groq", "openai"])
+        >>> router.with_structured_output(EmailMessage).invoke(messages)
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    providers: List[BaseChatModel]
+    names: List[str]
+    hedge: bool = LLM_HEDGE
+
+    _stats: List[ProviderStats] = PrivateAttr(default_factory=list)
+
+    def model_post_init(self, __context: Any):
+        self._stats = [ProviderStats(name) for name in self.names]
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": "router", "providers": list(self.names)}
+
+    def bind_tools(self, tools: Sequence, *, tool_choice=None, **kwargs):
+        """Bind tools in the OpenAI format understood by every provider."""
+        return self.bind(**openai_tool_kwargs(tools, tool_choice, **kwargs))
+
+    def stats(self) -> Dict[str, Dict]:
+        return {stats.name: stats.snapshot() for stats in self._stats}
+
+    def _order(self) -> List[int]:
+        """Provider indexes, healthy ones first, otherwise configured order."""
+        def rank(index: int):
+            stats = self._stats[index]
+            return (stats.cooling_down, stats.error_rate() >= 0.5, index)
+        return sorted(range(len(self.providers)), key=rank)
+
+    def _finish(self, index: int, result: ChatResult) -> ChatResult:
+        result.llm_output = {**(result.llm_output or {}), "provider": self.names[index]}
+        return result
+
+    # -- sync ---------------------------------------------------------------
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        order = self._order()
+        pending: Dict[concurrent.futures.Future, tuple] = {}
+        error: Optional[BaseException] = None
+
+        def launch():
+            index = order.pop(0)
+            provider = self.providers[index]
+            future = _executor.submit(provider._generate, messages, stop=stop, **kwargs)
+            pending[future] = (index, time.perf_counter())
+
+        launch()
+        while pending:
+            timeout = self._hedge_timeout(pending, order)
+            done, _ = concurrent.futures.wait(
+                pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not done:
+                self._stats[next(iter(pending.values()))[0]].hedges += 1
+                launch()
+                continue
+            for future in done:
+                index, start = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = self._failed(index, e, order, pending)
+                    if error is not None and order and not pending:
+                        launch()
+                    continue
+                self._stats[index].success(time.perf_counter() - start)
+                return self._finish(index, result)
+        raise error
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        order = self._order()
+        error: Optional[BaseException] = None
+        while order:
+            index = order.pop(0)
+            start = time.perf_counter()
+            started = False
+            try:
+                for chunk in self.providers[index]._stream(messages, stop=stop, **kwargs):
+                    if not started:
+                        started = True
+                        chunk.message.response_metadata["provider"] = self.names[index]
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+            except Exception as e:
+                if started:
+                    self._stats[index].failure(e)
+                    raise
+                error = self._failed(index, e, order, {})
+                continue
+            self._stats[index].success(time.perf_counter() - start)
+            return
+        raise error
+
+    # -- async --------------------------------------------------------------
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        order = self._order()
+        pending: Dict[asyncio.Task, tuple] = {}
+        error: Optional[BaseException] = None
+
+        def launch():
+            index = order.pop(0)
+            coro = self.providers[index]._agenerate(messages, stop=stop, **kwargs)
+            pending[asyncio.ensure_future(coro)] = (index, time.perf_counter())
+
+        launch()
+        try:
+            while pending:
+                timeout = self._hedge_timeout(pending, order)
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self._stats[next(iter(pending.values()))[0]].hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    index, start = pending.pop(task)
+                    if task.exception() is not None:
+                        error = self._failed(index, task.exception(), order, pending)
+                        if error is not None and order and not pending:
+                            launch()
+                        continue
+                    self._stats[index].success(time.perf_counter() - start)
+                    return self._finish(index, task.result())
+            raise error
+        finally:
+            # Losing hedges are cancelled
+            for task in pending:
+                task.cancel()
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        order = self._order()
+        error: Optional[BaseException] = None
+        while order:
+            index = order.pop(0)
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in self.providers[index]._astream(messages, stop=stop, **kwargs):
+                    if not started:
+                        started = True
+                        chunk.message.response_metadata["provider"] = self.names[index]
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+            except Exception as e:
+                if started:
+                    self._stats[index].failure(e)
+                    raise
+                error = self._failed(index, e, order, {})
+                continue
+            self._stats[index].success(time.perf_counter() - start)
+            return
+        raise error
+
+    # -- shared -------------------------------------------------------------
+
+    def _hedge_timeout(self, pending: Dict, order: List[int]) -> Optional[float]:
+        """Seconds until a hedge should be sent, or None to just wait."""
+        if not self.hedge or not order or len(pending) != 1:
+            return None
+        if self._stats[order[0]].cooling_down:
+            return None  # don't add load to a rate-limited provider
+        index, start = next(iter(pending.values()))
+        return max(0.0, self._stats[index].hedge_delay() - (time.perf_counter() - start))
+
+    def _failed(self, index: int, error: BaseException, order: List[int], pending: Dict) -> BaseException:
+        """Record a failure; re-raise it unless another provider may help."""
+        self._stats[index].failure(error)
+        if not is_retryable(error) or (not order and not pending):
+            raise error
+        self._stats[index].failovers += 1
+        print(f"LLM provider {self.names[index]} failed ({error_status(error) or type(error).__name__}), failing over")
+        return error
@@ -1,4 +1,6 @@
 
+from typing import List, Literal
+
 from pydantic import BaseModel, Field
 
 class EmailMessage(BaseModel):
@@ -9,4 +11,19 @@ class EmailMessage(BaseModel):
 
 class AgentMessageSchema(BaseModel):
     content: str
+    conversation_id: str | None = None
     
+
+
+class EmailTriage(BaseModel):
+    number: int = Field(description="Number of the email in the list")
+    category: Literal[
+        "work", "personal", "finance", "newsletter", "promotion", "notification", "spam", "other"
+    ]
+    priority: Literal["high", "normal", "low"]
+    needs_reply: bool = Field(description="True if the sender expects an answer from me")
+    summary: str = Field(description="One-line summary of the email")
+
+
+class InboxTriage(BaseModel):
+    emails: List[EmailTriage] = Field(description="One entry per email in the list")
@@ -4,19 +4,33 @@ Provides AI-powered email content generation using LLM models.
 Generates structured email messages with subject and content.
 """
 
-from api.ai.llms import get_openai_llm
+from typing import AsyncIterator, Dict, List, Tuple, Union
+
+from api.ai.cache import cache_key, draft_cache
+from api.ai.llms import MODEL_NAME, get_structured_llm, get_tool_llm
 from api.ai.schemas import EmailMessage
+from api.ai.singleflight import SingleFlight
+from api.ai.instrumentation import metrics
+
 
+# Concurrent identical draft requests (double clicks, several tabs) share
+# one upstream call; keyed like the draft cache
+draft_flight = SingleFlight("drafts")
 
-def generate_email_message(query: str, tone: str = "professional") -> EmailMessage:
+
+def generate_email_message(query: str, tone: str = "professional", use_cache: bool = True) -> EmailMessage:
     """Generate email content using AI based on user prompt.
     
     Uses LLM (Groq/LLaMA) to generate a structured email with subject
-    and content based on the user's natural language prompt.
+    and content based on the user's natural language prompt. Results are
+    cached by normalized prompt, tone and model (see ``api.ai.cache``), and
+    concurrent identical requests share one LLM call (``draft_flight``).
     
     Args:
         query: User's natural language prompt describing the email
                (e.g., "Write a follow-up email to client about project")
+        tone: Email tone: professional, casual, friendly or formal
+        use_cache: Set to False to skip the cache and force a new draft
     
     Returns:
         EmailMessage: Structured email with subject and content fields
@@ -28,12 +42,136 @@ def generate_email_message(query: str, tone: str = "professional") -> EmailMessa
         >>> print(email.content)
         "Dear Hiring Manager, I wanted to express..."
     """
-    # Get base LLM model instance
-    llm_base = get_openai_llm()
+    key = cache_key(query, tone, MODEL_NAME)
+    if use_cache:
+        cached = draft_cache.get(key, query, tone)
+        if cached is not None:
+            return EmailMessage(**cached)
+    
+    def generate():
+        # Shared model pre-configured to output structured EmailMessage format
+        llm = get_structured_llm(EmailMessage)
+        
+        # Invoke LLM and return structured email
+        email = llm.invoke(build_email_messages(query, tone))
+        # Refresh the cache even on bypass so the next normal request gets it
+        if isinstance(email, EmailMessage) and not email.invalid_requests:
+            draft_cache.set(key, email.model_dump(), query, tone)
+        return email
+
+    # Coalesced callers share the result; give each its own copy
+    return draft_flight.do(key, generate).model_copy()
+
+
+async def agenerate_email_message(
+    query: str, tone: str = "professional", use_cache: bool = True
+) -> EmailMessage:
+    """Async version of ``generate_email_message``.
+    
+    Awaits the model (``ainvoke``) instead of blocking a thread, so an
+    async route can hold many slow generations at once.
+    
+    Args:
+        query: User's natural language prompt describing the email
+        tone: Email tone: professional, casual, friendly or formal
+        use_cache: Set to False to skip the cache and force a new draft
+    
+    Returns:
+        EmailMessage: Structured email with subject and content fields
+    
+    Example:
+        >>> email = await agenerate_email_message("Thank you email for interview")
+    """
+    key = cache_key(query, tone, MODEL_NAME)
+    if use_cache:
+        cached = await draft_cache.aget(key, query, tone)
+        if cached is not None:
+            return EmailMessage(**cached)
+
+    async def generate():
+        llm = get_structured_llm(EmailMessage)
+        email = await llm.ainvoke(build_email_messages(query, tone))
+        if isinstance(email, EmailMessage) and not email.invalid_requests:
+            await draft_cache.aset(key, email.model_dump(), query, tone)
+        return email
+
+    # Shares the in-flight call with sync callers of generate_email_message too
+    email = await draft_flight.ado(key, generate)
+    return email.model_copy()
+
+
+async def stream_email_message(
+    query: str, tone: str = "professional", use_cache: bool = True
+) -> AsyncIterator[Tuple[str, Union[str, Dict, EmailMessage]]]:
+    """Generate an email and stream its subject and content as they arrive.
+    
+    Binds ``EmailMessage`` as a forced tool call and parses the partial
+    tool-call JSON on every streamed chunk (LangChain ``astream``), so text
+    deltas are yielded while the model is still writing. If a field's
+    partial value stops extending what was already sent (the parser
+    revised it), a ``reset`` carrying the full value is yielded instead, so
+    clients replace the field rather than append to it. A cache hit is
+    returned as a single delta per field.
+    
+    Args:
+        query: User's natural language prompt describing the email
+        tone: Email tone: professional, casual, friendly or formal
+        use_cache: Set to False to skip the cache and force a new draft
+    
+    Yields:
+        Tuple[str, str | dict | EmailMessage]: ("subject", delta),
+            ("content", delta), ("reset", {"field": ..., "value": ...}) and
+            finally ("message", EmailMessage)
+    
+    Example:
+        >>> async for field, value in stream_email_message("Thank you note"):
+        ...     print(field, value)
+    """
+    key = cache_key(query, tone, MODEL_NAME)
+    cached = await draft_cache.aget(key, query, tone) if use_cache else None
+    if cached is not None:
+        email = EmailMessage(**cached)
+        yield "subject", email.subject
+        yield "content", email.content
+        yield "message", email
+        return
+
+    from langchain_core.output_parsers.openai_tools import JsonOutputKeyToolsParser
+
+    llm = get_tool_llm(
+        "email_draft_stream", [EmailMessage], tool_choice=EmailMessage.__name__
+    )
+    chain = llm | JsonOutputKeyToolsParser(key_name=EmailMessage.__name__, first_tool_only=True)
+    sent = {"subject": "", "content": ""}
+    latest = {}
+    async for partial in chain.astream(build_email_messages(query, tone)):
+        latest = partial or latest
+        for field in ("subject", "content"):
+            value = latest.get(field)
+            if not isinstance(value, str) or value == sent[field]:
+                continue
+            previous, sent[field] = sent[field], value
+            if value.startswith(previous):
+                yield field, value[len(previous):]
+            else:
+                yield "reset", {"field": field, "value": value}
+
+    email = EmailMessage(**latest)
+    if not email.invalid_requests:
+        await draft_cache.aset(key, email.model_dump(), query, tone)
+    yield "message", email
+
+
+def build_email_messages(query: str, tone: str = "professional") -> list:
+    """Build the system/human message pair used for email generation.
     
-    # Configure LLM to output structured EmailMessage format
-    llm = llm_base.with_structured_output(EmailMessage)
+    Args:
+        query: User's natural language prompt describing the email
+        tone: Email tone: professional, casual, friendly or formal
     
+    Returns:
+        list: Conversation messages ready to pass to the LLM
+    """
     # Tone-specific instructions
     tone_instructions = {
         "professional": "Use formal, business-appropriate language.",
@@ -45,7 +183,7 @@ def generate_email_message(query: str, tone: str = "professional") -> EmailMessa
     tone_instruction = tone_instructions.get(tone.lower(), tone_instructions["professional"])
     
     # Prepare conversation messages for the LLM
-    messages = [
+    return [
         (
             "system",
             f"You are a helpful assistant for research and composing plaintext emails. "
@@ -53,6 +191,73 @@ def generate_email_message(query: str, tone: str = "professional") -> EmailMessa
         ),
         ("human", f"{query}"),
     ]
+
+
+def build_personalized_prompt(base_prompt: str, fields: Dict[str, str]) -> str:
+    """Append per-recipient details to a campaign's base prompt."""
+    if not fields:
+        return base_prompt
+    details = "\n".join(f"- {key}: {value}" for key, value in fields.items())
+    return (
+        f"{base_prompt}\n\n"
+        f"Personalize the email for this recipient:\n{details}"
+    )
+
+
+async def generate_personalized_messages(
+    base_prompt: str,
+    recipients: List[Dict[str, str]],
+    tone: str = "professional",
+    max_concurrency: int = 8,
+    max_retries: int = 2,
+) -> AsyncIterator[Tuple[int, Union[EmailMessage, Exception]]]:
+    """Generate one tailored email per recipient with concurrent LLM calls.
+    
+    Requests are batched through the runnable's ``abatch_as_completed`` with
+    ``max_concurrency`` in flight, so N drafts take roughly
+    N / max_concurrency model latencies. Results are yielded as soon as each
+    generation finishes, in completion order. Failed items, and only those,
+    are retried up to ``max_retries`` times before their error is yielded.
     
-    # Invoke LLM and return structured email
-    return llm.invoke(messages)
+    Args:
+        base_prompt: Campaign prompt shared by all recipients
+        recipients: Per-recipient merge fields (e.g. name, company)
+        tone: Email tone applied to every draft
+        max_concurrency: Maximum number of LLM calls in flight
+        max_retries: Extra attempts for items that failed
+    
+    Yields:
+        Tuple[int, EmailMessage | Exception]: Recipient index and its draft,
+            or the last error if every attempt failed
+    
+    Example:
+        >>> async for i, email in generate_personalized_messages(
+        ...         "Invite to our launch", [{"name": "Ann"}, {"name": "Bob"}]):
+        ...     print(i, email.subject)
+    """
+    llm = get_structured_llm(EmailMessage)
+    config = {"max_concurrency": max(1, max_concurrency)}
+    inputs = [
+        build_email_messages(build_personalized_prompt(base_prompt, fields), tone)
+        for fields in recipients
+    ]
+    pending = list(range(len(inputs)))
+    for attempt in range(max_retries + 1):
+        failed = []
+        batch = [inputs[i] for i in pending]
+        async for position, result in llm.abatch_as_completed(
+            batch, config=config, return_exceptions=True
+        ):
+            index = pending[position]
+            if isinstance(result, EmailMessage):
+                yield index, result
+            elif attempt < max_retries:
+                failed.append(index)
+            else:
+                yield index, result if isinstance(result, Exception) else ValueError(
+                    "LLM returned no structured email"
+                )
+        if not failed:
+            break
+        metrics.increment("llm_retries", MODEL_NAME, len(failed))
+        pending = failed
@@ -0,0 +1,161 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+When several callers ask for the same key at the same time, only the
+first (the leader) does the work; the others wait for and share its
+result or exception. Callers may be threads (``do``) or asyncio tasks
+(``ado``), in any mix, because every call is backed by a
+``concurrent.futures.Future``.
+
+Async callers are reference-counted: a cancelled caller only stops
+waiting, and the underlying work is cancelled once no caller is left.
+A new caller arriving after that starts a fresh call.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ("future", "waiters", "cancel")
+
+    def __init__(self):
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.waiters = 1
+        self.cancel: Optional[Callable[[], None]] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key.
+
+    Args:
+        name: Label used when reporting metrics
+
+    Example:
+        >>> drafts = SingleFlight("drafts")
+        >>> email = drafts.do(key, lambda: llm.invoke(messages))
+        >>> email = await drafts.ado(key, lambda: llm.ainvoke(messages))
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        _groups[name] = self
+
+    def _join(self, key: Hashable):
+        """Return ``(call, is_leader)`` for ``key``, registering a waiter."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+
+    def _forget(self, key: Hashable, call: _Call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def _leave(self, key: Hashable, call: _Call):
+        """Drop a cancelled async waiter; cancel the work if none remain."""
+        with self._lock:
+            call.waiters -= 1
+            if call.waiters > 0 or call.future.done():
+                return
+            # Nobody is waiting any more: new callers must start over
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            self.cancelled += 1
+            cancel = call.cancel
+        if cancel is not None:
+            cancel()
+
+    def do(self, key: Hashable, fn: Callable):
+        """Run ``fn()`` once per key among concurrent callers (blocking).
+
+        Args:
+            key: Normalized request identity
+            fn: Zero-argument callable doing the actual work
+
+        Returns:
+            The leader's result (its exception is re-raised for everyone)
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return call.future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            call.future.set_exception(e)
+            raise
+        else:
+            call.future.set_result(result)
+            return result
+        finally:
+            self._forget(key, call)
+
+    async def ado(self, key: Hashable, factory: Callable[[], Awaitable]):
+        """Await ``factory()`` once per key among concurrent callers.
+
+        The work runs in its own task, so cancelling the caller that
+        started it does not cancel it for the others.
+
+        Args:
+            key: Normalized request identity
+            factory: Zero-argument callable returning the awaitable to run
+
+        Returns:
+            The shared result (the shared exception is re-raised)
+        """
+        call, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            task = loop.create_task(self._lead(key, call, factory))
+            call.cancel = lambda: loop.call_soon_threadsafe(task.cancel)
+        try:
+            # shield: one caller's cancellation must not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(call.future))
+        except asyncio.CancelledError:
+            self._leave(key, call)
+            raise
+
+    async def _lead(self, key: Hashable, call: _Call, factory: Callable[[], Awaitable]):
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            call.future.cancel()
+            raise
+        except BaseException as e:
+            call.future.set_exception(e)
+        else:
+            call.future.set_result(result)
+        finally:
+            self._forget(key, call)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        requests = self.leaders + self.coalesced
+        return {
+            "in_flight": in_flight,
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "coalesce_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def singleflight_stats() -> Dict[str, Dict]:
+    """Coalescing metrics for every single-flight group, by name."""
+    return {name: group.stats() for name, group in _groups.items()}
@@ -11,6 +11,8 @@ from langchain_core.tools import tool
 from api.myemailer.sender import send_mail
 from api.myemailer.myinbox_reader import read_inbox
 from api.ai.services import generate_email_message
+from api.ai.digest import build_digest
+from api.ai.callbacks import instrument_tools
 
 
 @tool
@@ -42,23 +44,29 @@ def send_me_email(subject: str, content: str) -> str:
 
 
 @tool
-def get_unread_emails(hours_ago: int = 48) -> str:
-    """Retrieve unread emails from the inbox.
+def get_unread_emails(hours_ago: int = 48, page: int = 1, fields_only: bool = False) -> str:
+    """Retrieve unread emails from the inbox as a compact digest.
     
-    Fetches unread emails from the specified time period and formats
-    them as text. HTML content is removed for cleaner output.
+    Emails are ranked (urgent and personal mail first, newsletters last)
+    and bodies are shortened so the digest stays within a fixed size.
+    If the footer says there are more pages, call again with the next
+    page number. Use fields_only=True to list many emails quickly
+    (uid, date, sender and subject only).
     
     Args:
         hours_ago: Number of hours to look back for emails (default: 48)
+        page: Page of the digest to return, starting at 1 (default: 1)
+        fields_only: Leave out email bodies (default: False)
 
     Returns:
-        str: Formatted string of email data separated by dashes,
+        str: One line per email plus a paging footer,
              or error message if retrieval fails
              
     Example:
-        >>> emails = get_unread_emails(24)
-        >>> print(emails)
-        "from: john@example.com\tsubject: Meeting\n-----\n..."
+        >>> print(get_unread_emails.invoke({"hours_ago": 24}))
+        [1] uid=812 | date: Mon, 6 Oct 2025 09:12:03 +0000 | from: John <john@example.com> | subject: Meeting
+          Can we move our meeting to 3pm?
+        Showing 1-1 of 1 emails (page 1 of 1).
     """
     try:
         # Read emails from inbox within specified timeframe
@@ -66,21 +74,8 @@ def get_unread_emails(hours_ago: int = 48) -> str:
     except:
         return "Error getting latest emails"
     
-    # Clean and format email data
-    cleaned = []
-    for email in emails:
-        data = email.copy()
-        # Remove HTML body to reduce clutter
-        if "html_body" in data:
-            data.pop('html_body')
-        # Format email fields as key-value pairs
-        msg = ""
-        for k, v in data.items():
-            msg += f"{k}:\t {v}"
-        cleaned.append(msg)
-    
-    # Join all emails with separator
-    return "\n-----\n".join(cleaned)
+    # Rank, trim and page the emails to stay within the token budget
+    return build_digest(emails, page=page, fields_only=fields_only).text
 
 
 @tool
@@ -108,3 +103,7 @@ def research_email(query: str) -> str:
     # Format as readable email string
     msg = f"Subject {response.subject}: \n Body: {response.content}"
     return msg
+
+
+# Record latency and errors for every tool call (api.ai.instrumentation)
+instrument_tools(send_me_email, get_unread_emails, research_email)
@@ -0,0 +1,220 @@
+"""Batched inbox triage.
+
+Classifies inbox emails (category, priority, needs-reply, one-line
+summary) with as few LLM round trips as possible:
+
+- Emails already triaged (``EmailTriageResult``, keyed by IMAP UID) are
+  skipped, so re-running over the same inbox costs nothing.
+- The rest are packed ``batch_size`` at a time into one structured
+  ``InboxTriage`` call each, bodies cleaned and truncated like the inbox
+  digest (``api.ai.digest``).
+- Batches run concurrently through ``abatch_as_completed`` with
+  ``max_concurrency`` calls in flight. Each batch is saved as soon as it
+  completes; emails the model skipped are re-packed and retried.
+
+Emails are numbered within their batch and the model answers by number,
+which small models copy back more reliably than long UIDs.
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from sqlmodel import Session, select
+
+from api.db import engine
+from api.ai.digest import clean_body, truncate_to_tokens
+from api.ai.instrumentation import metrics
+from api.ai.llms import MODEL_NAME, get_structured_llm
+from api.ai.models import EmailTriageResult, get_utc_now
+from api.ai.schemas import InboxTriage
+from api.myemailer.myinbox_reader import read_inbox
+
+
+TRIAGE_BATCH_SIZE = int(os.environ.get("TRIAGE_BATCH_SIZE") or 10)
+TRIAGE_CONCURRENCY = int(os.environ.get("TRIAGE_CONCURRENCY") or 4)
+TRIAGE_BODY_TOKENS = int(os.environ.get("TRIAGE_BODY_TOKENS") or 100)
+
+TRIAGE_INSTRUCTIONS = (
+    "You triage my inbox. For every numbered email below return its number, "
+    "a category (work, personal, finance, newsletter, promotion, notification, "
+    "spam, other), a priority (high, normal, low), whether it needs a reply "
+    "from me, and a one-line summary. Return exactly one entry per email."
+)
+
+
+@dataclass
+class TriageReport:
+    fetched: int = 0
+    skipped: int = 0
+    triaged: int = 0
+    failed: int = 0
+    llm_calls: int = 0
+    seconds: float = 0.0
+    results: List[EmailTriageResult] = field(default_factory=list)
+
+
+def build_triage_messages(emails: Sequence[Dict], body_tokens: int = TRIAGE_BODY_TOKENS) -> list:
+    """Build the messages for one packed triage call.
+
+    Args:
+        emails: Parsed emails (``read_inbox``) of one batch
+        body_tokens: Token budget for each email body
+
+    Returns:
+        list: Conversation messages ready to pass to the LLM
+    """
+    entries = []
+    for number, email in enumerate(emails, start=1):
+        body = truncate_to_tokens(clean_body(email.get("body")), body_tokens)
+        entries.append(
+            f"[{number}] from: {email.get('from')}\nsubject: {email.get('subject')}\n{body}"
+        )
+    return [
+        ("system", TRIAGE_INSTRUCTIONS),
+        ("human", "\n\n".join(entries)),
+    ]
+
+
+def triaged_uids(uids: Sequence[str]) -> set:
+    """UIDs among ``uids`` that already have a stored triage result."""
+    if not uids:
+        return set()
+    with Session(engine) as session:
+        return set(session.exec(
+            select(EmailTriageResult.uid).where(EmailTriageResult.uid.in_(list(uids)))
+        ).all())
+
+
+def _upsert_statement(session: Session):
+    """Dialect-specific INSERT that replaces an existing result for the UID."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    statement = insert(EmailTriageResult)
+    columns = ("category", "priority", "needs_reply", "summary", "sender", "subject", "model", "created_at")
+    return statement.on_conflict_do_update(
+        index_elements=["uid"],
+        set_={column: statement.excluded[column] for column in columns},
+    )
+
+
+def save_triage(results: List[EmailTriageResult]):
+    """Store triage results, replacing earlier results for the same UIDs."""
+    if not results:
+        return
+    with Session(engine) as session:
+        statement = _upsert_statement(session)
+        if statement is not None:
+            session.execute(statement, [result.model_dump() for result in results])
+        else:
+            for result in results:
+                session.merge(result)
+        session.commit()
+
+
+def get_triage_results(
+    limit: int = 100,
+    needs_reply: Optional[bool] = None,
+    priority: Optional[str] = None,
+) -> List[EmailTriageResult]:
+    """Stored triage results, newest first."""
+    with Session(engine) as session:
+        query = select(EmailTriageResult)
+        if needs_reply is not None:
+            query = query.where(EmailTriageResult.needs_reply == needs_reply)
+        if priority:
+            query = query.where(EmailTriageResult.priority == priority)
+        query = query.order_by(EmailTriageResult.created_at.desc()).limit(limit)
+        return list(session.exec(query).all())
+
+
+async def triage_emails(
+    emails: Sequence[Dict],
+    batch_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    max_retries: int = 1,
+    retriage: bool = False,
+) -> TriageReport:
+    """Triage emails with packed, concurrent structured LLM calls.
+
+    Args:
+        emails: Parsed emails (``read_inbox``); emails without a UID are ignored
+        batch_size: Emails packed into each LLM call (default
+            ``TRIAGE_BATCH_SIZE``)
+        max_concurrency: Maximum number of LLM calls in flight (default
+            ``TRIAGE_CONCURRENCY``)
+        max_retries: Extra rounds for emails the model skipped or that failed
+        retriage: Triage emails again even if a result is stored
+
+    Returns:
+        TriageReport: Counts, LLM calls, elapsed time and the new results
+
+    Example:
+        >>> report = await triage_emails(read_inbox(hours_ago=24))
+        >>> [(r.subject, r.priority, r.needs_reply) for r in report.results]
+    """
+    start = time.perf_counter()
+    by_uid = {str(email["uid"]): email for email in emails if email.get("uid")}
+    known = set() if retriage else await asyncio.to_thread(triaged_uids, list(by_uid))
+    report = TriageReport(fetched=len(emails), skipped=len(known))
+    pending = [uid for uid in by_uid if uid not in known]
+
+    llm = get_structured_llm(InboxTriage)
+    config = {"max_concurrency": max(1, max_concurrency or TRIAGE_CONCURRENCY)}
+    batch_size = max(1, batch_size or TRIAGE_BATCH_SIZE)
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        inputs = [build_triage_messages([by_uid[uid] for uid in batch]) for batch in batches]
+        report.llm_calls += len(batches)
+        missing = []
+        async for position, result in llm.abatch_as_completed(
+            inputs, config=config, return_exceptions=True
+        ):
+            batch = batches[position]
+            rows = {}
+            if isinstance(result, InboxTriage):
+                for item in result.emails:
+                    if not 1 <= item.number <= len(batch):
+                        continue
+                    uid = batch[item.number - 1]
+                    email = by_uid[uid]
+                    rows[uid] = EmailTriageResult(
+                        uid=uid,
+                        category=item.category,
+                        priority=item.priority,
+                        needs_reply=item.needs_reply,
+                        summary=item.summary,
+                        sender=email.get("from"),
+                        subject=email.get("subject"),
+                        model=MODEL_NAME,
+                        created_at=get_utc_now(),
+                    )
+            else:
+                print(f"Triage batch failed: {result!r}")
+            # Saved per batch, so an interrupted run keeps what it finished
+            await asyncio.to_thread(save_triage, list(rows.values()))
+            report.results.extend(rows.values())
+            missing.extend(uid for uid in batch if uid not in rows)
+        if missing and attempt < max_retries:
+            metrics.increment("llm_retries", MODEL_NAME, len(missing))
+        pending = missing
+
+    report.triaged = len(report.results)
+    report.failed = len(pending)
+    report.seconds = round(time.perf_counter() - start, 3)
+    return report
+
+
+async def triage_inbox(hours_ago: int = 48, **kwargs) -> TriageReport:
+    """Fetch unread emails (``read_inbox``) and triage the new ones."""
+    emails = await asyncio.to_thread(read_inbox, hours_ago=hours_ago, verbose=False)
+    return await triage_emails(emails, **kwargs)
@@ -1,5 +1,4 @@
 import os
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
 class EmailMessage(BaseModel):
@@ -13,19 +12,6 @@ OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL")
 OPENAI_MODEL_NAME = os.environ.get("OPENAI_MODEL_NAME")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-if not OPENAI_API_KEY:
-    raise NotImplementedError("`OPENAI_API_KEY` is required")
-
-openai_params = {"model": OPENAI_MODEL_NAME, "api_key": OPENAI_API_KEY}
-
-if OPENAI_BASE_URL:
-    openai_params["base_url"] = OPENAI_BASE_URL
-
-llm_base = ChatOpenAI(**openai_params)
-
-
-llm = llm_base.with_structured_output(EmailMessage)
-
 messages = [
     (
         "system",
@@ -34,5 +20,30 @@ messages = [
     ),
     ("human", "create an emain about the benefits of coffee.")
 ]
-response = llm.invoke(messages)
-print(response)
+
+
+def get_llm():
+    """Build the OpenAI-compatible client producing ``EmailMessage``.
+
+    Nothing is built or called on import; the client and its SDK are only
+    loaded here.
+
+    Returns:
+        Runnable: ChatOpenAI with structured ``EmailMessage`` output
+    """
+    if not OPENAI_API_KEY:
+        raise NotImplementedError("`OPENAI_API_KEY` is required")
+    from langchain_openai import ChatOpenAI
+
+    openai_params = {"model": OPENAI_MODEL_NAME, "api_key": OPENAI_API_KEY}
+
+    if OPENAI_BASE_URL:
+        openai_params["base_url"] = OPENAI_BASE_URL
+
+    llm_base = ChatOpenAI(**openai_params)
+    return llm_base.with_structured_output(EmailMessage)
+
+
+if __name__ == "__main__":
+    response = get_llm().invoke(messages)
+    print(response)
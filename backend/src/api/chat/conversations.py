@@ -0,0 +1,33 @@
+"""Chat conversations.
+
+Chat messages carry the ``conversation_id`` the agent memory is keyed by
+(``api.ai.memory``). Clients send it back to continue a conversation and
+leave it out to start a new one.
+"""
+
+import uuid
+
+from sqlalchemy import inspect, text
+
+from api.db import engine
+from .models import ChatMessage
+
+
+def new_conversation_id() -> str:
+    """Return an id for a new conversation."""
+    return uuid.uuid4().hex
+
+
+def ensure_chat_schema():
+    """Add ``conversation_id`` to an existing ``chatmessage`` table.
+
+    Cheap and idempotent; run at startup before ``init_db`` creates the
+    declared indexes.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table(ChatMessage.__tablename__):
+        return
+    columns = {c["name"] for c in inspector.get_columns(ChatMessage.__tablename__)}
+    if "conversation_id" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE chatmessage ADD COLUMN conversation_id VARCHAR(64)"))
@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field, DateTime
+from sqlmodel import SQLModel, Field, DateTime, Index
 
 from datetime import timezone, datetime
 
@@ -11,6 +11,8 @@ class ChatMessagePayLoad(SQLModel):
     # * pydantic model
     # * validation
     message: str
+    # * continue a conversation; a new one is started when missing
+    conversation_id: str | None = Field(default=None, max_length=64)
 
 
 class ChatMessage(SQLModel, table=True):
@@ -18,6 +20,8 @@ class ChatMessage(SQLModel, table=True):
     # * saving, updating, getting, deleting
     id: int | None = Field(default=None, primary_key=True)
     message: str
+    # * agent memory thread (api.ai.memory)
+    conversation_id: str | None = Field(default=None, max_length=64, index=True)
     created_at: datetime = Field(
         default_factory=get_utc_now,
         sa_type=DateTime(timezone=True),
@@ -25,8 +29,13 @@ class ChatMessage(SQLModel, table=True):
         nullable=False,
     )
 
+    # * recent messages are read newest first with keyset pagination
+    __table_args__ = (
+        Index("ix_chatmessage_created_at_id", "created_at", "id"),
+    )
+
 
 class ChatMessageListItem(SQLModel):
     id: int | None = Field(default=None)
     message: str
-    created_ad: datetime = Field(default=None)
+    created_at: datetime = Field(default=None)
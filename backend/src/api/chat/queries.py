@@ -0,0 +1,34 @@
+"""Query helpers for browsing chat messages.
+
+Recent messages are paged newest first with keyset cursors on
+``(created_at, id)`` (same cursor format as the email history), so every
+page is a bounded scan of ``ix_chatmessage_created_at_id``, no matter how
+many messages are stored or how far back the client has scrolled.
+"""
+
+from typing import Optional
+
+from sqlalchemy import tuple_
+from sqlmodel import select
+
+from api.email.queries import decode_cursor
+from .models import ChatMessage
+
+
+def recent_messages_query(limit: int, cursor: Optional[str] = None):
+    """Select the columns of ``ChatMessageListItem``, newest first, past ``cursor``.
+
+    Fetches one extra row so the caller can tell whether a next page exists.
+
+    Raises:
+        InvalidCursorError: If the cursor cannot be decoded
+    """
+    query = select(ChatMessage.id, ChatMessage.message, ChatMessage.created_at)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(created_at, row_id)
+        )
+    return query.order_by(
+        ChatMessage.created_at.desc(), ChatMessage.id.desc()
+    ).limit(limit + 1)
@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
+import json
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+
+from .conversations import new_conversation_id
 from .models import ChatMessagePayLoad, ChatMessage, ChatMessageListItem
-from api.db import get_session
-from api.ai.services import generate_email_message
+from .queries import recent_messages_query
+from api.email.queries import InvalidCursorError, encode_cursor
+from api.db import get_async_session, get_session
 from api.ai.schemas import AgentMessageSchema
-from api.ai.agents import send_email_agent
+from api.ai.agents import agent_config, get_agent, stream_agent_events
+from api.ai.cache import normalize_prompt
+from api.ai.memory import open_chat_memory
+from api.ai.singleflight import SingleFlight
 router = APIRouter()
 
+# Identical messages posted to a conversation while one is being answered
+# share its agent run
+chat_flight = SingleFlight("chat")
+
 @router.get("/")
 def chat_health():
     return {"status": "ok"}
@@ -16,35 +29,59 @@ def chat_health():
 
 
 @router.get("/recent/", response_model=List[ChatMessageListItem])
-def chat_list_messages(session: Session = Depends(get_session)):
-    """
-    docstring
-    """
-    query = select(ChatMessage) #* sql -> query
-    results = session.exec(query).fetchall()[:10]
-    return results
+def chat_list_messages(
+    response: Response,
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session)
+):
+    """List the most recent chat messages, newest first.
 
+    Ordering and the limit run in SQL over ``(created_at, id)``, and only
+    the listed columns are read. The cursor for the next (older) page is
+    returned in the ``X-Next-Cursor`` header (absent on the last page).
 
+    Args:
+        response: Response used to set the pagination header
+        limit: Maximum number of messages to return (default: 10)
+        cursor: Cursor from a previous page's ``X-Next-Cursor`` header
+        session: Database session dependency
 
+    Returns:
+        List[ChatMessageListItem]: Messages with id, text and timestamp
 
-@router.post("/", response_model=AgentMessageSchema)
-def chat_create_message(
-    payload: ChatMessagePayLoad,
-    session: Session = Depends(get_session)
-):
+    Raises:
+        HTTPException: If the cursor is invalid
     """
-    docstring
+    try:
+        query = recent_messages_query(limit, cursor) #* sql -> query
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = session.exec(query).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [ChatMessageListItem(**row._mapping) for row in rows]
+
+
+
+
+async def start_chat(payload: ChatMessagePayLoad, session: AsyncSession):
+    """Store the message and prepare the chat agent run for it.
+
+    Returns:
+        Tuple: (stored ChatMessage, agent, graph input, config)
     """
     data = payload.model_dump()
+    data["conversation_id"] = payload.conversation_id or new_conversation_id()
     print(data)
     obj = ChatMessage.model_validate(data)
     session.add(obj)
-    session.commit()
-    #* session.refresh(obj) #* ensure id/primary key added to the obj instance
+    await session.commit() #* id is set on obj (expire_on_commit=False)
 
-    #* ready to store in the database
-    #*response = generate_email_message(payload.message)
-    email = send_email_agent()
+    #* the agent keeps the conversation (api.ai.memory), so only the new message is sent
+    await open_chat_memory()
+    agent = get_agent("chat")
     msg_data = {
         "messages": [
             {"role": "user",
@@ -52,10 +89,68 @@ def chat_create_message(
              },
         ]
     }
-    result = email.invoke(msg_data)
+    config = agent_config(thread_id=obj.conversation_id, chat_message_id=obj.id)
+    return obj, agent, msg_data, config
+
+
+@router.post("/", response_model=AgentMessageSchema)
+async def chat_create_message(
+    payload: ChatMessagePayLoad,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    docstring
+    """
+    obj, email, msg_data, config = await start_chat(payload, session)
+    result = await chat_flight.ado(
+        f"{obj.conversation_id}:{normalize_prompt(payload.message)}",
+        lambda: email.ainvoke(msg_data, config=config),
+    )
     if not result:
         raise HTTPException(status_code=400, detail = "Error with the email_agent")
     messages = result.get("messages")
     if not messages:
         raise HTTPException(status_code=400, detail = "Error with the email_agent")
-    return messages[-1]
+    return AgentMessageSchema(content=messages[-1].content, conversation_id=obj.conversation_id)
+
+
+@router.post("/stream")
+async def chat_stream_message(
+    payload: ChatMessagePayLoad,
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Chat with the email agent and stream its run as Server-Sent Events.
+
+    Emits a ``conversation`` event with the ids first, then ``token``
+    events with answer text deltas, ``tool_start``/``tool_end`` events
+    around each tool call (with a progress label such as "Fetching
+    inbox…"), and a final ``message`` event (same shape as ``POST /``).
+    Errors are reported as an ``error`` event since the response has
+    already started. Unlike ``POST /``, identical concurrent messages
+    are not coalesced.
+
+    Args:
+        payload: Message and optional conversation id
+
+    Returns:
+        StreamingResponse: ``text/event-stream`` of agent events
+    """
+    obj, agent, msg_data, config = await start_chat(payload, session)
+
+    async def events():
+        data = {"conversation_id": obj.conversation_id, "chat_message_id": obj.id}
+        yield f"event: conversation\ndata: {json.dumps(data)}\n\n"
+        try:
+            async for event, data in stream_agent_events(agent, msg_data, config):
+                if event == "message":
+                    data = {**data, "conversation_id": obj.conversation_id}
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            data = {"detail": f"Error with the email_agent: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,8 @@
 import os
 import sqlmodel
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 DB_URL = os.environ.get('DATABASE_URL')
 
 if DB_URL == "":
@@ -8,13 +10,38 @@ if DB_URL == "":
 
 engine = sqlmodel.create_engine(DB_URL)
 
+
+def get_async_url(url: str) -> str:
+    """Map a sync database URL to the same database's async driver."""
+    for prefix in ("postgresql://", "postgresql+psycopg2://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url  # postgresql+psycopg supports both modes
+
+
+# Used by async routes so slow requests do not hold a threadpool thread
+async_engine = create_async_engine(get_async_url(DB_URL))
+
 # database models
 def init_db():
     print("creating database tables...")
     SQLModel.metadata.create_all(engine)
+    # create_all skips existing tables, so add indexes declared later on
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 # api routes
 def get_session():
     with Session(engine) as session:
         yield session
 
+
+
+async def get_async_session():
+    # Committed objects stay loaded, so no connection is checked out again
+    # (e.g. to refresh ids) while a route awaits a slow LLM call
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,364 @@
+"""Content-addressed storage for email history bodies.
+
+Subject and content are stored once in ``EmailBody``, keyed by the SHA-256
+of the pair and optionally compressed, and each ``EmailHistory`` row only
+keeps the hash. A campaign sent to 100k recipients therefore stores its
+body once instead of 100k times. Reads rehydrate rows transparently;
+rows written before this existed keep their inline subject/content.
+
+Existing rows can be moved into the store with::
+
+    python -m api.email.body_store migrate
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, exists, inspect, text, update
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from api.db import engine
+from .models import EmailBody, EmailHistory, get_utc_now
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+EMAIL_BODY_CODEC = (os.environ.get("EMAIL_BODY_CODEC") or "zlib").lower()
+BODY_CACHE_SIZE = int(os.environ.get("EMAIL_BODY_CACHE_SIZE") or 2048)
+
+
+class _LRU(OrderedDict):
+    """Small thread-safe LRU mapping used for decoded bodies and known hashes.
+
+    Shared by the history writer thread, ``asyncio.to_thread`` workers and
+    threadpool routes, so ``put`` and ``lookup`` hold a lock.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self[key] = value
+            self.move_to_end(key)
+            if len(self) > self.maxsize:
+                self.popitem(last=False)
+
+    def lookup(self, key):
+        with self._lock:
+            value = self.get(key)
+            if value is not None:
+                self.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+    def discard(self, keys: Iterable):
+        with self._lock:
+            for key in keys:
+                self.pop(key, None)
+
+
+# hash -> (subject, content) for recently read or written bodies
+_bodies = _LRU(BODY_CACHE_SIZE)
+# Value left in the inline columns; "" on old SQLite tables that keep NOT NULL
+_inline_cleared = None
+
+
+def body_hash(subject: str, content: str) -> str:
+    """Return the content address of a subject/content pair."""
+    digest = hashlib.sha256()
+    digest.update(subject.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _codec() -> str:
+    if EMAIL_BODY_CODEC == "zstd" and zstandard is None:
+        return "zlib"
+    return EMAIL_BODY_CODEC if EMAIL_BODY_CODEC in ("none", "zlib", "zstd") else "zlib"
+
+
+def encode_body(subject: str, content: str) -> Tuple[str, bytes, int]:
+    """Serialize and compress a body; returns (codec, data, raw size)."""
+    raw = json.dumps([subject, content], ensure_ascii=False).encode("utf-8")
+    codec = _codec()
+    if codec == "zstd":
+        data = zstandard.ZstdCompressor(level=6).compress(raw)
+    elif codec == "zlib":
+        data = zlib.compress(raw, 6)
+    else:
+        data = raw
+    return codec, data, len(raw)
+
+
+def decode_body(codec: str, data: bytes) -> Tuple[str, str]:
+    """Inverse of ``encode_body``."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd email bodies")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+    else:
+        raw = data
+    subject, content = json.loads(raw)
+    return subject, content
+
+
+def _upsert_statement(session: Session):
+    """Dialect-specific INSERT that can skip bodies already stored."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(EmailBody).on_conflict_do_nothing(index_elements=["hash"])
+
+
+def _insert_missing(session: Session, bodies: Dict[str, Tuple[str, str]]):
+    existing = session.exec(
+        select(EmailBody.hash).where(EmailBody.hash.in_(list(bodies)))
+    ).all()
+    for key in set(bodies) - set(existing):
+        codec, data, size = encode_body(*bodies[key])
+        session.add(EmailBody(hash=key, codec=codec, data=data, size=size))
+    # Flush now so concurrent writers racing on the same body fail here
+    session.flush()
+
+
+def store_bodies(session: Session, rows: List[Dict]) -> List[Dict]:
+    """Move subject/content of history rows into the body store.
+
+    Inserts any bodies that are not stored yet (in the caller's
+    transaction) and returns the rows with ``body_hash`` set and the
+    inline subject/content cleared.
+    """
+    missing = {}
+    cached = set()
+    stored = []
+    for row in rows:
+        subject = row.get("subject") or ""
+        content = row.get("content") or ""
+        key = body_hash(subject, content)
+        if _bodies.lookup(key) is None:
+            missing[key] = (subject, content)
+        else:
+            cached.add(key)
+        stored.append({**row, "subject": _inline_cleared, "content": _inline_cleared, "body_hash": key})
+    if missing:
+        statement = _upsert_statement(session)
+        if statement is not None:
+            # A single write statement: no read-then-write race between
+            # concurrent writers (and no SQLite lock-upgrade deadlock)
+            values = []
+            now = get_utc_now()
+            for key, body in missing.items():
+                codec, data, size = encode_body(*body)
+                values.append({"hash": key, "codec": codec, "data": data, "size": size, "created_at": now})
+            session.execute(statement, values)
+        else:
+            try:
+                with session.begin_nested():
+                    _insert_missing(session, missing)
+            except Exception:
+                # Another writer stored one of these bodies first; retry once
+                with session.begin_nested():
+                    _insert_missing(session, missing)
+        # Cached only once the caller's transaction commits
+        session.info.setdefault("new_bodies", {}).update(missing)
+    if cached:
+        # Trusted from the cache without writing; see _drop_uncommitted_bodies
+        session.info.setdefault("cached_bodies", set()).update(cached)
+    return stored
+
+
+@event.listens_for(SASession, "after_commit")
+def _cache_committed_bodies(session):
+    session.info.pop("cached_bodies", None)
+    for key, body in session.info.pop("new_bodies", {}).items():
+        _bodies.put(key, body)
+
+
+@event.listens_for(SASession, "after_transaction_end")
+def _drop_uncommitted_bodies(session, transaction):
+    if transaction.parent is not None:
+        return  # savepoint; wait for the outermost transaction
+    # Still set only if the transaction did not commit
+    session.info.pop("new_bodies", None)
+    # A cached body may have been deleted as unreferenced by another worker
+    # (history retention); forget it so a retry stores it again
+    _bodies.discard(session.info.pop("cached_bodies", ()))
+
+
+def delete_unreferenced_bodies(conn, before: Optional[datetime] = None) -> int:
+    """Delete bodies that no history row references any more.
+
+    Run after history rows are removed (retention). Only bodies first
+    stored before ``before`` are considered, so bodies of rows still being
+    written are left alone.
+
+    Args:
+        conn: Connection inside the caller's transaction
+        before: Only delete bodies created before this time
+
+    Returns:
+        int: Number of bodies deleted
+    """
+    bodies, history = EmailBody.__table__, EmailHistory.__table__
+    statement = bodies.delete().where(~exists().where(history.c.body_hash == bodies.c.hash))
+    if before is not None:
+        statement = statement.where(bodies.c.created_at < before)
+    deleted = conn.execute(statement).rowcount
+    if deleted:
+        _bodies.clear()
+    return deleted
+
+
+def load_bodies(session: Session, hashes: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+    """Fetch and decode bodies by hash, using the in-process cache first."""
+    found = {}
+    wanted = []
+    for key in set(h for h in hashes if h):
+        body = _bodies.lookup(key)
+        if body is None:
+            wanted.append(key)
+        else:
+            found[key] = body
+    if wanted:
+        rows = session.exec(select(EmailBody).where(EmailBody.hash.in_(wanted))).all()
+        for row in rows:
+            found[row.hash] = decode_body(row.codec, row.data)
+            _bodies.put(row.hash, found[row.hash])
+    return found
+
+
+def rehydrate(session: Session, rows: List[Dict]) -> List[Dict]:
+    """Fill subject/content on history row dicts from the body store."""
+    bodies = load_bodies(session, (row.get("body_hash") for row in rows))
+    for row in rows:
+        body = bodies.get(row.pop("body_hash", None))
+        if body:
+            row["subject"], row["content"] = body
+        else:
+            row["subject"] = row.get("subject") or ""
+            row["content"] = row.get("content") or ""
+    return rows
+
+
+def ensure_body_schema():
+    """Bring an existing ``emailhistory`` table up to the body-store schema.
+
+    Adds the ``body_hash`` column and its index (used by retention to find
+    unreferenced bodies, and by the foreign key check when they are
+    deleted) and, on PostgreSQL, relaxes NOT NULL on the inline
+    subject/content columns. Cheap and idempotent; run at startup.
+    """
+    global _inline_cleared
+    inspector = inspect(engine)
+    if not inspector.has_table(EmailHistory.__tablename__):
+        return
+    columns = {c["name"]: c for c in inspector.get_columns(EmailHistory.__tablename__)}
+    with engine.begin() as conn:
+        if "body_hash" not in columns:
+            conn.execute(text(
+                "ALTER TABLE emailhistory ADD COLUMN body_hash VARCHAR(64) "
+                "REFERENCES emailbody(hash)"
+            ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_emailhistory_body_hash ON emailhistory (body_hash)"
+        ))
+        if engine.dialect.name == "postgresql":
+            for name in ("subject", "content"):
+                if not columns[name]["nullable"]:
+                    conn.execute(text(f"ALTER TABLE emailhistory ALTER COLUMN {name} DROP NOT NULL"))
+        elif not (columns["subject"]["nullable"] and columns["content"]["nullable"]):
+            _inline_cleared = ""
+
+
+def migrate_history_bodies(batch_size: int = 1000, verbose: bool = False) -> Dict:
+    """Move inline subject/content of existing history rows into the store.
+
+    Processes rows in id order, one transaction per batch, so it can be
+    interrupted and resumed. On PostgreSQL run ``VACUUM FULL emailhistory``
+    afterwards to hand the freed space back to the filesystem.
+
+    Returns:
+        dict: Storage report with rows migrated, unique bodies and bytes
+            before/after
+    """
+    ensure_body_schema()
+    report = {"rows": 0, "unique_bodies": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = 0
+    while True:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(EmailHistory.id, EmailHistory.subject, EmailHistory.content)
+                .where(EmailHistory.body_hash.is_(None), EmailHistory.id > last_id)
+                .order_by(EmailHistory.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            bodies = {}
+            updates = []
+            for row_id, subject, content in rows:
+                subject, content = subject or "", content or ""
+                key = body_hash(subject, content)
+                bodies[key] = (subject, content)
+                updates.append({"row_id": row_id, "new_hash": key})
+                report["bytes_before"] += len(subject.encode()) + len(content.encode())
+            existing = set(session.exec(
+                select(EmailBody.hash).where(EmailBody.hash.in_(list(bodies)))
+            ).all())
+            for key, body in bodies.items():
+                if key in existing:
+                    continue
+                codec, data, size = encode_body(*body)
+                session.add(EmailBody(hash=key, codec=codec, data=data, size=size))
+                report["unique_bodies"] += 1
+                report["bytes_after"] += len(data) + len(key)
+            session.flush()
+            session.connection().execute(
+                update(EmailHistory)
+                .where(EmailHistory.id == bindparam("row_id"))
+                .values(body_hash=bindparam("new_hash"), subject=_inline_cleared, content=_inline_cleared),
+                updates,
+            )
+            session.commit()
+            report["rows"] += len(rows)
+            # Every row still references its body by hash
+            report["bytes_after"] += len(rows) * 64
+            last_id = rows[-1][0]
+        if verbose:
+            print(f"migrated {report['rows']} rows, {report['unique_bodies']} unique bodies")
+    report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+    report["ratio"] = (
+        round(report["bytes_before"] / report["bytes_after"], 2) if report["bytes_after"] else None
+    )
+    return report
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        print("usage: python -m api.email.body_store migrate")
+        sys.exit(1)
+    print(json.dumps(migrate_history_bodies(verbose=True), indent=2))
@@ -2,8 +2,8 @@
 
 from sqlmodel import SQLModel, Field
 from datetime import datetime, timezone
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Optional, List, Dict
+from pydantic import BaseModel, Field as PydanticField
 
 
 def get_utc_now():
@@ -18,6 +18,20 @@ class BulkEmailRequest(BaseModel):
     tone: Optional[str] = "professional"
 
 
+class CampaignRecipient(BaseModel):
+    """Recipient of a personalized campaign with its merge fields."""
+    email: str
+    fields: Dict[str, str] = {}
+
+
+class CampaignRequest(BaseModel):
+    """Request for a personalized campaign, one generated email per recipient."""
+    prompt: str
+    recipients: List[CampaignRecipient]
+    tone: Optional[str] = "professional"
+    max_concurrency: int = PydanticField(default=8, ge=1, le=64)
+
+
 class ScheduledEmail(SQLModel, table=True):
     """Scheduled email database model."""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -39,8 +53,21 @@ class ScheduleEmailRequest(BaseModel):
     timezone: str = "UTC"
 
 
+class BulkEmailJob(SQLModel, table=True):
+    """Bulk send job database model, updated periodically while running."""
+    id: str = Field(primary_key=True)
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    status: str = "running"  # running, completed, failed
+    created_at: datetime = Field(default_factory=get_utc_now)
+    updated_at: datetime = Field(default_factory=get_utc_now)
+
+
 class BulkEmailProgress(BaseModel):
     """Progress response for bulk email."""
+    job_id: Optional[str] = None
+    status: str = "running"
     total: int
     sent: int
     failed: int
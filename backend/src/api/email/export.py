@@ -0,0 +1,94 @@
+"""Streaming export of email history.
+
+Rows are read through a server-side cursor in fixed-size batches and
+encoded as CSV or NDJSON chunk by chunk, optionally gzip-compressed, so
+memory use does not depend on how many rows are exported.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterator
+
+from sqlmodel import Session, select
+
+from api.db import engine
+from .body_store import rehydrate
+from .models import EmailHistory
+
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ("id", "recipient", "subject", "content", "prompt", "status", "created_at")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_query():
+    """Select only the exported columns plus the body reference."""
+    columns = [getattr(EmailHistory, name) for name in EXPORT_COLUMNS + ("body_hash",)]
+    return select(*columns)
+
+
+def iter_history_rows(query, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list]:
+    """Yield batches of row dicts using a server-side (streaming) cursor.
+
+    Bodies are rehydrated per batch from the content-addressed store.
+    """
+    query = query.order_by(EmailHistory.created_at, EmailHistory.id)
+    names = EXPORT_COLUMNS + ("body_hash",)
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            rows = [dict(zip(names, row)) for row in partition]
+            yield [
+                {name: row[name] for name in EXPORT_COLUMNS}
+                for row in rehydrate(session, rows)
+            ]
+
+
+def encode_csv(batches: Iterator[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in batches:
+        for row in batch:
+            row["created_at"] = row["created_at"].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(batches: Iterator[list]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(row, default=str, ensure_ascii=False) + "\n" for row in batch
+        ).encode("utf-8")
+
+
+def gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Gzip-compress a byte stream incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_history(query, fmt: str = "csv", compress: bool = False) -> Iterator[bytes]:
+    """Stream the rows matched by ``query`` as CSV or NDJSON bytes.
+
+    Args:
+        query: Select statement from ``export_query`` with filters applied
+        fmt: "csv" or "ndjson"
+        compress: Gzip the output stream
+
+    Returns:
+        Iterator[bytes]: Encoded chunks, one per database batch
+    """
+    encode = encode_ndjson if fmt == "ndjson" else encode_csv
+    chunks = encode(iter_history_rows(query))
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,240 @@
+"""Email history persistence with optional write-behind batching.
+
+By default each history write is its own small transaction. With
+``EMAIL_HISTORY_WRITE_BEHIND=1`` records are instead pushed onto a bounded
+in-process queue and a background thread flushes them as multi-row
+INSERTs whenever ``HISTORY_FLUSH_SIZE`` records are waiting or
+``HISTORY_FLUSH_INTERVAL`` seconds have passed. The buffer is flushed on
+application shutdown through the ``lifespan`` hook.
+
+A batch that fails to insert is retried ``HISTORY_FLUSH_RETRIES`` times
+with backoff, then written row by row; rows that still fail are appended
+to ``HISTORY_SPILL_FILE`` (NDJSON) and counted in ``metrics``. Load them
+back once the database is healthy with::
+
+    python -m api.email.history_writer replay
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from api.ai.instrumentation import metrics
+from api.db import engine
+from .body_store import store_bodies
+from .models import EmailHistory, get_utc_now
+
+
+EMAIL_HISTORY_WRITE_BEHIND = os.environ.get("EMAIL_HISTORY_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+HISTORY_FLUSH_SIZE = int(os.environ.get("HISTORY_FLUSH_SIZE") or 200)
+HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL") or 1.0)
+HISTORY_QUEUE_SIZE = int(os.environ.get("HISTORY_QUEUE_SIZE") or 10_000)
+# How long a producer waits on a full buffer before writing synchronously
+HISTORY_SUBMIT_TIMEOUT = 1.0
+HISTORY_FLUSH_RETRIES = int(os.environ.get("HISTORY_FLUSH_RETRIES") or 3)
+HISTORY_SPILL_FILE = os.environ.get("HISTORY_SPILL_FILE") or "email_history_spill.ndjson"
+# Seconds before the first retry of a failed flush; doubled on each retry
+HISTORY_RETRY_BACKOFF = 0.5
+
+
+def history_row(recipient: str, subject: str, content: str, prompt: str, status: str = "sent") -> Dict:
+    """Build an EmailHistory row, stamping created_at at call time."""
+    return {
+        "recipient": recipient,
+        "subject": subject,
+        "content": content,
+        "prompt": prompt,
+        "status": status,
+        "created_at": get_utc_now(),
+    }
+
+
+def insert_history(rows: List[Dict]):
+    """Insert history rows in one transaction as a multi-row INSERT.
+
+    Subject and content go to the content-addressed body store.
+    """
+    if not rows:
+        return
+    with Session(engine) as session:
+        session.execute(insert(EmailHistory), store_bodies(session, rows))
+        session.commit()
+
+
+def insert_rows_individually(rows: List[Dict]) -> List[Dict]:
+    """Insert rows one per transaction; returns the rows that failed."""
+    failed = []
+    for row in rows:
+        try:
+            insert_history([row])
+        except Exception as e:
+            print(f"Failed to write email history record for {row.get('recipient')}: {e}")
+            failed.append(row)
+    return failed
+
+
+def spill_history(rows: List[Dict]):
+    """Append rows that could not be inserted to ``HISTORY_SPILL_FILE``."""
+    try:
+        with open(HISTORY_SPILL_FILE, "a", encoding="utf-8") as handle:
+            for row in rows:
+                handle.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Dropped {len(rows)} email history records, spill file not writable: {e}")
+        metrics.increment("history_rows_dropped", amount=len(rows))
+        return
+    print(f"Spilled {len(rows)} email history records to {HISTORY_SPILL_FILE}")
+    metrics.increment("history_rows_spilled", amount=len(rows))
+
+
+def replay_spilled_history() -> Dict:
+    """Insert the rows of ``HISTORY_SPILL_FILE`` and remove the file.
+
+    The file is renamed before it is read, so rows spilled meanwhile go to
+    a new file; rows that still fail are spilled again.
+
+    Returns:
+        dict: Number of rows inserted and spilled again
+    """
+    spill = Path(HISTORY_SPILL_FILE)
+    if not spill.exists():
+        return {"inserted": 0, "spilled": 0}
+    claimed = spill.with_name(f"{spill.name}.{os.getpid()}.replay")
+    os.replace(spill, claimed)
+    rows = []
+    with open(claimed, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                row = json.loads(line)
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+                rows.append(row)
+    failed = insert_rows_individually(rows)
+    if failed:
+        spill_history(failed)
+    claimed.unlink()
+    return {"inserted": len(rows) - len(failed), "spilled": len(failed)}
+
+
+class HistoryWriter:
+    """Background thread that batches history rows into multi-row INSERTs."""
+
+    def __init__(
+        self,
+        flush_size: int = HISTORY_FLUSH_SIZE,
+        flush_interval: float = HISTORY_FLUSH_INTERVAL,
+        maxsize: int = HISTORY_QUEUE_SIZE,
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread after flushing everything still buffered."""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, row: Dict):
+        """Buffer a row; falls back to a direct insert if the buffer stays full."""
+        try:
+            self.queue.put(row, timeout=HISTORY_SUBMIT_TIMEOUT)
+        except queue.Full:
+            insert_history([row])
+
+    def _drain(self, limit: int) -> List[Dict]:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_interval
+            rows = []
+            while len(rows) < self.flush_size and not self._stop.is_set():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(self.queue.get(timeout=min(timeout, 0.1)))
+                except queue.Empty:
+                    continue
+                rows.extend(self._drain(self.flush_size - len(rows)))
+            self._flush(rows)
+        # Shutdown: write whatever is left
+        while True:
+            rows = self._drain(self.flush_size)
+            if not rows:
+                break
+            self._flush(rows)
+
+    def _flush(self, rows: List[Dict]):
+        if not rows:
+            return
+        for attempt in range(HISTORY_FLUSH_RETRIES + 1):
+            try:
+                insert_history(rows)
+                return
+            except Exception as e:
+                print(f"Failed to flush {len(rows)} email history records (attempt {attempt + 1}): {e}")
+                metrics.increment("history_flush_errors")
+            if attempt < HISTORY_FLUSH_RETRIES:
+                time.sleep(HISTORY_RETRY_BACKOFF * 2 ** attempt)
+        # The batch may be failing on a single bad row: keep the others
+        failed = insert_rows_individually(rows)
+        if failed:
+            spill_history(failed)
+
+
+history_writer = HistoryWriter()
+
+
+def write_history(rows: List[Dict]):
+    """Persist history rows through the write-behind buffer when it is running.
+
+    Falls back to a synchronous multi-row insert otherwise.
+    """
+    if history_writer.running:
+        for row in rows:
+            history_writer.submit(row)
+    else:
+        insert_history(rows)
+
+
+def record_history(**fields):
+    """Persist a single history record; see ``write_history``."""
+    write_history([history_row(**fields)])
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["replay"]:
+        print("usage: python -m api.email.history_writer replay")
+        sys.exit(1)
+    print(json.dumps(replay_spilled_history(), indent=2))
@@ -0,0 +1,360 @@
+"""Streaming recipient ingestion for bulk sends.
+
+Parses CSV or NDJSON recipient lists straight off the request body so that
+very large uploads never have to be held in memory. Rows are normalized,
+deduplicated and handed to the caller one at a time, which lets the send
+queue start working while the upload is still arriving.
+"""
+
+import codecs
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+
+EMAIL_PATTERN = re.compile(r"^[^@\s,;<>]+@[^@\s,;<>]+\.[^@\s,;<>]+$")
+MERGE_FIELD_PATTERN = re.compile(r"\[([A-Za-z_][\w ]*)\]")
+KEY_PUNCTUATION = re.compile(r"[^a-z0-9]")
+
+# Column / key names accepted as the recipient address, compared after
+# ``email_key`` normalization ("E-mail", "Email Address", "recipient_email")
+EMAIL_KEYS = ("email", "emailaddress", "recipient", "recipientemail", "to", "address")
+
+# Distinct addresses deduplicated exactly before switching to a Bloom filter
+DEDUP_EXACT_LIMIT = int(os.environ.get("BULK_DEDUP_EXACT_LIMIT") or 100_000)
+
+
+class UploadFormatError(ValueError):
+    """Raised when an upload cannot be parsed as a recipient list."""
+
+
+@dataclass
+class RecipientRow:
+    """A single normalized recipient with its merge fields."""
+    email: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class IngestStats:
+    """Counters collected while reading an upload."""
+    rows: int = 0
+    accepted: int = 0
+    duplicates: int = 0
+    suspected_duplicates: int = 0
+    invalid: int = 0
+
+
+def normalize_email(address: Optional[str]) -> Optional[str]:
+    """Normalize an email address, returning None if it is not valid.
+
+    Strips whitespace and angle brackets and lowercases the address.
+    """
+    if not address:
+        return None
+    address = address.strip().strip("<>").strip().lower()
+    if not EMAIL_PATTERN.match(address):
+        return None
+    return address
+
+
+def email_key(name: str) -> str:
+    """Normalize a column / key name for matching against ``EMAIL_KEYS``."""
+    return KEY_PUNCTUATION.sub("", name.lower())
+
+
+def render_merge_fields(text: str, fields: Dict[str, str]) -> str:
+    """Replace ``[Field]`` placeholders with per-recipient values.
+
+    Uses the same bracket syntax as the predefined templates. Lookups are
+    case-insensitive and unknown placeholders are left untouched.
+    """
+    if not fields:
+        return text
+    lookup = {k.strip().lower(): v for k, v in fields.items() if k}
+
+    def replace(match):
+        value = lookup.get(match.group(1).strip().lower())
+        return match.group(0) if value is None else str(value)
+
+    return MERGE_FIELD_PATTERN.sub(replace, text)
+
+
+class BloomFilter:
+    """Fixed-size set membership with false positives and no false negatives.
+
+    Memory is fixed up front from ``capacity`` and ``error_rate``.
+    """
+
+    def __init__(self, capacity: int = 2_000_000, error_rate: float = 1e-6):
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = max(bits, 8)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def seen(self, value: str) -> bool:
+        """Record ``value`` and return True if it was (probably) seen before."""
+        present = True
+        for pos in self._positions(value):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
+
+class RecipientDeduper:
+    """Drops repeated addresses, exactly up to ``exact_limit`` distinct ones.
+
+    Past the limit the addresses move into a ``BloomFilter`` so memory
+    stays bounded on very large uploads. From then on a repeat is only
+    probable: ``exact`` turns False and callers should count such hits as
+    suspected duplicates, since a rare unique address can be dropped.
+    """
+
+    def __init__(self, exact_limit: int = DEDUP_EXACT_LIMIT, **bloom_options):
+        self.exact_limit = exact_limit
+        self.bloom_options = bloom_options
+        self.addresses = set()
+        self.bloom: Optional[BloomFilter] = None
+
+    @property
+    def exact(self) -> bool:
+        return self.bloom is None
+
+    def seen(self, value: str) -> bool:
+        """Record ``value`` and return True if it was seen before."""
+        if self.bloom is not None:
+            return self.bloom.seen(value)
+        if value in self.addresses:
+            return True
+        self.addresses.add(value)
+        if len(self.addresses) > self.exact_limit:
+            self.bloom = BloomFilter(**self.bloom_options)
+            for address in self.addresses:
+                self.bloom.seen(address)
+            self.addresses = set()
+        return False
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield complete text lines."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, str]]:
+    """Yield CSV rows as dicts, joining lines for quoted multi-line values."""
+    header = None
+    pending = None
+    async for line in lines:
+        pending = line if pending is None else f"{pending}\n{line}"
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, None
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip() for h in values]
+            if not any(email_key(h) in EMAIL_KEYS for h in header):
+                if any("@" in h for h in header):
+                    # No header row; treat the first column as the address
+                    header = ["email"] + [f"field{i}" for i in range(1, len(values))]
+                    yield dict(zip(header, values))
+                else:
+                    # Header with an unrecognized address column; use the first
+                    header[0] = "email"
+            continue
+        yield dict(zip(header, values))
+    if pending:
+        raise UploadFormatError("Unterminated quoted field in CSV upload")
+
+
+async def iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, str]]:
+    """Yield NDJSON objects, accepting bare strings as addresses."""
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise UploadFormatError(f"Invalid NDJSON line: {e}") from e
+        if isinstance(record, str):
+            record = {"email": record}
+        if not isinstance(record, dict):
+            raise UploadFormatError("NDJSON lines must be objects or strings")
+        yield record
+
+
+def _record_to_row(record: Dict[str, str]) -> RecipientRow:
+    address = None
+    fields = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        if address is None and email_key(key) in EMAIL_KEYS:
+            address = value
+        elif value is not None:
+            fields[key.strip()] = str(value)
+    return RecipientRow(email=address or "", fields=fields)
+
+
+async def iter_recipients(
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    stats: IngestStats,
+    deduper: Optional[RecipientDeduper] = None,
+) -> AsyncIterator[RecipientRow]:
+    """Parse, normalize and deduplicate recipients from a byte stream.
+
+    Args:
+        chunks: Raw upload bytes as they arrive
+        fmt: Either "csv" or "ndjson"
+        stats: Counters updated in place while reading
+        deduper: Optional shared deduplication filter
+
+    Yields:
+        RecipientRow: Each new, valid recipient in upload order
+    """
+    deduper = deduper or RecipientDeduper()
+    lines = iter_lines(chunks)
+    records = iter_ndjson_records(lines) if fmt == "ndjson" else iter_csv_records(lines)
+    async for record in records:
+        stats.rows += 1
+        row = _record_to_row(record)
+        address = normalize_email(row.email)
+        if address is None:
+            stats.invalid += 1
+            continue
+        if deduper.seen(address):
+            stats.duplicates += 1
+            if not deduper.exact:
+                stats.suspected_duplicates += 1
+            continue
+        stats.accepted += 1
+        row.email = address
+        yield row
+
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """Pick "csv" or "ndjson" from a content type or file name."""
+    content_type = (content_type or "").lower()
+    filename = (filename or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    if filename.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+
+class UploadStream:
+    """Incremental reader for a recipient upload request.
+
+    Accepts either a raw ``text/csv`` / ``application/x-ndjson`` body or a
+    ``multipart/form-data`` body with a ``file`` part. For multipart
+    uploads, plain form fields sent *before* the file part are collected in
+    ``form`` so they are known before the first recipient is read.
+    """
+
+    def __init__(self, request: Request, file_field: str = "file"):
+        self.request = request
+        self.file_field = file_field
+        self.form: Dict[str, str] = {}
+        self.format = "csv"
+        content_type, params = parse_options_header(request.headers.get("content-type"))
+        self.is_multipart = content_type == b"multipart/form-data"
+        self.boundary = params.get(b"boundary")
+        if not self.is_multipart:
+            self.format = detect_format(content_type.decode("latin-1"))
+        elif not self.boundary:
+            raise UploadFormatError("Missing multipart boundary")
+
+    async def _multipart_chunks(self) -> AsyncIterator[bytes]:
+        state = {"headers": {}, "field": None, "name": None, "value": []}
+        file_data = []
+
+        def on_header_field(data, start, end):
+            state["field"] = data[start:end].decode("latin-1").lower()
+
+        def on_header_value(data, start, end):
+            state["headers"][state["field"]] = data[start:end].decode("latin-1")
+
+        def on_headers_finished():
+            disposition, params = parse_options_header(
+                state["headers"].get("content-disposition")
+            )
+            state["name"] = params.get(b"name", b"").decode("latin-1")
+            if state["name"] == self.file_field:
+                filename = params.get(b"filename", b"").decode("latin-1")
+                self.format = detect_format(state["headers"].get("content-type"), filename)
+
+        def on_part_data(data, start, end):
+            if state["name"] == self.file_field:
+                file_data.append(data[start:end])
+            else:
+                state["value"].append(data[start:end])
+
+        def on_part_end():
+            if state["name"] != self.file_field and state["name"]:
+                self.form[state["name"]] = b"".join(state["value"]).decode("utf-8")
+            state.update(headers={}, field=None, name=None, value=[])
+
+        parser = MultipartParser(self.boundary, {
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        })
+        async for chunk in self.request.stream():
+            parser.write(chunk)
+            if file_data:
+                data, file_data[:] = b"".join(file_data), []
+                yield data
+        parser.finalize()
+        if file_data:
+            yield b"".join(file_data)
+
+    async def wait_for_file(self) -> AsyncIterator[bytes]:
+        """Consume the body up to the start of the file part.
+
+        Returns an iterator over the remaining file bytes; ``form`` holds any
+        fields that preceded the file.
+        """
+        chunks = self._multipart_chunks() if self.is_multipart else self.request.stream()
+        first = None
+        async for chunk in chunks:
+            first = chunk
+            break
+
+        async def remaining():
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+
+        return remaining()
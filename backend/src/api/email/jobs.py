@@ -0,0 +1,248 @@
+"""Tracked bulk send jobs with live progress.
+
+Each job keeps its sent/failed counters in memory while it runs. A single
+ticker task per job publishes a progress snapshot to all subscribers a few
+times per second and writes the counters to ``BulkEmailJob`` every few
+seconds, so neither the database nor the SMTP workers see any load from
+clients watching progress.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from api.db import engine
+from .bulk import BulkEmailJob, BulkEmailProgress, get_utc_now
+
+
+PUBLISH_INTERVAL = float(os.environ.get("BULK_PUBLISH_INTERVAL") or 0.5)
+FLUSH_INTERVAL = float(os.environ.get("BULK_FLUSH_INTERVAL") or 5)
+JOB_RETENTION = float(os.environ.get("BULK_JOB_RETENTION") or 300)
+# Running jobs save their row every FLUSH_INTERVAL; one not updated for this
+# long belongs to a process that has exited
+STALE_JOB_AFTER = max(3 * FLUSH_INTERVAL, 30)
+
+# Jobs that are running or finished recently, by id
+_jobs: Dict[str, "BulkJob"] = {}
+# Background coroutines that must not be garbage collected mid-flight
+_background_tasks = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background and keep a reference to it."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def build_progress(job_id: Optional[str], status: str, total: int, sent: int, failed: int) -> BulkEmailProgress:
+    """Build a progress snapshot, treating an empty job as complete."""
+    done = sent + failed
+    if total:
+        percent = min(done / total, 1.0) * 100
+    else:
+        percent = 100.0 if status != "running" else 0.0
+    return BulkEmailProgress(
+        job_id=job_id,
+        status=status,
+        total=total,
+        sent=sent,
+        failed=failed,
+        progress_percent=round(percent, 2),
+    )
+
+
+class ProgressBroadcaster:
+    """Fan-out of the latest progress snapshot to any number of subscribers.
+
+    Publishing swaps in a fresh ``asyncio.Event`` and sets the old one, so
+    each publish wakes every waiting subscriber exactly once. Subscribers
+    always read the latest snapshot; slow clients skip intermediate updates
+    instead of queueing them.
+    """
+
+    def __init__(self, snapshot: BulkEmailProgress):
+        self.latest = snapshot
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def publish(self, snapshot: BulkEmailProgress, final: bool = False):
+        self.latest = snapshot
+        self.closed = final
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def subscribe(self, heartbeat: float = 15) -> AsyncIterator[Optional[BulkEmailProgress]]:
+        """Yield snapshots as they are published, or None as a keep-alive."""
+        while True:
+            event = self._event
+            yield self.latest
+            if self.closed:
+                return
+            try:
+                await asyncio.wait_for(event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+
+class BulkJob:
+    """In-memory state of a running bulk send job."""
+
+    def __init__(self, total: int = 0):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.status = "running"
+        self.broadcaster = ProgressBroadcaster(self.snapshot())
+        self._dirty = False
+        self._ticker: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> BulkEmailProgress:
+        return build_progress(self.id, self.status, self.total, self.sent, self.failed)
+
+    def record(self, ok: bool):
+        """Count one send attempt; cheap enough to call from every worker."""
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self._dirty = True
+
+    def add_total(self, count: int = 1):
+        """Grow the total as recipients are discovered (e.g. during upload)."""
+        self.total += count
+        self._dirty = True
+
+    async def start(self):
+        await asyncio.to_thread(self._save, True)
+        self._ticker = asyncio.create_task(self._tick())
+
+    async def finish(self, status: str = "completed"):
+        """Stop the ticker, write the final counters and notify subscribers."""
+        self.status = status
+        if self._ticker:
+            self._ticker.cancel()
+        await asyncio.to_thread(self._save)
+        self.broadcaster.publish(self.snapshot(), final=True)
+        asyncio.get_running_loop().call_later(JOB_RETENTION, _jobs.pop, self.id, None)
+
+    async def _tick(self):
+        since_flush = 0.0
+        while True:
+            await asyncio.sleep(PUBLISH_INTERVAL)
+            since_flush += PUBLISH_INTERVAL
+            if self._dirty:
+                self._dirty = False
+                self.broadcaster.publish(self.snapshot())
+            if since_flush >= FLUSH_INTERVAL:
+                since_flush = 0.0
+                await asyncio.to_thread(self._save)
+
+    def _save(self, create: bool = False):
+        with Session(engine) as session:
+            row = None if create else session.get(BulkEmailJob, self.id)
+            row = row or BulkEmailJob(id=self.id)
+            row.total = self.total
+            row.sent = self.sent
+            row.failed = self.failed
+            row.status = self.status
+            row.updated_at = get_utc_now()
+            session.add(row)
+            session.commit()
+
+
+async def create_job(total: int = 0) -> BulkJob:
+    """Create, persist and register a new bulk job."""
+    job = BulkJob(total=total)
+    await job.start()
+    _jobs[job.id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[BulkJob]:
+    """Return a running or recently finished job from memory."""
+    return _jobs.get(job_id)
+
+
+def load_job_progress(session: Session, job_id: str) -> Optional[BulkEmailProgress]:
+    """Return a job's progress, falling back to its last flushed DB row."""
+    job = get_job(job_id)
+    if job:
+        return job.snapshot()
+    row = session.get(BulkEmailJob, job_id)
+    if not row:
+        return None
+    return build_progress(row.id, row.status, row.total, row.sent, row.failed)
+
+
+def read_job_progress(job_id: str) -> Optional[BulkEmailProgress]:
+    """``load_job_progress`` with a short-lived session, for ``asyncio.to_thread``."""
+    with Session(engine) as session:
+        return load_job_progress(session, job_id)
+
+
+async def run_job(job: BulkJob, queue, producer=None, status: str = "completed"):
+    """Run a job's producer, wait for its send queue to drain, then finish it.
+    
+    Args:
+        job: Job to mark completed (or failed) at the end
+        queue: Started SendQueue fed by the producer
+        producer: Optional coroutine that feeds the queue
+        status: Final status if nothing fails, e.g. "failed" for a job
+            whose input was cut short
+    """
+    try:
+        if producer is not None:
+            await producer
+    except Exception as e:
+        print(f"Bulk job {job.id} failed: {e}")
+        status = "failed"
+    finally:
+        try:
+            await queue.close()
+        except Exception as e:
+            print(f"Bulk job {job.id} failed: {e}")
+            status = "failed"
+        await job.finish(status)
+
+
+def fail_interrupted_jobs() -> int:
+    """Mark jobs left "running" by a process that has exited as failed.
+
+    Returns:
+        int: Number of jobs marked failed
+    """
+    cutoff = get_utc_now() - timedelta(seconds=STALE_JOB_AFTER)
+    with Session(engine) as session:
+        result = session.execute(
+            update(BulkEmailJob)
+            .where(
+                BulkEmailJob.status == "running",
+                BulkEmailJob.updated_at < cutoff,
+                BulkEmailJob.id.not_in(list(_jobs)),
+            )
+            .values(status="failed", updated_at=get_utc_now())
+        )
+        session.commit()
+        return result.rowcount
+
+
+async def reap_interrupted_jobs():
+    """Background loop: fail jobs orphaned by a restart, at startup and then
+    every ``STALE_JOB_AFTER`` seconds (jobs of other live workers keep
+    saving their row and are left alone)."""
+    while True:
+        try:
+            count = await asyncio.to_thread(fail_interrupted_jobs)
+            if count:
+                print(f"Marked {count} interrupted bulk jobs as failed")
+        except Exception as e:
+            print(f"Failed to reap interrupted bulk jobs: {e}")
+        await asyncio.sleep(STALE_JOB_AFTER)
@@ -1,6 +1,6 @@
-from sqlmodel import SQLModel, Field, DateTime
+from sqlmodel import SQLModel, Field, DateTime, Index, LargeBinary
 from datetime import timezone, datetime
-from typing import Optional
+from typing import List, Optional
 
 
 def get_utc_now():
@@ -11,6 +11,7 @@ class EmailRequest(SQLModel):
     recipient: str = Field(description="Email address of the recipient")
     prompt: str = Field(description="User prompt for email generation")
     tone: str = Field(default="professional", description="Email tone: professional, casual, friendly, formal")
+    bypass_cache: bool = Field(default=False, description="Skip the draft cache and generate a new email")
 
 
 class EmailResponse(SQLModel):
@@ -20,11 +21,33 @@ class EmailResponse(SQLModel):
     status: str = "sent"
 
 
+class EmailBody(SQLModel, table=True):
+    # * content-addressed subject + content, shared by every history row
+    # * that sent the same email (see api.email.body_store)
+    hash: str = Field(primary_key=True, max_length=64)
+    codec: str = "zlib"  # none, zlib, zstd
+    data: bytes = Field(sa_type=LargeBinary)
+    size: int = 0  # uncompressed size in bytes
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+
+
 class EmailHistory(SQLModel, table=True):
+    # Keyset pagination walks (created_at, id) newest first
+    __table_args__ = (
+        Index("ix_emailhistory_created_at_id", "created_at", "id"),
+        Index("ix_emailhistory_recipient_created_at", "recipient", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     recipient: str
-    subject: str
-    content: str
+    # * inline subject/content only on rows written before body_hash existed
+    subject: Optional[str] = None
+    content: Optional[str] = None
+    body_hash: Optional[str] = Field(default=None, foreign_key="emailbody.hash", max_length=64)
     prompt: str
     status: str = "sent"
     created_at: datetime = Field(
@@ -41,4 +64,35 @@ class EmailHistoryResponse(SQLModel):
     content: str
     prompt: str
     status: str
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+class TriageRequest(SQLModel):
+    hours_ago: int = Field(default=48, ge=1, description="Triage unread emails from the last N hours")
+    batch_size: Optional[int] = Field(
+        default=None, ge=1, le=50, description="Emails packed into each LLM call (default TRIAGE_BATCH_SIZE)"
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None, ge=1, le=32, description="LLM calls in flight (default TRIAGE_CONCURRENCY)"
+    )
+    retriage: bool = Field(default=False, description="Triage emails again even if already triaged")
+
+
+class TriageResult(SQLModel):
+    uid: str
+    category: str
+    priority: str
+    needs_reply: bool
+    summary: str
+    sender: Optional[str] = None
+    subject: Optional[str] = None
+    created_at: datetime
+
+
+class TriageResponse(SQLModel):
+    fetched: int
+    skipped: int
+    triaged: int
+    failed: int
+    llm_calls: int
+    seconds: float
+    results: List[TriageResult]
@@ -0,0 +1,387 @@
+"""Monthly partitioning, retention and archival for email history.
+
+On PostgreSQL, ``emailhistory`` is created as a table partitioned by range
+on ``created_at`` with one partition per month (plus a default partition
+as a safety net). Partitions for the coming months are created at startup
+and by a daily maintenance task. The retention job writes partitions
+older than ``HISTORY_RETENTION_MONTHS`` to compressed NDJSON (or Parquet,
+if pyarrow is installed) under ``HISTORY_ARCHIVE_DIR``, then detaches and
+drops them. Only one worker runs the maintenance at a time (a PostgreSQL
+advisory lock).
+
+Other databases (SQLite in development) keep a single plain table; the
+retention job then archives and deletes expired rows instead.
+
+Archive files are named after the partition (or cutoff) and the time of
+the run, are only kept when they hold rows and never replace an existing
+file. Email bodies (``api.email.body_store``) left without any history
+row are deleted along with the rows.
+
+Usage::
+
+    python -m api.email.partitions convert     # partition an existing table
+    python -m api.email.partitions retention   # archive expired history now
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, inspect, select, text
+from sqlmodel import Session
+
+from api.db import engine
+from .body_store import delete_unreferenced_bodies, rehydrate
+from .models import EmailBody, EmailHistory
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+
+EMAIL_HISTORY_PARTITIONING = os.environ.get("EMAIL_HISTORY_PARTITIONING", "1").lower() not in ("0", "false", "no")
+HISTORY_RETENTION_MONTHS = int(os.environ.get("HISTORY_RETENTION_MONTHS") or 0)
+HISTORY_ARCHIVE_DIR = os.environ.get("HISTORY_ARCHIVE_DIR") or "archive"
+HISTORY_ARCHIVE_FORMAT = (os.environ.get("HISTORY_ARCHIVE_FORMAT") or "ndjson").lower()
+PARTITION_MONTHS_AHEAD = 3
+MAINTENANCE_INTERVAL = 24 * 60 * 60
+ARCHIVE_BATCH_SIZE = 1000
+# Key of the PostgreSQL advisory lock held while maintenance runs
+MAINTENANCE_LOCK_KEY = 7_245_813_390
+
+TABLE = EmailHistory.__tablename__
+ARCHIVE_COLUMNS = ("id", "recipient", "subject", "content", "prompt", "status", "created_at")
+
+PARTITIONED_TABLE_DDL = f"""
+CREATE TABLE {TABLE} (
+    id SERIAL NOT NULL,
+    recipient VARCHAR NOT NULL,
+    subject VARCHAR,
+    content VARCHAR,
+    body_hash VARCHAR(64) REFERENCES {EmailBody.__tablename__} (hash),
+    prompt VARCHAR NOT NULL,
+    status VARCHAR NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+
+BOUND_PATTERN = re.compile(r"TO \('([^']+)'\)")
+
+
+def is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def add_months(day: date, months: int) -> date:
+    """Return the first day of the month ``months`` after ``day``'s month."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bound(day: date) -> str:
+    return f"{day.isoformat()} 00:00:00+00"
+
+
+def is_partitioned(conn) -> bool:
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :name AND c.relnamespace = 'public'::regnamespace"
+    ), {"name": TABLE}).first())
+
+
+def list_partitions(conn) -> List[Tuple[str, Optional[datetime]]]:
+    """Return ``(name, upper bound)`` for every partition; None for default."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name ORDER BY c.relname"
+    ), {"name": TABLE}).all()
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_PATTERN.search(bound or "")
+        upper = datetime.fromisoformat(match.group(1)) if match else None
+        partitions.append((name, upper))
+    return partitions
+
+
+def create_month_partition(conn, month: date):
+    """Create and attach the partition for ``month`` if it is missing.
+
+    Rows for that month that already landed in the default partition are
+    moved into the new partition before it is attached.
+    """
+    name = partition_name(month)
+    if inspect(conn).has_table(name):
+        return
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    if inspect(conn).has_table(f"{TABLE}_default"):
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {TABLE}_default "
+            f"WHERE created_at >= :lower AND created_at < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ), {"lower": lower, "upper": upper})
+    conn.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+
+
+def ensure_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """Create the current and upcoming monthly partitions (PostgreSQL only)."""
+    if not is_postgres():
+        return
+    today = datetime.now(timezone.utc).date()
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return
+        # Months already covered (e.g. by a converted legacy partition) are skipped
+        bounds = [upper for _, upper in list_partitions(conn) if upper]
+        covered = max(bounds) if bounds else None
+        for offset in range(months_ahead + 1):
+            month = add_months(today, offset)
+            start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+            if covered and start < covered:
+                continue
+            create_month_partition(conn, month)
+
+
+def create_partitioned_history():
+    """Create ``emailhistory`` as a partitioned table on a fresh PostgreSQL DB.
+
+    Must run before ``init_db`` so ``create_all`` finds the table already in
+    place; existing tables are left alone (see ``convert_to_partitioned``).
+    """
+    if not (EMAIL_HISTORY_PARTITIONING and is_postgres()):
+        return
+    EmailBody.__table__.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if inspect(conn).has_table(TABLE):
+            return
+        conn.execute(text(PARTITIONED_TABLE_DDL))
+        conn.execute(text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+    ensure_partitions()
+
+
+def convert_to_partitioned():
+    """Turn an existing plain ``emailhistory`` table into a partitioned one.
+
+    The old table is renamed to ``emailhistory_legacy`` and attached as a
+    single partition holding everything before next month; new monthly
+    partitions follow it. Attaching validates the legacy rows with one
+    scan, so run this during a quiet period.
+    """
+    if not is_postgres():
+        print("Partitioning is only supported on PostgreSQL")
+        return
+    next_month = add_months(datetime.now(timezone.utc).date(), 1)
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            print(f"{TABLE} is already partitioned")
+            return
+        legacy = f"{TABLE}_legacy"
+        max_id = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {TABLE}")).scalar()
+        sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+        pkey = inspect(conn).get_pk_constraint(TABLE)["name"]
+        # Free up the names the new parent table is about to take
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {pkey} TO {legacy}_pkey"))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+        for index in inspect(conn).get_indexes(legacy):
+            conn.execute(text(f"ALTER INDEX {index['name']} RENAME TO {legacy}_{index['name']}"))
+        conn.execute(text(PARTITIONED_TABLE_DDL))
+        conn.execute(text(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {legacy} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{_bound(next_month)}')"
+        ))
+        conn.execute(text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), :value, false)"
+        ), {"value": max_id + 1})
+    for index in EmailHistory.__table__.indexes:
+        index.create(engine, checkfirst=True)
+    ensure_partitions()
+
+
+def _archive_path(label: str) -> Path:
+    directory = Path(HISTORY_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    suffix = "parquet" if HISTORY_ARCHIVE_FORMAT == "parquet" and pyarrow else "ndjson.gz"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return directory / f"{label}_{stamp}.{suffix}"
+
+
+def _iter_archive_batches(session: Session, table: Table, before: Optional[datetime] = None):
+    query = select(*[table.c[name] for name in ARCHIVE_COLUMNS + ("body_hash",)])
+    if before is not None:
+        query = query.where(table.c.created_at < before)
+    query = query.order_by(table.c.created_at, table.c.id)
+    names = ARCHIVE_COLUMNS + ("body_hash",)
+    result = session.execute(query.execution_options(yield_per=ARCHIVE_BATCH_SIZE))
+    for partition in result.partitions():
+        yield rehydrate(session, [dict(zip(names, row)) for row in partition])
+
+
+def write_archive(table_name: str, label: str, before: Optional[datetime] = None) -> Dict:
+    """Write the rows of ``table_name`` (optionally only those created
+    before ``before``) to an archive file.
+
+    Rows go to a temporary file that is renamed into place once complete;
+    when there are no rows no file is left behind.
+
+    Returns:
+        dict: Archive path (None if nothing was written) and number of rows
+
+    Raises:
+        FileExistsError: If an archive with the same name already exists
+    """
+    path = _archive_path(label)
+    partial = path.with_name(path.name + ".partial")
+    count = 0
+    try:
+        with Session(engine) as session:
+            table = Table(table_name, MetaData(), autoload_with=session.connection())
+            batches = _iter_archive_batches(session, table, before)
+            if path.suffix == ".parquet":
+                writer = None
+                for batch in batches:
+                    chunk = pyarrow.Table.from_pylist(batch)
+                    writer = writer or pyarrow.parquet.ParquetWriter(partial, chunk.schema, compression="zstd")
+                    writer.write_table(chunk)
+                    count += len(batch)
+                if writer:
+                    writer.close()
+            else:
+                with gzip.open(partial, "xt", encoding="utf-8") as handle:
+                    for batch in batches:
+                        for row in batch:
+                            handle.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+                        count += len(batch)
+        if count:
+            os.link(partial, path)  # fails instead of replacing an existing archive
+    finally:
+        partial.unlink(missing_ok=True)
+    return {"archive": str(path) if count else None, "rows": count}
+
+
+def archive_expired_history(retain_months: int = HISTORY_RETENTION_MONTHS) -> List[Dict]:
+    """Archive and remove history older than ``retain_months`` whole months.
+
+    On partitioned PostgreSQL tables whole partitions are archived while
+    still attached, then detached and dropped in one transaction, which
+    costs no row-level deletes or vacuum. Elsewhere the expired rows are
+    archived and deleted. Nothing is removed unless its archive was written.
+    Email bodies no remaining row references are then deleted too.
+
+    Returns:
+        List[dict]: One entry per archive file written, with the number of
+        bodies deleted with it (``bodies_deleted``)
+    """
+    if retain_months <= 0:
+        return []
+    cutoff_day = add_months(datetime.now(timezone.utc).date(), -retain_months)
+    cutoff = datetime(cutoff_day.year, cutoff_day.month, 1, tzinfo=timezone.utc)
+    reports = []
+
+    with engine.connect() as conn:
+        partitioned = is_postgres() and is_partitioned(conn)
+        partitions = list_partitions(conn) if partitioned else []
+
+    if not partitioned:
+        table = EmailHistory.__table__
+        label = f"{TABLE}_before_{cutoff_day.isoformat()}"
+        report = write_archive(TABLE, label, before=cutoff)
+        if not report["rows"]:
+            return []
+        with engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.created_at < cutoff))
+            report["bodies_deleted"] = delete_unreferenced_bodies(conn, before=cutoff)
+        return [report]
+
+    for name, upper in partitions:
+        if upper is None or upper > cutoff:
+            continue
+        report = write_archive(name, name)
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        with engine.begin() as conn:
+            report["bodies_deleted"] = delete_unreferenced_bodies(conn, before=cutoff)
+        reports.append({"partition": name, **report})
+    return reports
+
+
+@contextmanager
+def maintenance_lock():
+    """Hold the maintenance advisory lock, if no other worker has it.
+
+    Yields:
+        bool: Whether this process may run maintenance (always True on
+        databases without advisory locks)
+    """
+    if not is_postgres():
+        yield True
+        return
+    with engine.connect() as conn:
+        held = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar()
+        conn.commit()  # session-level lock; don't sit idle in a transaction
+        try:
+            yield bool(held)
+        finally:
+            if held:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+                conn.commit()
+
+
+def run_maintenance(retain_months: int = HISTORY_RETENTION_MONTHS) -> Optional[List[Dict]]:
+    """Create upcoming partitions and apply retention, in one worker only.
+
+    Returns:
+        Optional[List[dict]]: Archive reports, None if another worker holds
+        the maintenance lock
+    """
+    with maintenance_lock() as held:
+        if not held:
+            print("Email history maintenance is running in another worker")
+            return None
+        ensure_partitions()
+        return archive_expired_history(retain_months)
+
+
+async def maintain_partitions():
+    """Background loop: create upcoming partitions and apply retention daily."""
+    while True:
+        try:
+            reports = await asyncio.to_thread(run_maintenance)
+            for report in reports or []:
+                print(f"Archived email history: {report}")
+        except Exception as e:
+            print(f"Email history maintenance failed: {e}")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+if __name__ == "__main__":
+    commands = {"convert": convert_to_partitioned, "retention": run_maintenance}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print("usage: python -m api.email.partitions [convert|retention]")
+        sys.exit(1)
+    result = commands[sys.argv[1]]()
+    if result is not None:
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,104 @@
+"""Query helpers for browsing email history.
+
+History is paged with keyset cursors on ``(created_at, id)`` so every page
+is a bounded index range scan, no matter how deep the client has scrolled.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlmodel import Session, select
+
+from .models import EmailHistory
+
+
+# Upper bound for the exact fallback count on databases without planner stats
+COUNT_ESTIMATE_CAP = 10_000
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the position after ``(created_at, id)`` as an opaque cursor."""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by ``encode_cursor``."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+
+def filter_history(
+    query,
+    recipient: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """Apply the history filters shared by listing and export endpoints.
+
+    Args:
+        query: Select statement over EmailHistory
+        recipient: Exact recipient address
+        status: Record status (sent, failed)
+        date_from: Inclusive lower bound on created_at
+        date_to: Exclusive upper bound on created_at
+
+    Returns:
+        The filtered select statement
+    """
+    if recipient:
+        query = query.where(EmailHistory.recipient == recipient.strip())
+    if status:
+        query = query.where(EmailHistory.status == status)
+    if date_from:
+        query = query.where(EmailHistory.created_at >= date_from)
+    if date_to:
+        query = query.where(EmailHistory.created_at < date_to)
+    return query
+
+
+def page_history(query, limit: int, cursor: Optional[str] = None):
+    """Order newest first and seek past ``cursor``.
+
+    Fetches one extra row so the caller can tell whether a next page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(
+            # The plain bound lets PostgreSQL prune newer partitions
+            EmailHistory.created_at <= created_at,
+            tuple_(EmailHistory.created_at, EmailHistory.id) < tuple_(created_at, row_id),
+        )
+    return query.order_by(
+        EmailHistory.created_at.desc(), EmailHistory.id.desc()
+    ).limit(limit + 1)
+
+
+def estimate_count(session: Session, query) -> int:
+    """Estimate how many rows ``query`` matches without a full COUNT(*).
+
+    On PostgreSQL this reads the planner's row estimate from EXPLAIN. Other
+    databases get an exact count capped at ``COUNT_ESTIMATE_CAP``.
+    """
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql":
+        compiled = query.compile(dialect=bind.dialect)
+        result = session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+        ).scalar()
+        plan = result if isinstance(result, list) else json.loads(result)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    capped = query.limit(COUNT_ESTIMATE_CAP).subquery()
+    return session.exec(select(func.count()).select_from(capped)).one()
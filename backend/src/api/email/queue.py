@@ -0,0 +1,146 @@
+"""Bounded send queue for bulk email delivery.
+
+Producers (e.g. an upload being parsed) push messages with ``put`` and are
+paused when the queue is full, so memory stays bounded no matter how many
+recipients are fed in. A small pool of workers sends each message over SMTP
+in a thread and records the outcome in ``EmailHistory`` in batches.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from api.myemailer.sender import send_mail
+from .history_writer import history_row, spill_history, write_history
+
+
+BULK_SEND_WORKERS = int(os.environ.get("BULK_SEND_WORKERS") or 4)
+BULK_QUEUE_SIZE = int(os.environ.get("BULK_QUEUE_SIZE") or 1000)
+HISTORY_BATCH_SIZE = 100
+# How often a producer blocked on a full queue checks the workers are alive
+WORKER_CHECK_INTERVAL = 1.0
+
+
+@dataclass
+class OutgoingEmail:
+    """A fully rendered message waiting to be sent."""
+    recipient: str
+    subject: str
+    content: str
+    prompt: str
+
+
+class SendQueue:
+    """Bounded asyncio queue drained by a pool of SMTP workers.
+
+    Example:
+        >>> queue = SendQueue()
+        >>> queue.start()
+        >>> await queue.put(OutgoingEmail(...))
+        >>> await queue.close()
+    """
+
+    def __init__(self, workers: int = BULK_SEND_WORKERS, maxsize: int = BULK_QUEUE_SIZE, job=None):
+        self.workers = workers
+        self.job = job
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.sent = 0
+        self.failed = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Spawn the worker tasks on the running event loop."""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def put(self, item: OutgoingEmail):
+        """Queue a message, waiting while the queue is full.
+
+        Raises:
+            RuntimeError: If every worker has stopped
+        """
+        if not await self._put(item):
+            raise RuntimeError("All send workers have stopped")
+
+    async def close(self):
+        """Wait for queued messages to be sent, then stop the workers.
+
+        Raises:
+            RuntimeError: If a worker died, leaving messages unsent
+        """
+        for _ in self._tasks:
+            if not await self._put(None):
+                break
+        results = await asyncio.gather(*self._tasks, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise RuntimeError(f"{len(errors)} send workers failed: {errors[0]!r}")
+
+    def discard_pending(self) -> int:
+        """Drop the messages still waiting to be sent; returns how many."""
+        dropped = 0
+        while True:
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return dropped
+            dropped += 1
+
+    async def _put(self, item: Optional[OutgoingEmail]) -> bool:
+        """Put ``item`` unless all workers are gone; returns whether it was queued."""
+        while not all(task.done() for task in self._tasks):
+            try:
+                await asyncio.wait_for(self.queue.put(item), WORKER_CHECK_INTERVAL)
+                return True
+            except asyncio.TimeoutError:
+                continue
+        return False
+
+    def on_result(self, item: OutgoingEmail, error: Optional[Exception]):
+        """Hook called after every send attempt."""
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+        if self.job is not None:
+            self.job.record(error is None)
+
+    async def _worker(self):
+        pending: List[dict] = []
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                break
+            error = None
+            try:
+                await asyncio.to_thread(
+                    send_mail,
+                    subject=item.subject,
+                    content=item.content,
+                    to_email=item.recipient,
+                )
+            except Exception as e:
+                error = e
+            try:
+                self.on_result(item, error)
+                pending.append(history_row(
+                    recipient=item.recipient,
+                    subject=item.subject,
+                    content=item.content if error is None else str(error),
+                    prompt=item.prompt,
+                    status="sent" if error is None else "failed",
+                ))
+            except Exception as e:
+                print(f"Failed to record bulk send to {item.recipient}: {e}")
+            if len(pending) >= HISTORY_BATCH_SIZE:
+                await self._write_history(pending)
+                pending = []
+        await self._write_history(pending)
+
+    async def _write_history(self, rows: List[dict]):
+        try:
+            await asyncio.to_thread(write_history, rows)
+        except Exception as e:
+            print(f"Failed to write {len(rows)} bulk send history records: {e}")
+            spill_history(rows)
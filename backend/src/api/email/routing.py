@@ -2,24 +2,44 @@
 
 This module provides API endpoints for:
 - Generating and sending emails using AI
-- Creating email drafts
+- Creating email drafts (optionally streamed)
 - Sending edited drafts
-- Retrieving email history
+- Retrieving and exporting email history
+- Streaming bulk sends from CSV/NDJSON uploads
+- Tracking bulk send jobs with live progress events
+- Personalized campaigns with concurrent AI generation
+- Batched AI triage of the inbox
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Literal, Optional
+import asyncio
+import json
 
-from .models import EmailRequest, EmailResponse, EmailHistory, EmailHistoryResponse
-from .bulk import BulkEmailRequest, ScheduledEmail, ScheduleEmailRequest, BulkEmailProgress
+from .models import (EmailRequest, EmailResponse, EmailHistory, EmailHistoryResponse,
+                     TriageRequest, TriageResponse, TriageResult)
+from .bulk import (BulkEmailRequest, ScheduledEmail, ScheduleEmailRequest, BulkEmailProgress,
+                   CampaignRequest)
+from .ingest import (UploadStream, UploadFormatError, IngestStats,
+                     iter_recipients, render_merge_fields)
+from .queue import SendQueue, OutgoingEmail
+from .history_writer import record_history
+from .body_store import rehydrate
+from .queries import (InvalidCursorError, encode_cursor, estimate_count,
+                      filter_history, page_history)
+from .export import EXPORT_MEDIA_TYPES, export_history, export_query
+from .jobs import create_job, get_job, load_job_progress, read_job_progress, run_job, spawn
 from api.db import get_session
-from api.ai.services import generate_email_message
+from api.ai.services import (agenerate_email_message, generate_personalized_messages,
+                             stream_email_message)
+from api.ai.cache import draft_cache
+from api.ai.singleflight import singleflight_stats
+from api.ai.triage import get_triage_results, triage_inbox
 from api.myemailer.sender import send_mail
 from pydantic import BaseModel
 from datetime import datetime
-import csv
-import io
 
 
 class SendDraftRequest(BaseModel):
@@ -49,10 +69,7 @@ def email_health():
 
 
 @router.post("/send", response_model=EmailResponse, tags=["Email"])
-def send_email(
-    request: EmailRequest,
-    session: Session = Depends(get_session)
-):
+async def send_email(request: EmailRequest):
     """Generate and send an email using AI based on user prompt.
     
     This endpoint:
@@ -62,7 +79,6 @@ def send_email(
     
     Args:
         request: EmailRequest containing recipient and prompt
-        session: Database session dependency
         
     Returns:
         EmailResponse: Contains subject, content, recipient, and status
@@ -72,25 +88,27 @@ def send_email(
     """
     try:
         # Generate email content using AI with specified tone
-        email_data = generate_email_message(request.prompt, request.tone)
+        email_data = await agenerate_email_message(
+            request.prompt, request.tone, use_cache=not request.bypass_cache
+        )
         
-        # Send the email via SMTP
-        send_mail(
+        # Send the email via SMTP (blocking smtplib, so off the event loop)
+        await asyncio.to_thread(
+            send_mail,
             subject=email_data.subject,
             content=email_data.content,
             to_email=request.recipient
         )
         
         # Save successful email to database
-        email_record = EmailHistory(
+        await asyncio.to_thread(
+            record_history,
             recipient=request.recipient,
             subject=email_data.subject,
             content=email_data.content,
             prompt=request.prompt,
             status="sent"
         )
-        session.add(email_record)
-        session.commit()
         
         return EmailResponse(
             subject=email_data.subject,
@@ -101,43 +119,114 @@ def send_email(
         
     except Exception as e:
         # Log failed attempt to database for tracking
-        email_record = EmailHistory(
+        await asyncio.to_thread(
+            record_history,
             recipient=request.recipient,
             subject="Failed to generate",
             content=str(e),
             prompt=request.prompt,
             status="failed"
         )
-        session.add(email_record)
-        session.commit()
         
         raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
 
 
 @router.get("/history", response_model=List[EmailHistoryResponse], tags=["Email"])
 def get_email_history(
-    limit: int = 10,
+    response: Response,
+    limit: int = Query(default=10, ge=1, le=200),
+    cursor: Optional[str] = None,
+    recipient: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    include_count: bool = False,
     session: Session = Depends(get_session)
 ):
-    """Retrieve email history with pagination.
+    """Retrieve email history with keyset pagination and filters.
     
-    Fetches the most recent emails from the database, ordered by creation date.
+    Fetches emails newest first. Pages are addressed by an opaque cursor
+    over ``(created_at, id)`` so any page costs the same as the first one.
+    The cursor for the next page is returned in the ``X-Next-Cursor``
+    header (absent on the last page).
     
     Args:
+        response: Response used to set pagination headers
         limit: Maximum number of emails to return (default: 10)
+        cursor: Cursor from a previous page's ``X-Next-Cursor`` header
+        recipient: Only emails sent to this address
+        status: Only emails with this status (sent, failed)
+        date_from: Only emails created at or after this time
+        date_to: Only emails created before this time
+        include_count: Add an ``X-Total-Estimate`` header with an
+            approximate number of matching emails
         session: Database session dependency
         
     Returns:
         List[EmailHistoryResponse]: List of email history records
+        
+    Raises:
+        HTTPException: If the cursor is invalid
     """
-    # Query emails ordered by most recent first
-    query = select(EmailHistory).order_by(EmailHistory.created_at.desc()).limit(limit)
-    results = session.exec(query).all()
-    return results
+    query = filter_history(select(EmailHistory), recipient, status, date_from, date_to)
+    if include_count:
+        response.headers["X-Total-Estimate"] = str(estimate_count(session, query))
+
+    try:
+        page_query = page_history(query, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = session.exec(page_query).all()
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+    # Subject/content live in the shared body store
+    return rehydrate(session, [record.model_dump() for record in results])
+
+
+@router.get("/history/export", tags=["Email"])
+def export_email_history(
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    recipient: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """Stream email history as a CSV or NDJSON download.
+    
+    Accepts the same filters as ``/history``. Rows are streamed from a
+    server-side cursor in batches, so memory use stays constant regardless
+    of table size.
+    
+    Args:
+        format: Output format, "csv" or "ndjson" (default: csv)
+        gzip: Gzip-compress the download
+        recipient: Only emails sent to this address
+        status: Only emails with this status (sent, failed)
+        date_from: Only emails created at or after this time
+        date_to: Only emails created before this time
+        
+    Returns:
+        StreamingResponse: The export file
+    """
+    query = filter_history(export_query(), recipient, status, date_from, date_to)
+    filename = f"email_history.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export_history(query, format, compress=gzip),
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 @router.post("/draft", tags=["Email"])
-def draft_email(request: EmailRequest):
+async def draft_email(request: EmailRequest):
     """Generate an email draft without sending.
     
     Creates an email draft using AI that can be edited before sending.
@@ -154,7 +243,9 @@ def draft_email(request: EmailRequest):
     """
     try:
         # Generate email content using AI with specified tone
-        email_data = generate_email_message(request.prompt, request.tone)
+        email_data = await agenerate_email_message(
+            request.prompt, request.tone, use_cache=not request.bypass_cache
+        )
         return {
             "subject": email_data.subject,
             "content": email_data.content,
@@ -164,11 +255,112 @@ def draft_email(request: EmailRequest):
         raise HTTPException(status_code=500, detail=f"Failed to generate draft: {str(e)}")
 
 
-@router.post("/send-draft", response_model=EmailResponse, tags=["Email"])
-def send_edited_draft(
-    request: SendDraftRequest,
-    session: Session = Depends(get_session)
+@router.post("/draft/stream", tags=["Email"])
+async def draft_email_stream(request: EmailRequest):
+    """Generate an email draft and stream it as Server-Sent Events.
+    
+    Emits ``subject`` and ``content`` events carrying text deltas as the
+    model produces them, then a final ``message`` event with the complete
+    draft (same shape as ``/draft``). A ``reset`` event
+    (``{"field": ..., "value": ...}``) replaces a field's text when the model
+    revised what was already sent. Errors are reported as an ``error``
+    event since the response has already started.
+    
+    Args:
+        request: EmailRequest containing recipient and prompt
+        
+    Returns:
+        StreamingResponse: ``text/event-stream`` of draft events
+    """
+    async def events():
+        try:
+            async for field, value in stream_email_message(
+                request.prompt, request.tone, use_cache=not request.bypass_cache
+            ):
+                if field == "message":
+                    data = {
+                        "subject": value.subject,
+                        "content": value.content,
+                        "recipient": request.recipient
+                    }
+                elif field == "reset":
+                    data = value
+                else:
+                    data = {"delta": value}
+                yield f"event: {field}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            data = {"detail": f"Failed to generate draft: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/draft/cache", tags=["Email"])
+def draft_cache_stats():
+    """Hit/miss statistics for the draft generation cache."""
+    return draft_cache.stats()
+
+
+@router.get("/draft/coalescing", tags=["Email"])
+def draft_coalescing_stats():
+    """Single-flight metrics: upstream calls made vs. identical requests coalesced."""
+    return singleflight_stats()
+
+
+@router.post("/triage", response_model=TriageResponse, tags=["Email"])
+async def triage_unread_emails(request: TriageRequest):
+    """Triage unread emails with batched AI calls.
+    
+    Packs ``batch_size`` emails into each structured LLM call and runs up
+    to ``max_concurrency`` calls at once. Each email gets a category,
+    priority, needs-reply flag and one-line summary, stored by IMAP UID so
+    later runs only triage new emails.
+    
+    Args:
+        request: TriageRequest with hours_ago, batch_size, max_concurrency
+                 and retriage
+        
+    Returns:
+        TriageResponse: Counts (fetched, skipped, triaged, failed), LLM
+            calls, elapsed seconds and the new results
+        
+    Raises:
+        HTTPException: 500 if the inbox cannot be read
+    """
+    try:
+        report = await triage_inbox(
+            hours_ago=request.hours_ago,
+            batch_size=request.batch_size,
+            max_concurrency=request.max_concurrency,
+            retriage=request.retriage,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error triaging emails: {str(e)}")
+    return report
+
+
+@router.get("/triage", response_model=List[TriageResult], tags=["Email"])
+def list_triage_results(
+    limit: int = Query(default=100, ge=1, le=1000),
+    needs_reply: Optional[bool] = None,
+    priority: Optional[Literal["high", "normal", "low"]] = None,
 ):
+    """Stored triage results, newest first.
+    
+    Args:
+        limit: Maximum number of results
+        needs_reply: Only emails that do (True) or do not (False) need a reply
+        priority: Only emails with this priority
+    """
+    return get_triage_results(limit=limit, needs_reply=needs_reply, priority=priority)
+
+
+@router.post("/send-draft", response_model=EmailResponse, tags=["Email"])
+def send_edited_draft(request: SendDraftRequest):
     """Send a user-edited draft email.
     
     Sends an email with manually edited subject and content.
@@ -176,7 +368,6 @@ def send_edited_draft(
     
     Args:
         request: SendDraftRequest with recipient, subject, and content
-        session: Database session dependency
         
     Returns:
         EmailResponse: Contains subject, content, recipient, and status
@@ -192,15 +383,13 @@ def send_edited_draft(
             to_email=request.recipient
         )
         
-        email_record = EmailHistory(
+        record_history(
             recipient=request.recipient,
             subject=request.subject,
             content=request.content,
             prompt="Edited draft",
             status="sent"
         )
-        session.add(email_record)
-        session.commit()
         
         return EmailResponse(
             subject=request.subject,
@@ -212,45 +401,202 @@ def send_edited_draft(
         raise HTTPException(status_code=500, detail=f"Failed to send draft: {str(e)}")
 
 
-@router.post("/bulk", tags=["Email"])
-def send_bulk_email(
-    request: BulkEmailRequest,
-    session: Session = Depends(get_session)
-):
-    """Send email to multiple recipients."""
-    results = {"total": len(request.recipients), "sent": 0, "failed": 0}
+@router.post("/bulk", response_model=BulkEmailProgress, tags=["Email"])
+async def send_bulk_email(request: BulkEmailRequest):
+    """Send email to multiple recipients as a tracked background job.
     
-    for recipient in request.recipients:
-        try:
-            send_mail(
-                subject=request.subject,
-                content=request.content,
-                to_email=recipient
-            )
-            
-            email_record = EmailHistory(
+    Returns immediately with the job id; follow progress through
+    ``GET /bulk/{job_id}`` or the ``/bulk/{job_id}/events`` stream.
+    """
+    job = await create_job(total=len(request.recipients))
+    queue = SendQueue(job=job)
+    queue.start()
+    prompt = f"Bulk email - {request.tone} tone"
+
+    async def feed():
+        for recipient in request.recipients:
+            await queue.put(OutgoingEmail(
                 recipient=recipient,
                 subject=request.subject,
                 content=request.content,
-                prompt=f"Bulk email - {request.tone} tone",
-                status="sent"
-            )
-            session.add(email_record)
-            results["sent"] += 1
-        except Exception as e:
-            email_record = EmailHistory(
+                prompt=prompt,
+            ))
+
+    spawn(run_job(job, queue, feed()))
+    return job.snapshot()
+
+
+@router.post("/campaign", response_model=BulkEmailProgress, tags=["Email"])
+async def send_campaign(request: CampaignRequest):
+    """Generate and send a personalized email to every recipient.
+    
+    Drafts are generated concurrently (up to ``max_concurrency`` LLM calls
+    in flight) and each one is queued for sending as soon as it is ready,
+    so delivery overlaps with generation. Runs as a tracked bulk job.
+    
+    Args:
+        request: CampaignRequest with base prompt, tone and recipients
+        
+    Returns:
+        BulkEmailProgress: Initial job progress including the job id
+    """
+    job = await create_job(total=len(request.recipients))
+    queue = SendQueue(job=job)
+    queue.start()
+    prompt = f"Campaign - {request.prompt}"
+
+    async def feed():
+        recipients = request.recipients
+        results = generate_personalized_messages(
+            request.prompt,
+            [{"email": r.email, **r.fields} for r in recipients],
+            tone=request.tone or "professional",
+            max_concurrency=request.max_concurrency,
+        )
+        async for index, email_data in results:
+            recipient = recipients[index].email
+            if isinstance(email_data, Exception):
+                job.record(False)
+                await asyncio.to_thread(
+                    record_history,
+                    recipient=recipient,
+                    subject="Failed to generate",
+                    content=str(email_data),
+                    prompt=prompt,
+                    status="failed"
+                )
+                continue
+            await queue.put(OutgoingEmail(
                 recipient=recipient,
-                subject=request.subject,
-                content=str(e),
-                prompt=f"Bulk email - {request.tone} tone",
-                status="failed"
-            )
-            session.add(email_record)
-            results["failed"] += 1
+                subject=email_data.subject,
+                content=email_data.content,
+                prompt=prompt,
+            ))
+
+    spawn(run_job(job, queue, feed()))
+    return job.snapshot()
+
+
+@router.post("/bulk/upload", response_model=BulkEmailProgress, tags=["Email"])
+async def send_bulk_email_upload(request: Request):
+    """Send a bulk email to recipients streamed from a CSV or NDJSON upload.
     
-    session.commit()
-    results["progress_percent"] = (results["sent"] / results["total"]) * 100
-    return results
+    Accepts either a ``multipart/form-data`` body with ``subject``,
+    ``content`` and optional ``tone`` fields followed by a ``file`` part, or
+    a raw ``text/csv`` / ``application/x-ndjson`` body with ``subject`` and
+    ``content`` passed as query parameters. Rows are parsed, normalized and
+    deduplicated as they arrive and fed straight into the send queue, so
+    delivery starts while the upload is still in progress.
+    
+    CSV uploads need an ``email`` (or ``recipient``) column, matched ignoring
+    case and punctuation (``E-mail``, ``Email Address``), or an address
+    in the first column; other columns become merge fields that replace
+    ``[Column]`` placeholders in the subject and content.
+    
+    Args:
+        request: Incoming request whose body is read incrementally
+        
+    Returns:
+        BulkEmailProgress: Job progress once the upload has been read;
+            sending continues in the background
+        
+    Raises:
+        HTTPException: If the upload is malformed or missing fields. A
+            malformed file or a dropped connection cancels the job: messages
+            not yet being sent are discarded and the job ends as failed.
+    """
+    try:
+        upload = UploadStream(request)
+        chunks = await upload.wait_for_file()
+    except UploadFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    fields = {**request.query_params, **upload.form}
+    subject = fields.get("subject")
+    content = fields.get("content")
+    if not subject or not content:
+        raise HTTPException(
+            status_code=422,
+            detail="`subject` and `content` must be sent before the file part",
+        )
+    prompt = f"Bulk email - {fields.get('tone') or 'professional'} tone"
+
+    stats = IngestStats()
+    job = await create_job()
+    queue = SendQueue(job=job)
+    queue.start()
+    complete = False
+    try:
+        async for row in iter_recipients(chunks, upload.format, stats):
+            job.add_total()
+            await queue.put(OutgoingEmail(
+                recipient=row.email,
+                subject=render_merge_fields(subject, row.fields),
+                content=render_merge_fields(content, row.fields),
+                prompt=prompt,
+            ))
+        complete = True
+        if stats.suspected_duplicates:
+            print(f"Bulk job {job.id}: {stats.suspected_duplicates} of {stats.duplicates} duplicates "
+                  f"dropped by the Bloom filter may have been unique recipients")
+    except UploadFormatError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e} (after {stats.rows} rows; bulk job {job.id} was cancelled)",
+        )
+    finally:
+        if not complete:
+            # Malformed upload or client gone: send nothing more, so a
+            # retried upload doesn't mail the same recipients twice
+            queue.discard_pending()
+        # Queued messages keep sending after the response is returned
+        spawn(run_job(job, queue, status="completed" if complete else "failed"))
+
+    return job.snapshot()
+
+
+@router.get("/bulk/{job_id}", response_model=BulkEmailProgress, tags=["Email"])
+def get_bulk_job(job_id: str, session: Session = Depends(get_session)):
+    """Get the current progress of a bulk send job."""
+    progress = load_job_progress(session, job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Bulk job not found")
+    return progress
+
+
+@router.get("/bulk/{job_id}/events", tags=["Email"])
+async def stream_bulk_job_events(job_id: str):
+    """Stream bulk job progress as Server-Sent Events.
+    
+    Emits a ``progress`` event whenever the counters change and a final
+    ``done`` event when the job finishes. All subscribers of a job share
+    one in-memory broadcaster, so watchers never touch the database.
+    Jobs that are no longer in memory get their last stored progress as a
+    single ``done`` event.
+    """
+    job = get_job(job_id)
+    if job is None:
+        # Read off the event loop, without holding a pooled session open
+        progress = await asyncio.to_thread(read_job_progress, job_id)
+        if not progress:
+            raise HTTPException(status_code=404, detail="Bulk job not found")
+
+    async def events():
+        if job is None:
+            yield f"event: done\ndata: {progress.model_dump_json()}\n\n"
+            return
+        async for snapshot in job.broadcaster.subscribe():
+            if snapshot is None:
+                yield ": keep-alive\n\n"
+                continue
+            event = "done" if job.broadcaster.closed else "progress"
+            yield f"event: {event}\ndata: {snapshot.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/schedule", tags=["Email"])
@@ -0,0 +1,37 @@
+"""Metrics endpoints for LLM, tool and cache instrumentation."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from typing import Literal
+
+from api.ai.cache import draft_cache
+from api.ai.instrumentation import metrics
+from api.ai.llms import router_stats
+from api.ai.singleflight import singleflight_stats
+
+router = APIRouter()
+
+
+@router.get("/", tags=["Metrics"])
+def get_metrics(format: Literal["json", "prometheus"] = "json"):
+    """In-process metrics for this worker.
+    
+    Histograms of LLM latency, time to first token, prompt/completion
+    tokens and tool latency (labelled by model or tool), call/error/retry
+    counters, single-flight coalescing, draft cache and (with several
+    ``LLM_PROVIDERS``) per-provider routing statistics.
+    
+    Args:
+        format: "json" (default) or "prometheus" text exposition
+        
+    Returns:
+        dict | str: Metrics snapshot
+    """
+    if format == "prometheus":
+        return PlainTextResponse(metrics.prometheus(), media_type="text/plain; version=0.0.4")
+    return {
+        **metrics.snapshot(),
+        "singleflight": singleflight_stats(),
+        "draft_cache": draft_cache.stats(),
+        "providers": router_stats(),
+    }
@@ -3,11 +3,30 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import requests
-import io
+from starlette.background import BackgroundTask
+from typing import TYPE_CHECKING, Optional
+import os
+
+if TYPE_CHECKING:
+    import httpx
 
 router = APIRouter()
 
+TTS_API_URL = os.environ.get("TTS_API_URL") or "http://host.docker.internal:8000/api/tts"
+
+# Shared async client: keep-alive connections, never blocks the event loop
+_client: Optional["httpx.AsyncClient"] = None
+
+
+def get_tts_client() -> "httpx.AsyncClient":
+    global _client
+    if _client is None:
+        # Imported on first use to keep app startup light
+        import httpx
+
+        _client = httpx.AsyncClient(timeout=30)
+    return _client
+
 
 class TTSRequest(BaseModel):
     """Request model for TTS."""
@@ -18,33 +37,25 @@ class TTSRequest(BaseModel):
 
 @router.post("/speak", tags=["TTS"])
 async def text_to_speech(request: TTSRequest):
-    """Convert email draft text to speech."""
+    """Convert email draft text to speech.
+    
+    The audio is streamed through from the TTS service as it arrives.
+    """
+    import httpx
+
+    client = get_tts_client()
     try:
-        tts_api_url = "http://host.docker.internal:8000/api/tts"
-        
-        response = requests.post(
-            tts_api_url,
+        tts_request = client.build_request(
+            "POST",
+            TTS_API_URL,
             json={
                 "text": request.text,
                 "voice": request.voice,
                 "speed": request.speed
             },
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=response.status_code,
-                detail="TTS service failed"
-            )
-        
-        return StreamingResponse(
-            io.BytesIO(response.content),
-            media_type="audio/wav",
-            headers={"Content-Disposition": "attachment; filename=email_draft.wav"}
         )
-        
-    except requests.exceptions.ConnectionError:
+        response = await client.send(tts_request, stream=True)
+    except httpx.ConnectError:
         raise HTTPException(
             status_code=503,
             detail="TTS service unavailable. Make sure TTS server is running on port 8000"
@@ -54,3 +65,17 @@ async def text_to_speech(request: TTSRequest):
             status_code=500,
             detail=f"Failed to generate speech: {str(e)}"
         )
+
+    if response.status_code != 200:
+        await response.aclose()
+        raise HTTPException(
+            status_code=response.status_code,
+            detail="TTS service failed"
+        )
+
+    return StreamingResponse(
+        response.aiter_bytes(),
+        media_type="audio/wav",
+        headers={"Content-Disposition": "attachment; filename=email_draft.wav"},
+        background=BackgroundTask(response.aclose),
+    )
@@ -4,20 +4,63 @@ from api.email.routing import router as email_router
 from api.health.routing import router as health_router
 from api.templates.routing import router as templates_router
 from api.tts.routing import router as tts_router
+from api.metrics.routing import router as metrics_router
 from api.db import init_db
+from api.ai.llms import LLM_WARMUP, warm_llms
+from api.ai.agents import warm_agents
+from api.ai.memory import close_chat_memory, open_chat_memory
+from api.ai.instrumentation import LLM_DEBUG_HEADERS, debug_headers, track_request
+from api.email.history_writer import EMAIL_HISTORY_WRITE_BEHIND, history_writer
+from api.email.body_store import ensure_body_schema
+from api.chat.conversations import ensure_chat_schema
+from api.email.partitions import create_partitioned_history, ensure_partitions, maintain_partitions
+from api.email.jobs import reap_interrupted_jobs
 
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 
+async def warm_ai():
+    """Open chat memory, then build shared LLM clients and agents."""
+    try:
+        # The chat agent is compiled with the checkpointer, so open it first
+        await open_chat_memory()
+        await asyncio.to_thread(warm_llms)
+        await asyncio.to_thread(warm_agents)
+        print("Application startup: LLM clients and agents ready.")
+    except Exception as e:
+        print(f"Application startup: LLM warm-up failed: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application startup: Initializing database...")
+    # Partitioned email history must exist before create_all runs
+    create_partitioned_history()
+    ensure_chat_schema()
     init_db()
+    ensure_body_schema()
+    ensure_partitions()
+    maintenance = asyncio.create_task(maintain_partitions())
+    # Jobs a previous run left "running" will never finish
+    reaper = asyncio.create_task(reap_interrupted_jobs())
     print("Application startup: Database initialized.")
+    if EMAIL_HISTORY_WRITE_BEHIND:
+        history_writer.start()
+    # Build shared LLM clients and agents so the first request does not pay
+    # for it, in the background: health checks are served meanwhile
+    warmup = asyncio.create_task(warm_ai()) if LLM_WARMUP else None
     yield
     print("Application shutdown: Cleaning up resources (if any)...")
+    maintenance.cancel()
+    reaper.cancel()
+    if warmup:
+        warmup.cancel()
+    # Flush buffered email history before the process exits
+    history_writer.stop()
+    await close_chat_memory()
 
 app = FastAPI(
     title="Email Agent API",
@@ -33,6 +76,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate", "X-LLM-Calls", "X-LLM-Model",
+                    "X-LLM-Tokens", "X-LLM-Latency-Ms", "X-LLM-TTFT-Ms", "X-LLM-Tools"],
 )
 
 app.include_router(chat_router, prefix='/api/chats', tags=["Chat"])
@@ -40,6 +85,18 @@ app.include_router(email_router, prefix='/api/emails', tags=["Email"])
 app.include_router(health_router, prefix='/api/health', tags=["Health"])
 app.include_router(templates_router, prefix='/api/templates', tags=["Templates"])
 app.include_router(tts_router, prefix='/api/tts', tags=["TTS"])
+app.include_router(metrics_router, prefix='/api/metrics', tags=["Metrics"])
+
+
+if LLM_DEBUG_HEADERS:
+    @app.middleware("http")
+    async def llm_debug_headers(request: Request, call_next):
+        """Attach a summary of the request's LLM and tool calls as headers."""
+        with track_request() as calls:
+            response = await call_next(request)
+        # Streaming responses only report calls finished before the headers
+        response.headers.update(debug_headers(calls))
+        return response
 
 @app.get('/', tags=["Health"])
 def read_index():